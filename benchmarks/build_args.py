@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of the framework overhead of building a step's arguments,
+for a step without dependencies and for one with a small dependency graph.
+
+Usage: python benchmarks/build_args.py
+"""
+
+import timeit
+from collections.abc import Generator
+from typing import Annotated, Any
+
+from ergate import Context, Depends, Workflow
+from ergate.workflow_step import WorkflowStep
+
+
+def settings() -> Generator[dict[str, Any], None, None]:
+    yield {"retries": 3}
+
+
+def client(
+    settings: Annotated[dict[str, Any], Depends(settings)],
+) -> Generator[object, None, None]:
+    yield object()
+
+
+def repository(
+    client: Annotated[object, Depends(client)],
+    settings: Annotated[dict[str, Any], Depends(settings)],
+) -> Generator[object, None, None]:
+    yield object()
+
+
+workflow = Workflow(unique_name="build_args")
+
+
+@workflow.step
+def plain(value: int, context: Annotated[dict[str, Any], Context()]) -> None: ...
+
+
+@workflow.step
+def with_dependencies(
+    value: int,
+    repository: Annotated[object, Depends(repository)],
+    client: Annotated[object, Depends(client)],
+) -> None: ...
+
+
+workflow.finalize()
+
+
+def run(step: WorkflowStep) -> None:
+    with step.build_args({}, 1) as (args, kwargs):
+        step(*args, **kwargs)
+
+
+def main() -> None:
+    number = 100_000
+
+    for step in workflow:
+        elapsed = timeit.timeit(lambda step=step: run(step), number=number)
+        print(f"{step.name:>20}: {elapsed / number * 1e6:.2f} us per step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the per-job costs a worker pays while running jobs: memory
+held per job (for example while prefetching), construction, the updates
+made between steps and the snapshots taken when state writes are batched.
+
+A plain `__slots__` class with the same fields is included as a lower
+bound for comparison.
+
+Usage: python benchmarks/job.py
+"""
+
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from ergate import Job, JobStatus
+
+
+class SlottedJob:
+    __slots__ = tuple(Job.model_fields)
+
+    def __init__(self, **values: Any) -> None:
+        for name, field in Job.model_fields.items():
+            setattr(self, name, values.get(name, field.default))
+
+
+def time_per_call(func: Callable[[], Any], number: int = 100_000) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def memory_per_object(factory: Callable[[int], Any], count: int = 10_000) -> float:
+    tracemalloc.start()
+    objects = [factory(index) for index in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def main() -> None:
+    job = Job(id=1, workflow_name="benchmark")
+    slotted = SlottedJob(id=1, workflow_name="benchmark")
+
+    def mark_job() -> None:
+        job.status = JobStatus.RUNNING
+        job.mark_step_n_completed(1, None, 2)
+
+    def mark_job_attribute_by_attribute() -> None:
+        job.status = JobStatus.RUNNING
+        job.current_step = 1
+        job.steps_completed = 1
+        job.percent_completed = 50.0
+        job.status = JobStatus.PENDING
+        job.last_return_value = None
+
+    def mark_slotted() -> None:
+        slotted.status = JobStatus.RUNNING
+        slotted.current_step = 1
+        slotted.steps_completed = 1
+        slotted.percent_completed = 50.0
+        slotted.status = JobStatus.PENDING
+        slotted.last_return_value = None
+
+    rows = [
+        (
+            "memory per job (bytes)",
+            memory_per_object(lambda index: Job(id=index, workflow_name="b")),
+            memory_per_object(lambda index: SlottedJob(id=index, workflow_name="b")),
+        ),
+        (
+            "construct, validated (us)",
+            time_per_call(lambda: Job(id=1, workflow_name="benchmark")),
+            time_per_call(lambda: SlottedJob(id=1, workflow_name="benchmark")),
+        ),
+        (
+            "construct, model_construct (us)",
+            time_per_call(lambda: Job.model_construct(id=1, workflow_name="b")),
+            None,
+        ),
+        (
+            "step update, mark_* (us)",
+            time_per_call(mark_job),
+            time_per_call(mark_slotted),
+        ),
+        (
+            "step update, per attribute (us)",
+            time_per_call(mark_job_attribute_by_attribute),
+            None,
+        ),
+        ("snapshot, model_copy (us)", time_per_call(job.model_copy), None),
+    ]
+
+    print(f"{'':>32} {'Job':>10} {'slotted':>10}")
+    for name, job_value, slotted_value in rows:
+        slotted_text = f"{slotted_value:>10.2f}" if slotted_value is not None else ""
+        print(f"{name:>32} {job_value:>10.2f} {slotted_text:>10}")
+
+
+if __name__ == "__main__":
+    main()
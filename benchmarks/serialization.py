@@ -0,0 +1,131 @@
+"""
+Benchmark of serializing and deserializing jobs of typical sizes, comparing
+pydantic's own JSON dump/validation of the whole model with
+`Job.to_bytes`/`Job.from_bytes` and each available payload serializer.
+
+- dump: serializing a job whose payloads are already decoded.
+- load: reading a job back without touching its payloads, as a publisher
+  or state store would.
+- decode: reading a job back and decoding its input value and user
+  context, as a worker would.
+- relay: reading a job back and serializing it again untouched.
+
+Usage: python benchmarks/serialization.py
+"""
+
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from ergate import InputPolicy, Job
+from ergate.serialization import (
+    JsonSerializer,
+    MsgpackSerializer,
+    OrjsonSerializer,
+    PickleSerializer,
+    Serializer,
+)
+
+SIZES = {"small": 1, "medium": 100, "large": 10_000}
+
+
+def payload(n_items: int) -> dict[str, Any]:
+    return {
+        "records": [
+            {"id": index, "name": f"record-{index}", "score": index / 3}
+            for index in range(n_items)
+        ],
+        "source": "benchmark",
+    }
+
+
+def available_serializers() -> list[Serializer]:
+    serializers: list[Serializer] = [JsonSerializer(), PickleSerializer()]
+
+    for serializer_type in (OrjsonSerializer, MsgpackSerializer):
+        try:
+            serializers.append(serializer_type())
+        except ImportError:
+            print(f"Skipping {serializer_type.__name__}: not installed")
+
+    return serializers
+
+
+def time_per_call(func: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def decode(job: Job) -> None:
+    job.get_input_value(InputPolicy.PASSTHROUGH)
+    job.get_user_context()
+
+
+def report(
+    size: str,
+    method: str,
+    data: bytes,
+    dump: Callable[[], Any],
+    load: Callable[[], Job],
+    relay: Callable[[], Any],
+    number: int,
+) -> None:
+    timings = (
+        time_per_call(dump, number),
+        time_per_call(load, number),
+        time_per_call(lambda: decode(load()), number),
+        time_per_call(relay, number),
+    )
+    print(
+        f"{size:>6} {method:>17} {len(data):>8} "
+        + " ".join(f"{timing:>10.1f}" for timing in timings)
+    )
+
+
+def bench_size(size: str, n_items: int, serializers: list[Serializer]) -> None:
+    job = Job(
+        id=1,
+        workflow_name="benchmark",
+        initial_input_value=payload(n_items),
+        user_context={"tenant": "benchmark"},
+    )
+    number = max(1, 10_000 // n_items)
+
+    json_data = job.model_dump_json().encode()
+    report(
+        size,
+        "pydantic",
+        json_data,
+        job.model_dump_json,
+        lambda: Job.model_validate_json(json_data),
+        lambda: Job.model_validate_json(json_data).model_dump_json(),
+        number,
+    )
+
+    for serializer in serializers:
+        data = job.to_bytes(serializer)
+        report(
+            size,
+            type(serializer).__name__,
+            data,
+            lambda serializer=serializer: job.to_bytes(serializer),
+            lambda data=data: Job.from_bytes(data),
+            lambda data=data, serializer=serializer: Job.from_bytes(data).to_bytes(
+                serializer
+            ),
+            number,
+        )
+
+
+def main() -> None:
+    serializers = available_serializers()
+    print(
+        f"{'size':>6} {'method':>17} {'bytes':>8} {'dump (us)':>10} "
+        f"{'load (us)':>10} {'decode':>10} {'relay':>10}"
+    )
+
+    for size, n_items in SIZES.items():
+        bench_size(size, n_items, serializers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Throughput benchmark of workers and publishers running together against
+the reference backends in `ergate.backends`.
+
+Each scenario runs a number of jobs through a workflow whose steps do no
+work of their own, so the time per step is the framework's overhead (plus
+the backend's):
+
+- linear: five steps run one after the other.
+- branching: steps skip ahead with `GoToStep` and end early with `GoToEnd`.
+- dependencies: every step builds a small graph of dependencies.
+
+Every scenario is run in two modes:
+
+- end_to_end: the worker hands each job back to the state store after every
+  step, and a publisher publishes it again, as in a typical deployment.
+- worker: the worker chains every step of a job in a single pass, which
+  measures the worker on its own.
+
+Results are printed (or written to `--output`) as JSON, so they can be
+compared across releases.
+
+Usage: python benchmarks/throughput.py [--jobs 1000] [--output results.json]
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import Annotated, Any
+
+from ergate import (
+    Context,
+    Depends,
+    GoToEnd,
+    GoToEndPath,
+    GoToStep,
+    GoToStepPath,
+    Job,
+    Workflow,
+)
+from ergate.__version__ import VERSION
+from ergate.backends import (
+    InMemoryQueue,
+    InMemoryStateStore,
+    SqliteQueue,
+    SqliteStateStore,
+)
+from ergate.publisher import ErgatePublisher
+from ergate.worker import ErgateWorker, StepChaining
+
+steps_run = itertools.count()
+
+
+def linear_workflow() -> Workflow:
+    workflow = Workflow(unique_name="linear")
+
+    for index in range(5):
+
+        def step(value: int) -> int:
+            next(steps_run)
+            return value + 1
+
+        step.__name__ = f"step_{index}"
+        workflow.step(step)
+
+    return workflow
+
+
+def branching_workflow() -> Workflow:
+    workflow = Workflow(unique_name="branching")
+
+    @workflow.step(paths=[GoToStepPath("step_4")])
+    def step_1(value: int) -> int:
+        next(steps_run)
+        if value % 2:
+            raise GoToStep(step_4, retval=value)
+        return value
+
+    @workflow.step
+    def step_2(value: int) -> int:
+        next(steps_run)
+        return value
+
+    @workflow.step(paths=[GoToEndPath()])
+    def step_3(value: int) -> int:
+        next(steps_run)
+        if value % 3 == 0:
+            raise GoToEnd(value)
+        return value
+
+    @workflow.step
+    def step_4(value: int) -> int:
+        next(steps_run)
+        return value
+
+    @workflow.step
+    def step_5(value: int) -> int:
+        next(steps_run)
+        return value
+
+    return workflow
+
+
+def settings() -> Generator[dict[str, Any], None, None]:
+    yield {"retries": 3}
+
+
+def client(
+    settings: Annotated[dict[str, Any], Depends(settings)],
+) -> Generator[object, None, None]:
+    yield object()
+
+
+def repository(
+    client: Annotated[object, Depends(client)],
+    settings: Annotated[dict[str, Any], Depends(settings)],
+) -> Generator[object, None, None]:
+    yield object()
+
+
+def dependencies_workflow() -> Workflow:
+    workflow = Workflow(unique_name="dependencies")
+
+    for index in range(5):
+
+        def step(
+            value: int,
+            repository: Annotated[object, Depends(repository)],
+            client: Annotated[object, Depends(client)],
+            context: Annotated[Any, Context()],
+        ) -> int:
+            next(steps_run)
+            return value + 1
+
+        step.__name__ = f"step_{index}"
+        workflow.step(step)
+
+    return workflow
+
+
+SCENARIOS: dict[str, Callable[[], Workflow]] = {
+    "linear": linear_workflow,
+    "branching": branching_workflow,
+    "dependencies": dependencies_workflow,
+}
+
+BACKENDS = ("memory", "sqlite")
+
+MODES = ("end_to_end", "worker")
+
+
+def create_backend(name: str, directory: Path) -> tuple[Any, Any]:
+    if name == "memory":
+        return InMemoryQueue(), InMemoryStateStore()
+
+    path = directory / f"{time.monotonic_ns()}.sqlite3"
+    return SqliteQueue(path, poll_interval=0.001), SqliteStateStore(path)
+
+
+def run_scenario(
+    scenario: str,
+    backend: str,
+    mode: str,
+    n_jobs: int,
+    concurrency: int,
+    directory: Path,
+) -> dict[str, Any]:
+    workflow = SCENARIOS[scenario]()
+    workflow.finalize()
+
+    queue, state_store = create_backend(backend, directory)
+    for index in range(n_jobs):
+        state_store.add(
+            Job(workflow_name=workflow.unique_name, initial_input_value=index)
+        )
+
+    worker = ErgateWorker(
+        queue,
+        state_store,
+        concurrency=concurrency,
+        chaining=StepChaining() if mode == "worker" else None,
+    )
+    worker.register_workflow(workflow)
+    publisher = ErgatePublisher(state_store, queue)
+
+    global steps_run
+    steps_run = itertools.count()
+
+    publish_rounds = [0]
+
+    def publish_until_done() -> None:
+        # The worker only stops once the queue is closed
+        while True:
+            publisher.run()
+            publish_rounds[0] += 1
+            if state_store.wait_until_final(n_jobs, timeout=0.001):
+                break
+        queue.close()
+
+    # Workers install signal handlers, so they must run in the main thread
+    publisher_thread = threading.Thread(target=publish_until_done)
+    started = time.perf_counter()
+    publisher_thread.start()
+    worker.run()
+    elapsed = time.perf_counter() - started
+    publisher_thread.join()
+
+    n_steps = next(steps_run)
+    return {
+        "scenario": scenario,
+        "backend": backend,
+        "mode": mode,
+        "jobs": n_jobs,
+        "steps": n_steps,
+        "concurrency": concurrency,
+        "publish_rounds": publish_rounds[0],
+        "seconds": elapsed,
+        "jobs_per_second": n_jobs / elapsed,
+        "steps_per_second": n_steps / elapsed,
+        "microseconds_per_step": elapsed / n_steps * 1_000_000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), dest="scenarios"
+    )
+    parser.add_argument("--backend", action="append", choices=BACKENDS, dest="backends")
+    parser.add_argument("--mode", action="append", choices=MODES, dest="modes")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends or BACKENDS:
+            for scenario in args.scenarios or SCENARIOS:
+                for mode in args.modes or MODES:
+                    result = run_scenario(
+                        scenario,
+                        backend,
+                        mode,
+                        args.jobs,
+                        args.concurrency,
+                        Path(directory),
+                    )
+                    results.append(result)
+                    print(
+                        f"{backend:<7} {scenario:<13} {mode:<11}"
+                        f"{result['jobs_per_second']:>10.0f} jobs/s"
+                        f"{result['microseconds_per_step']:>10.1f} µs/step",
+                        file=sys.stderr,
+                    )
+
+    report = {
+        "ergate_version": VERSION,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of resolving the next step and remaining-steps count of a
+job once a step has finished, on workflows of increasing width.
+
+Compares scanning the step's paths (plus a linear lookup of `GoToStep`
+targets by name) with the transition table built when a workflow is
+finalized.
+
+Usage: python benchmarks/transitions.py
+"""
+
+import timeit
+from functools import partial
+
+from ergate import Workflow
+from ergate.paths import GoToStepPath, NextStepPath, WorkflowPath
+
+
+def build_workflow(n_steps: int) -> Workflow:
+    workflow = Workflow(unique_name=f"wide_{n_steps}")
+
+    for index in range(n_steps):
+        # Every step may skip ahead to the last one
+        paths: list[WorkflowPath] = [NextStepPath()]
+        if index < n_steps - 2:
+            paths.append(GoToStepPath(f"step_{n_steps - 1}"))
+
+        def step() -> None: ...
+
+        step.__name__ = f"step_{index}"
+        workflow.step(step, paths=paths)
+
+    workflow.finalize()
+    return workflow
+
+
+def scan(workflow: Workflow, index: int, target: str) -> int:
+    target_index = next(step.index for step in workflow if step.name == target)
+
+    longest = 0
+    for path in workflow[index].paths:
+        if isinstance(path, GoToStepPath) and path.step_name == target:
+            longest = workflow.get_remaining_steps(index, path) or 0
+
+    return target_index + longest
+
+
+def lookup(workflow: Workflow, index: int, target: str) -> int:
+    target_index, remaining = workflow.transitions[index].go_to[target]
+    return target_index + remaining
+
+
+def main() -> None:
+    print(f"{'steps':>6} {'scan (us)':>10} {'table (us)':>11} {'speedup':>8}")
+
+    for n_steps in (10, 100, 1000):
+        workflow = build_workflow(n_steps)
+        target = f"step_{n_steps - 1}"
+        assert scan(workflow, 0, target) == lookup(workflow, 0, target)
+
+        number = 20_000
+        scan_time = timeit.timeit(partial(scan, workflow, 0, target), number=number)
+        lookup_time = timeit.timeit(partial(lookup, workflow, 0, target), number=number)
+
+        print(
+            f"{n_steps:>6} "
+            f"{scan_time / number * 1e6:>10.2f} "
+            f"{lookup_time / number * 1e6:>11.2f} "
+            f"{scan_time / lookup_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
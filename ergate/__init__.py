@@ -1,21 +1,30 @@
 from .annotations import Context, Depends, Input
+from .caching import CachePolicy
 from .exceptions import (
     AbortJob,
     ErgateError,
     GoToEnd,
     GoToStep,
     InvalidDefinitionError,
+    IsolatedStepError,
+    JobTimeoutError,
+    MapStepError,
     ReverseGoToError,
+    StepTimeoutError,
     UnknownStepError,
     ValidationError,
 )
+from .input_policy import InputPolicy
 from .job import Job
 from .job_status import JobStatus
 from .paths import GoToEndPath, GoToStepPath, NextStepPath
+from .rate_limit import RateLimit
+from .retry import RetryPolicy
 from .workflow import Workflow, WorkflowStep
 
 __all__ = [
     "AbortJob",
+    "CachePolicy",
     "Context",
     "Depends",
     "ErgateError",
@@ -24,11 +33,18 @@ __all__ = [
     "GoToStep",
     "GoToStepPath",
     "Input",
+    "InputPolicy",
     "InvalidDefinitionError",
+    "IsolatedStepError",
     "Job",
     "JobStatus",
+    "JobTimeoutError",
+    "MapStepError",
     "NextStepPath",
+    "RateLimit",
+    "RetryPolicy",
     "ReverseGoToError",
+    "StepTimeoutError",
     "UnknownStepError",
     "ValidationError",
     "Workflow",
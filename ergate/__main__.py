@@ -0,0 +1,3 @@
+from .cli.entrypoint import run
+
+run()
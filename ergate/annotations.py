@@ -1,12 +1,29 @@
 from __future__ import annotations
 
-from contextlib import ExitStack, contextmanager
-from typing import TYPE_CHECKING, Any, Callable, Generator, Generic, TypeVar
-
-from .depends_cache import DependsCache
+from contextlib import asynccontextmanager, contextmanager
+from inspect import isasyncgenfunction
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Callable,
+    Generator,
+    Generic,
+    TypeVar,
+    cast,
+)
+
+from .depends_cache import (
+    SCOPE_NAMES,
+    AsyncDependsScope,
+    DependsScope,
+    DependsScopeName,
+    DependsScopes,
+)
+from .exceptions import InvalidDefinitionError
 
 if TYPE_CHECKING:
-    from .inspect import FunctionArgumentInfo
+    from .inspect import ArgumentSlots, FunctionArgumentInfo
 
 DependencyReturn = TypeVar("DependencyReturn")
 
@@ -14,40 +31,97 @@ DependencyReturn = TypeVar("DependencyReturn")
 class Depends(Generic[DependencyReturn]):
     def __init__(
         self,
-        dependency: Callable[..., Generator[DependencyReturn, None, None]],
+        dependency: Callable[
+            ...,
+            Generator[DependencyReturn, None, None]
+            | AsyncGenerator[DependencyReturn, None],
+        ],
+        *,
+        scope: DependsScopeName = "step",
     ) -> None:
+        if scope not in SCOPE_NAMES:
+            raise ValueError(f"Invalid dependency scope: {scope}")
+
         self.dependency = dependency
+        self.scope = scope
         self.argument_info: FunctionArgumentInfo | None = None
+        self.is_async = isasyncgenfunction(dependency)
+
+        # Wrapped once here rather than every time the dependency is created
+        if self.is_async:
+            self._async_context_manager = asynccontextmanager(
+                cast(Callable[..., AsyncGenerator[DependencyReturn, None]], dependency)
+            )
+        else:
+            self._context_manager = contextmanager(
+                cast(Callable[..., Generator[DependencyReturn, None, None]], dependency)
+            )
 
     def initialize(self, argument_info: FunctionArgumentInfo) -> None:
         self.argument_info = argument_info
 
-    @contextmanager
     def create(
         self,
-        stack: ExitStack,
-        depends_cache: DependsCache,
-        user_context: Any,
-        input_value: Any,
-    ) -> Generator[DependencyReturn, None, None]:
-        assert self.argument_info is not None, "Depends not initialized"
-
-        if self.dependency in depends_cache:
-            yield depends_cache[self.dependency]
-            return
-
-        args, kwargs = self.argument_info.build_args(
-            stack,
-            depends_cache,
-            user_context,
-            input_value,
-        )
-
-        dependency_callable = contextmanager(self.dependency)
-        dependency = stack.enter_context(dependency_callable(*args, **kwargs))
-        depends_cache.set(self.dependency, dependency)
-
-        yield dependency
+        scopes: DependsScopes[DependsScope],
+        slots: ArgumentSlots,
+        values: list[Any],
+    ) -> DependencyReturn:
+        """
+        Creates the dependency within its scope, or returns the one already
+        created there. `slots` locate its arguments within `values`.
+        """
+        scope = scopes[self.scope]
+        if self.dependency in scope.cache:
+            return scope.cache[self.dependency]
+
+        if self.is_async:
+            raise InvalidDefinitionError(
+                f"Dependency {self.dependency.__name__} is asynchronous and can "
+                "only be used by an asynchronous worker"
+            )
+
+        with scope.lock(self.dependency):
+            # Another job may have created it while waiting for the lock
+            if self.dependency in scope.cache:
+                return scope.cache[self.dependency]
+
+            args, kwargs = slots.resolve(values)
+            dependency = scope.stack.enter_context(
+                self._context_manager(*args, **kwargs)
+            )
+            scope.cache.set(self.dependency, dependency)
+
+        return dependency
+
+    async def create_async(
+        self,
+        scopes: DependsScopes[AsyncDependsScope],
+        slots: ArgumentSlots,
+        values: list[Any],
+    ) -> DependencyReturn:
+        scope = scopes[self.scope]
+        if self.dependency in scope.cache:
+            return scope.cache[self.dependency]
+
+        async with scope.lock(self.dependency):
+            # Another job may have created it while waiting for the lock
+            if self.dependency in scope.cache:
+                return scope.cache[self.dependency]
+
+            args, kwargs = slots.resolve(values)
+
+            if self.is_async:
+                dependency = await scope.stack.enter_async_context(
+                    self._async_context_manager(*args, **kwargs)
+                )
+            else:
+                dependency = scope.stack.enter_context(
+                    self._context_manager(*args, **kwargs)
+                )
+
+            scope.cache.set(self.dependency, dependency)
+
+        return dependency
 
 
 class Input:
@@ -0,0 +1,12 @@
+from .memory import InMemoryCache, InMemoryQueue, InMemoryStateStore
+from .sqlite import SqliteCache, SqliteLimiter, SqliteQueue, SqliteStateStore
+
+__all__ = (
+    "InMemoryCache",
+    "InMemoryQueue",
+    "InMemoryStateStore",
+    "SqliteCache",
+    "SqliteLimiter",
+    "SqliteQueue",
+    "SqliteStateStore",
+)
@@ -0,0 +1,320 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Generator, Sequence
+from typing import Generic, TypeVar
+
+from ..job import Job
+from ..job_status import JobStatus
+from ..log import LOG
+from ..result_store import FINAL_STATUSES
+
+JobType = TypeVar("JobType", bound=Job)
+
+PUBLISHABLE_STATUSES = frozenset((JobStatus.PENDING, JobStatus.SCHEDULED))
+
+
+class InMemoryQueue(Generic[JobType]):
+    """
+    Queue that lives in the memory of the current process, implementing
+    both the worker's and the publisher's queue protocols.
+
+    Jobs with a higher `priority` are taken first, and jobs with the same
+    priority in the order they were published.
+
+    Once closed and empty, `get_one` and `get_many` raise
+    `KeyboardInterrupt`, which is how workers are told to stop.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: list[tuple[int, int, JobType]] = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def publish_job(self, job: JobType) -> None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Queue is closed")
+            # Mutating the published job must not affect the queued one,
+            # just as if it had been sent to a broker.
+            heapq.heappush(
+                self._jobs, (-job.priority, next(self._seq), job.model_copy())
+            )
+            self._condition.notify()
+
+    def publish_jobs(self, jobs: Sequence[JobType]) -> Sequence[Exception | None]:
+        results: list[Exception | None] = []
+        for job in jobs:
+            try:
+                self.publish_job(job)
+            except Exception as exc:
+                results.append(exc)
+            else:
+                results.append(None)
+        return results
+
+    def get_many(self, n: int) -> Sequence[JobType]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._jobs or self._closed)
+            if not self._jobs:
+                raise KeyboardInterrupt
+
+            return [
+                heapq.heappop(self._jobs)[2] for _ in range(min(n, len(self._jobs)))
+            ]
+
+    def get_one(self) -> JobType:
+        return self.get_many(1)[0]
+
+    def poll(self) -> JobType | None:
+        with self._condition:
+            if self._jobs:
+                return heapq.heappop(self._jobs)[2]
+            if self._closed:
+                raise KeyboardInterrupt
+            return None
+
+    def close(self) -> None:
+        """Makes workers stop once the jobs already queued have been taken."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class InMemoryStateStore(Generic[JobType]):
+    """
+    State store that lives in the memory of the current process. It also
+    implements the publisher's driver protocol, yielding the jobs that are
+    waiting to be published once their requested start time (if any) has
+    come.
+
+    Jobs are stored as copies, so the stored state only changes through
+    `add` and `update`. Child jobs of mapped steps are stored too, but
+    aren't counted by `wait_until_final`.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[object, JobType] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._n_final = 0
+        self._ids = itertools.count(1)
+        self._map_children: dict[object, list[object]] = {}
+        self._map_unfinished: dict[object, int] = {}
+
+    def __getitem__(self, job_id: object) -> JobType:
+        with self._lock:
+            return self._jobs[job_id].model_copy()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(self, job: JobType) -> JobType:
+        """Stores a new job, giving it an ID if it doesn't have one."""
+        if job.id is None:
+            job.id = next(self._ids)
+        self.update(job)
+        return job
+
+    def update(self, job: JobType) -> None:
+        with self._lock:
+            self._store(job)
+
+    def update_many(self, jobs: Sequence[JobType]) -> None:
+        with self._lock:
+            for job in jobs:
+                self._store(job)
+
+    def _store(self, job: JobType) -> None:
+        previous = self._jobs.get(job.id)
+        was_final = previous is not None and previous.status in FINAL_STATUSES
+
+        stored = self._jobs[job.id] = job.model_copy()
+
+        # Cancellation is only acknowledged once the job is in a final state
+        if (
+            previous is not None
+            and previous.status == JobStatus.CANCELLING
+            and job.status not in FINAL_STATUSES
+        ):
+            stored.status = JobStatus.CANCELLING
+
+        if job.status in FINAL_STATUSES and not was_final and job.parent_id is None:
+            self._n_final += 1
+            self._finished.notify_all()
+
+    def start_map(self, parent: JobType, children: Sequence[JobType]) -> None:
+        """Stores a waiting job along with its child jobs, giving them IDs."""
+        with self._lock:
+            for child in children:
+                child.id = next(self._ids)
+                self._store(child)
+            self._store(parent)
+            self._map_children[parent.id] = [child.id for child in children]
+            self._map_unfinished[parent.id] = len(children)
+
+    def finish_map_child(
+        self, child: JobType
+    ) -> tuple[JobType, Sequence[JobType]] | None:
+        """
+        Stores a finished child job. Returns its parent and every child job
+        once the last of them has finished.
+        """
+        with self._lock:
+            previous = self._jobs.get(child.id)
+            was_final = previous is not None and previous.status in FINAL_STATUSES
+            self._store(child)
+
+            if was_final or child.parent_id not in self._map_unfinished:
+                return None
+
+            self._map_unfinished[child.parent_id] -= 1
+            if self._map_unfinished[child.parent_id]:
+                return None
+
+            del self._map_unfinished[child.parent_id]
+            child_ids = self._map_children.pop(child.parent_id)
+            return (
+                self._jobs[child.parent_id].model_copy(),
+                [self._jobs[child_id].model_copy() for child_id in child_ids],
+            )
+
+    def _unclaim(self, job_id: object) -> None:
+        """Makes a job that failed to be published publishable again."""
+        with self._lock:
+            stored = self._jobs.get(job_id)
+            if stored is not None and stored.status == JobStatus.QUEUED:
+                stored.status = JobStatus.PENDING
+
+    def _claim_publishable(self) -> list[JobType]:
+        now = time.time()
+        with self._lock:
+            jobs = []
+            for stored in self._jobs.values():
+                if stored.status in PUBLISHABLE_STATUSES and (
+                    stored.requested_start_time is None
+                    or stored.requested_start_time.timestamp() <= now
+                ):
+                    # Marked as queued before being published, so a worker that
+                    # picks it up straight away can't have its update overwritten.
+                    stored.status = JobStatus.QUEUED
+                    jobs.append(stored.model_copy())
+            jobs.sort(key=lambda job: job.priority, reverse=True)
+            return jobs
+
+    def generate_jobs(self) -> Generator[JobType, None, None]:
+        for job in self._claim_publishable():
+            try:
+                yield job
+            except Exception:
+                LOG.exception("Failed to publish job %s", job.id)
+                self._unclaim(job.id)
+
+    def report_failures(self, failures: Sequence[tuple[JobType, Exception]]) -> None:
+        for job, exc in failures:
+            LOG.error("Failed to publish job %s", job.id, exc_info=exc)
+            self._unclaim(job.id)
+
+    def cancel(self, job_id: object) -> JobStatus:
+        """
+        Cancels a job. Jobs that haven't been published yet are cancelled
+        straight away, while jobs that have are marked as `CANCELLING` for
+        workers to cancel between steps. Returns the job's new status.
+
+        Child jobs of mapped steps can't be cancelled on their own, since
+        their parent would wait for them forever. Cancel the parent instead.
+        """
+        with self._lock:
+            stored = self._jobs[job_id]
+            if stored.parent_id is not None:
+                raise ValueError(
+                    "Child jobs can only be cancelled through their parent"
+                )
+
+            if stored.status in PUBLISHABLE_STATUSES:
+                stored.status = JobStatus.CANCELLED
+                self._n_final += 1
+                self._finished.notify_all()
+            elif stored.status not in FINAL_STATUSES:
+                stored.status = JobStatus.CANCELLING
+            return stored.status
+
+    def is_cancelling(self, job: JobType) -> bool:
+        stored = self._jobs.get(job.id)
+        return stored is not None and stored.status == JobStatus.CANCELLING
+
+    def wait_until_final(self, n: int, timeout: float | None = None) -> bool:
+        """
+        Waits until `n` jobs have reached a final state. Returns whether they
+        did before the timeout expired.
+        """
+        with self._finished:
+            return self._finished.wait_for(lambda: self._n_final >= n, timeout)
+
+
+class InMemoryCache:
+    """
+    Step cache that lives in the memory of the current process. Once it
+    holds more than `max_entries` entries or `max_bytes` bytes of data, the
+    least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int | None = 1024,
+        max_bytes: int | None = None,
+    ) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            data, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, ttl: float | None) -> None:
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, expires)
+            self._size += len(data)
+
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._size > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        data, _ = self._entries.pop(key)
+        self._size -= len(data)
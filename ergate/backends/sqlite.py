@@ -0,0 +1,646 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Generator, Sequence
+from typing import Any, Generic, TypeVar
+
+from ..job import Job
+from ..job_status import JobStatus
+from ..log import LOG
+from ..rate_limit import RateLimit
+from ..result_store import FINAL_STATUSES
+from ..serialization import Serializer
+from .memory import PUBLISHABLE_STATUSES
+
+JobType = TypeVar("JobType", bound=Job)
+
+# Connections inherited from a parent process, which are never closed
+_INHERITED_CONNECTIONS: list[sqlite3.Connection] = []
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ergate_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ergate_queue_order ON ergate_queue (priority DESC, seq);
+CREATE TABLE IF NOT EXISTS ergate_jobs (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    start_at REAL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ergate_jobs_status ON ergate_jobs (status);
+CREATE TABLE IF NOT EXISTS ergate_map_children (
+    child_key TEXT PRIMARY KEY,
+    parent_key TEXT NOT NULL,
+    map_index INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ergate_map_children_parent
+ON ergate_map_children (parent_key, finished);
+CREATE TABLE IF NOT EXISTS ergate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ergate_limit_slots (
+    key TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (key, slot)
+);
+CREATE TABLE IF NOT EXISTS ergate_cache (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ergate_cache_accessed ON ergate_cache (accessed);
+CREATE TABLE IF NOT EXISTS ergate_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_FINAL_STATUS_VALUES = ", ".join(str(int(status)) for status in FINAL_STATUSES)
+_PUBLISHABLE_STATUS_VALUES = ", ".join(
+    str(int(status)) for status in PUBLISHABLE_STATUSES
+)
+
+# Cancellation is only acknowledged once the job is in a final state
+_UPSERT = f"""
+INSERT INTO ergate_jobs (key, status, start_at, data) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    start_at = excluded.start_at,
+    data = excluded.data,
+    status = CASE
+        WHEN status = {int(JobStatus.CANCELLING)}
+            AND excluded.status NOT IN ({_FINAL_STATUS_VALUES})
+        THEN status
+        ELSE excluded.status
+    END
+"""
+
+_CANCEL = f"""
+UPDATE ergate_jobs SET status = CASE
+    WHEN status IN ({_PUBLISHABLE_STATUS_VALUES}) THEN {int(JobStatus.CANCELLED)}
+    WHEN status IN ({_FINAL_STATUS_VALUES}) THEN status
+    ELSE {int(JobStatus.CANCELLING)}
+END
+WHERE key = ?
+"""
+
+
+class _SqliteConnection:
+    """
+    Connection handling shared by the SQLite backends. Each thread (and
+    each process, since connections can't be used across a fork) gets its
+    own connection to the database.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], timeout: float) -> None:
+        self.path = os.fspath(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            inherited = getattr(self._local, "connection", None)
+            if inherited is not None:
+                # SQLite connections mustn't be used or closed after a fork,
+                # so the parent's is kept alive instead of being dropped.
+                _INHERITED_CONNECTIONS.append(inherited)
+            self._local.connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            self._local.connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.pid = pid
+
+        connection: sqlite3.Connection = self._local.connection
+        return connection
+
+    def _fetch_one(self, sql: str, parameters: Sequence[object] = ()) -> Any:
+        return self._connection().execute(sql, parameters).fetchone()
+
+
+class _SqliteDatabase(_SqliteConnection, Generic[JobType]):
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        job_type: type[JobType],
+        serializer: Serializer | None,
+        timeout: float,
+    ) -> None:
+        super().__init__(path, timeout)
+        self.job_type = job_type
+        self.serializer = serializer
+
+    def _dump(self, job: JobType) -> bytes:
+        return job.to_bytes(self.serializer)
+
+    def _load(self, data: bytes) -> JobType:
+        return self.job_type.from_bytes(data, self.serializer)
+
+
+class SqliteQueue(_SqliteDatabase[JobType]):
+    """
+    Queue stored in an SQLite database, implementing both the worker's and
+    the publisher's queue protocols. Workers in other threads and processes
+    on the same machine can share it.
+
+    Jobs with a higher `priority` are taken first, and jobs with the same
+    priority in the order they were published.
+
+    Workers poll the database every `poll_interval` seconds while it's
+    empty. Once the queue has been closed (by any process) and is empty,
+    `get_one` and `get_many` raise `KeyboardInterrupt`, which is how workers
+    are told to stop.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        job_type: type[JobType] = Job,  # type: ignore[assignment]
+        *,
+        serializer: Serializer | None = None,
+        poll_interval: float = 0.05,
+        timeout: float = 30.0,
+    ) -> None:
+        super().__init__(path, job_type, serializer, timeout)
+        self.poll_interval = poll_interval
+
+    def __len__(self) -> int:
+        (count,) = self._fetch_one("SELECT COUNT(*) FROM ergate_queue")
+        return int(count)
+
+    def publish_job(self, job: JobType) -> None:
+        self._connection().execute(
+            "INSERT INTO ergate_queue (priority, data) VALUES (?, ?)",
+            (job.priority, self._dump(job)),
+        )
+
+    def publish_jobs(self, jobs: Sequence[JobType]) -> Sequence[Exception | None]:
+        connection = self._connection()
+        rows = [(job.priority, self._dump(job)) for job in jobs]
+
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT INTO ergate_queue (priority, data) VALUES (?, ?)", rows
+                )
+        except sqlite3.Error as exc:
+            return [exc] * len(jobs)
+
+        return [None] * len(jobs)
+
+    def _take(self, n: int) -> list[bytes]:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT seq, data FROM ergate_queue "
+                "ORDER BY priority DESC, seq LIMIT ?",
+                (n,),
+            ).fetchall()
+            connection.executemany(
+                "DELETE FROM ergate_queue WHERE seq = ?", [(seq,) for seq, _ in rows]
+            )
+        return [data for _, data in rows]
+
+    def _is_closed(self) -> bool:
+        row = self._fetch_one("SELECT value FROM ergate_meta WHERE name = 'closed'")
+        return row is not None and bool(row[0])
+
+    def get_many(self, n: int) -> Sequence[JobType]:
+        while True:
+            rows = self._take(n)
+            if rows:
+                return [self._load(data) for data in rows]
+
+            if self._is_closed():
+                raise KeyboardInterrupt
+
+            time.sleep(self.poll_interval)
+
+    def get_one(self) -> JobType:
+        return self.get_many(1)[0]
+
+    def poll(self) -> JobType | None:
+        rows = self._take(1)
+        if rows:
+            return self._load(rows[0])
+
+        if self._is_closed():
+            raise KeyboardInterrupt
+
+        return None
+
+    def close(self) -> None:
+        """
+        Makes workers stop once the jobs already queued have been taken.
+        The queue stays closed until `reopen` is called.
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO ergate_meta (name, value) VALUES ('closed', 1)"
+        )
+
+    def reopen(self) -> None:
+        self._connection().execute("DELETE FROM ergate_meta WHERE name = 'closed'")
+
+
+class SqliteStateStore(_SqliteDatabase[JobType]):
+    """
+    State store kept in an SQLite database. It also implements the
+    publisher's driver protocol, yielding the jobs that are waiting to be
+    published once their requested start time (if any) has come.
+
+    Child jobs of mapped steps are stored too, and tracked in a table of
+    their own so that their parent is handed back exactly once. They
+    aren't counted by `count_final` or `wait_until_final`.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        job_type: type[JobType] = Job,  # type: ignore[assignment]
+        *,
+        serializer: Serializer | None = None,
+        timeout: float = 30.0,
+    ) -> None:
+        super().__init__(path, job_type, serializer, timeout)
+
+    def __getitem__(self, job_id: object) -> JobType:
+        row = self._fetch_one(
+            "SELECT status, data FROM ergate_jobs WHERE key = ?", (str(job_id),)
+        )
+        if row is None:
+            raise KeyError(job_id)
+        return self._load_row(*row)
+
+    def add(self, job: JobType) -> JobType:
+        """Stores a new job, giving it an ID if it doesn't have one."""
+        if job.id is None:
+            job.id = uuid.uuid4().hex
+        self.update(job)
+        return job
+
+    def _row(self, job: JobType) -> tuple[str, int, float | None, bytes]:
+        start_at = (
+            job.requested_start_time.timestamp()
+            if job.requested_start_time is not None
+            else None
+        )
+        return str(job.id), int(job.status), start_at, self._dump(job)
+
+    def update(self, job: JobType) -> None:
+        self._connection().execute(_UPSERT, self._row(job))
+
+    def update_many(self, jobs: Sequence[JobType]) -> None:
+        rows = [self._row(job) for job in jobs]
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(_UPSERT, rows)
+
+    def start_map(self, parent: JobType, children: Sequence[JobType]) -> None:
+        """Stores a waiting job along with its child jobs, giving them IDs."""
+        for child in children:
+            child.id = uuid.uuid4().hex
+
+        rows = [self._row(job) for job in (*children, parent)]
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(_UPSERT, rows)
+            connection.executemany(
+                "INSERT INTO ergate_map_children (child_key, parent_key, map_index) "
+                "VALUES (?, ?, ?)",
+                [
+                    (str(child.id), str(parent.id), child.map_index)
+                    for child in children
+                ],
+            )
+
+    def finish_map_child(
+        self, child: JobType
+    ) -> tuple[JobType, Sequence[JobType]] | None:
+        """
+        Stores a finished child job. Returns its parent and every child job
+        once the last of them has finished.
+        """
+        parent_key = str(child.parent_id)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(_UPSERT, self._row(child))
+            finished = connection.execute(
+                "UPDATE ergate_map_children SET finished = 1 "
+                "WHERE child_key = ? AND finished = 0",
+                (str(child.id),),
+            ).rowcount
+            if not finished:
+                return None
+
+            unfinished = connection.execute(
+                "SELECT 1 FROM ergate_map_children "
+                "WHERE parent_key = ? AND finished = 0 LIMIT 1",
+                (parent_key,),
+            ).fetchone()
+            if unfinished is not None:
+                return None
+
+            rows = connection.execute(
+                "SELECT status, data FROM ergate_jobs "
+                "JOIN ergate_map_children ON key = child_key "
+                "WHERE parent_key = ? ORDER BY map_index",
+                (parent_key,),
+            ).fetchall()
+
+        return self[parent_key], [self._load_row(*row) for row in rows]
+
+    def _load_row(self, status: int, data: bytes) -> JobType:
+        # The status may have been changed without rewriting the job
+        job = self._load(data)
+        job.status = JobStatus(status)
+        return job
+
+    def _unclaim(self, job: JobType) -> None:
+        """Makes a job that failed to be published publishable again."""
+        job.status = JobStatus.PENDING
+        self._connection().execute(
+            "UPDATE ergate_jobs SET status = ?, data = ? WHERE key = ? AND status = ?",
+            (int(job.status), self._dump(job), str(job.id), int(JobStatus.QUEUED)),
+        )
+
+    def _claim_publishable(self) -> list[JobType]:
+        connection = self._connection()
+
+        with connection:
+            # Marked as queued before being published, so a worker that picks
+            # them up straight away can't have its update overwritten.
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT data FROM ergate_jobs "
+                f"WHERE status IN ({_PUBLISHABLE_STATUS_VALUES}) "
+                "AND (start_at IS NULL OR start_at <= ?)",
+                (time.time(),),
+            ).fetchall()
+
+            jobs = [self._load(data) for (data,) in rows]
+            jobs.sort(key=lambda job: job.priority, reverse=True)
+            for job in jobs:
+                job.status = JobStatus.QUEUED
+
+            connection.executemany(
+                "UPDATE ergate_jobs SET status = ?, data = ? WHERE key = ?",
+                [(int(job.status), self._dump(job), str(job.id)) for job in jobs],
+            )
+
+        return jobs
+
+    def generate_jobs(self) -> Generator[JobType, None, None]:
+        for job in self._claim_publishable():
+            try:
+                yield job
+            except Exception:
+                LOG.exception("Failed to publish job %s", job.id)
+                self._unclaim(job)
+
+    def report_failures(self, failures: Sequence[tuple[JobType, Exception]]) -> None:
+        for job, exc in failures:
+            LOG.error("Failed to publish job %s", job.id, exc_info=exc)
+            self._unclaim(job)
+
+    def cancel(self, job_id: object) -> JobStatus:
+        """
+        Cancels a job. Jobs that haven't been published yet are cancelled
+        straight away, while jobs that have are marked as `CANCELLING` for
+        workers to cancel between steps. Returns the job's new status.
+
+        Child jobs of mapped steps can't be cancelled on their own, since
+        their parent would wait for them forever. Cancel the parent instead.
+        """
+        if self._fetch_one(
+            "SELECT 1 FROM ergate_map_children WHERE child_key = ?", (str(job_id),)
+        ):
+            raise ValueError("Child jobs can only be cancelled through their parent")
+
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(_CANCEL, (str(job_id),))
+            row = connection.execute(
+                "SELECT status FROM ergate_jobs WHERE key = ?", (str(job_id),)
+            ).fetchone()
+
+        if row is None:
+            raise KeyError(job_id)
+        return JobStatus(row[0])
+
+    def is_cancelling(self, job: JobType) -> bool:
+        row = self._fetch_one(
+            "SELECT status FROM ergate_jobs WHERE key = ?", (str(job.id),)
+        )
+        return row is not None and row[0] == JobStatus.CANCELLING
+
+    def count_final(self) -> int:
+        """Returns the number of jobs that have reached a final state."""
+        (count,) = self._fetch_one(
+            "SELECT COUNT(*) FROM ergate_jobs "
+            f"WHERE status IN ({_FINAL_STATUS_VALUES}) "
+            "AND key NOT IN (SELECT child_key FROM ergate_map_children)"
+        )
+        return int(count)
+
+    def wait_until_final(
+        self,
+        n: int,
+        timeout: float | None = None,
+        *,
+        poll_interval: float = 0.05,
+    ) -> bool:
+        """
+        Waits until `n` jobs have reached a final state. Returns whether they
+        did before the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.count_final() < n:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+
+class SqliteLimiter(_SqliteConnection):
+    """
+    Limiter stored in an SQLite database, so that rate limits hold across
+    every worker thread and process on the same machine that shares it.
+
+    Concurrency slots are leased for `lease` seconds, after which they're
+    freed even if never released, so that a worker that dies mid-step
+    can't hold them forever. Leases should outlast the longest step.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        lease: float = 3600.0,
+        timeout: float = 30.0,
+    ) -> None:
+        if lease <= 0:
+            raise ValueError("lease must be positive")
+
+        super().__init__(path, timeout)
+        self.lease = lease
+
+    def acquire(self, key: str, limit: RateLimit, slot: str) -> float:
+        connection = self._connection()
+
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+
+            if limit.max_concurrency is not None:
+                connection.execute(
+                    "DELETE FROM ergate_limit_slots WHERE key = ? AND expires <= ?",
+                    (key, now),
+                )
+                (running,) = connection.execute(
+                    "SELECT COUNT(*) FROM ergate_limit_slots WHERE key = ?", (key,)
+                ).fetchone()
+                if running >= limit.max_concurrency:
+                    return limit.defer
+
+            if limit.rate is not None:
+                bucket = connection.execute(
+                    "SELECT tokens, updated FROM ergate_limit_buckets WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                tokens = (
+                    limit.refill(bucket[0], now - bucket[1])
+                    if bucket is not None
+                    else limit.refill(None, 0)
+                )
+                delay = limit.get_token_delay(tokens)
+                if delay:
+                    return delay
+
+                connection.execute(
+                    "INSERT OR REPLACE INTO ergate_limit_buckets "
+                    "(key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, tokens - 1, now),
+                )
+
+            if limit.max_concurrency is not None:
+                connection.execute(
+                    "INSERT INTO ergate_limit_slots (key, slot, expires) "
+                    "VALUES (?, ?, ?)",
+                    (key, slot, now + self.lease),
+                )
+
+        return 0.0
+
+    def release(self, key: str, slot: str) -> None:
+        self._connection().execute(
+            "DELETE FROM ergate_limit_slots WHERE key = ? AND slot = ?", (key, slot)
+        )
+
+
+class SqliteCache(_SqliteConnection):
+    """
+    Step cache stored in an SQLite database, which every worker thread and
+    process on the same machine can share. Once it holds more than
+    `max_entries` entries or `max_bytes` bytes of data, the least recently
+    used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        max_entries: int | None = None,
+        max_bytes: int | None = 256 * 1024 * 1024,
+        timeout: float = 30.0,
+    ) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        super().__init__(path, timeout)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def __len__(self) -> int:
+        (count,) = self._fetch_one("SELECT COUNT(*) FROM ergate_cache")
+        return int(count)
+
+    def get(self, key: str) -> bytes | None:
+        now = time.time()
+        row = self._fetch_one(
+            "SELECT data FROM ergate_cache "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, now),
+        )
+        if row is None:
+            return None
+
+        self._connection().execute(
+            "UPDATE ergate_cache SET accessed = ? WHERE key = ?", (now, key)
+        )
+        data: bytes = row[0]
+        return data
+
+    def set(self, key: str, data: bytes, ttl: float | None) -> None:
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO ergate_cache (key, data, expires, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, data, expires, now),
+            )
+            connection.execute("DELETE FROM ergate_cache WHERE expires <= ?", (now,))
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        if self.max_entries is not None:
+            connection.execute(
+                "DELETE FROM ergate_cache WHERE key IN ("
+                "SELECT key FROM ergate_cache ORDER BY accessed DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+        if self.max_bytes is None:
+            return
+
+        (size,) = connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM ergate_cache"
+        ).fetchone()
+        if size <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, length in connection.execute(
+            "SELECT key, LENGTH(data) FROM ergate_cache ORDER BY accessed"
+        ):
+            evicted.append((key,))
+            size -= length
+            if size <= self.max_bytes:
+                break
+        connection.executemany("DELETE FROM ergate_cache WHERE key = ?", evicted)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+from collections.abc import Mapping, Sequence
+from typing import Any, Protocol
+
+from pydantic_core import to_jsonable_python
+
+from .serialization import PickleSerializer, Serializer
+
+
+class CacheStoreProtocol(Protocol):
+    def get(self, key: str) -> bytes | None:
+        """Returns the data stored under the key, unless it has expired."""
+        ...
+
+    def set(self, key: str, data: bytes, ttl: float | None) -> None:
+        """Stores data under the key for `ttl` seconds, or indefinitely."""
+        ...
+
+
+class CachePolicy:
+    """
+    Reuses the return value of a step that was already run with the same
+    input value, rather than running it again. Only use it for steps whose
+    return value depends on nothing but their input value and the given
+    `context_fields` of the job's user context.
+
+    Return values are stored in `store` for `ttl` seconds (or for as long
+    as the store keeps them, if `None`), encoded with `serializer`. They're
+    keyed on a hash of the step's name, its input value, the context fields
+    and `version`, which can be changed to stop using values returned by a
+    previous version of the step. Input values and context fields must be
+    JSON-serializable by pydantic.
+    """
+
+    def __init__(
+        self,
+        store: CacheStoreProtocol,
+        *,
+        ttl: float | None = None,
+        context_fields: Sequence[str] = (),
+        version: str = "",
+        serializer: Serializer | None = None,
+    ) -> None:
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+
+        self.store = store
+        self.ttl = ttl
+        self.context_fields = tuple(context_fields)
+        self.version = version
+        self.serializer = serializer or PickleSerializer()
+
+    def _get_context_field(self, user_context: Any, field: str) -> Any:
+        if isinstance(user_context, Mapping):
+            return user_context.get(field)
+        return getattr(user_context, field, None)
+
+    def make_key(self, step_name: str, input_value: Any, user_context: Any) -> str:
+        """Returns the key a step's return value is stored under."""
+        parts = {
+            "step": step_name,
+            "version": self.version,
+            "input": input_value,
+            "context": {
+                field: self._get_context_field(user_context, field)
+                for field in self.context_fields
+            },
+        }
+        # Sorted keys make equal mappings hash the same regardless of order
+        encoded = json.dumps(
+            to_jsonable_python(parts),
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def load(self, data: bytes) -> Any:
+        return self.serializer.loads(memoryview(data))
+
+    def dump(self, value: Any) -> bytes:
+        return self.serializer.dumps(value)
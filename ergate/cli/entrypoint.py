@@ -0,0 +1,135 @@
+"""
+Command line interface, installed as the `ergate` command.
+
+    ergate worker my_app.worker:worker --processes 8 --max-jobs 1000
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+from collections.abc import Sequence
+from typing import Any
+
+from ..worker.app import ErgateWorker
+from ..worker.async_app import AsyncErgateWorker
+from ..worker.supervisor import WorkerSupervisor
+
+_MEMORY_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def import_worker(target: str) -> ErgateWorker[Any] | AsyncErgateWorker[Any]:
+    """Imports a worker given as `module:attribute`."""
+    module_name, _, attribute = target.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f'Expected "module:attribute", got "{target}"')
+
+    # Apps are usually run from the directory they live in
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    worker: Any = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        worker = getattr(worker, name)
+
+    if not isinstance(worker, (ErgateWorker, AsyncErgateWorker)):
+        raise TypeError(f'"{target}" is not a worker')
+    return worker
+
+
+def parse_memory(value: str) -> int:
+    """Parses an amount of memory in bytes, optionally suffixed by K, M or G."""
+    multiplier = _MEMORY_UNITS.get(value[-1:].upper(), 1)
+    number = value[:-1] if multiplier != 1 else value
+    try:
+        memory = int(number) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid amount of memory: {value}") from None
+
+    if memory < 1:
+        raise argparse.ArgumentTypeError("amount of memory must be positive")
+    return memory
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ergate")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser(
+        "worker",
+        help="run a worker in supervised child processes",
+        description=(
+            "Imports a worker once and runs it in child processes forked from "
+            "this one, replacing them if they crash or reach their limits."
+        ),
+    )
+    worker.add_argument("target", help="the worker to run, as module:attribute")
+    worker.add_argument(
+        "--processes",
+        type=_positive_int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    worker.add_argument(
+        "--max-jobs",
+        type=_positive_int,
+        help="replace each worker process after this many job runs",
+    )
+    worker.add_argument(
+        "--max-memory",
+        type=parse_memory,
+        help="replace each worker process once it uses more memory than this "
+        "(in bytes, or suffixed by K, M or G)",
+    )
+    worker.add_argument(
+        "--graceful-timeout",
+        type=float,
+        help="seconds to wait for worker processes to stop before killing them "
+        "(default: wait for as long as it takes)",
+    )
+    worker.add_argument(
+        "--restart-delay",
+        type=float,
+        default=1.0,
+        help="seconds to wait before replacing a crashed worker process",
+    )
+    worker.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+    )
+    return parser
+
+
+def run(argv: Sequence[str] | None = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s",
+    )
+
+    if args.command == "worker":
+        try:
+            worker = import_worker(args.target)
+        except (TypeError, ValueError) as exc:
+            parser.error(str(exc))
+
+        supervisor = WorkerSupervisor(
+            worker,
+            processes=args.processes,
+            max_jobs=args.max_jobs,
+            max_memory=args.max_memory,
+            graceful_timeout=args.graceful_timeout,
+            restart_delay=args.restart_delay,
+        )
+        supervisor.run()
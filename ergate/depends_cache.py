@@ -1,4 +1,17 @@
-from typing import Any
+import asyncio
+import threading
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    AsyncExitStack,
+    ExitStack,
+    nullcontext,
+)
+from typing import Any, Generic, Literal, TypeVar
+
+DependsScopeName = Literal["worker", "job", "step"]
+
+SCOPE_NAMES: tuple[DependsScopeName, ...] = ("worker", "job", "step")
 
 
 class DependsCache:
@@ -13,3 +26,72 @@ class DependsCache:
 
     def set(self, key: Any, value: Any) -> None:
         self._cache[key] = value
+
+
+class DependsScope:
+    """
+    Dependencies created within a scope, and the stack that tears them down.
+
+    A `shared` scope may be used by several jobs at the same time, in which
+    case each dependency is created by one thread only.
+    """
+
+    def __init__(self, stack: ExitStack, *, shared: bool = False) -> None:
+        self.stack = stack
+        self.cache = DependsCache()
+        self.shared = shared
+        self._locks: dict[Any, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock(self, key: Any) -> AbstractContextManager[Any]:
+        if not self.shared:
+            return nullcontext()
+
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+class AsyncDependsScope:
+    """
+    Asynchronous counterpart of `DependsScope`, for use within an event loop.
+    """
+
+    def __init__(self, stack: AsyncExitStack, *, shared: bool = False) -> None:
+        self.stack = stack
+        self.cache = DependsCache()
+        self.shared = shared
+        self._locks: dict[Any, asyncio.Lock] = {}
+
+    def lock(self, key: Any) -> AbstractAsyncContextManager[Any]:
+        if not self.shared:
+            return nullcontext()
+
+        return self._locks.setdefault(key, asyncio.Lock())
+
+
+ScopeType = TypeVar("ScopeType", DependsScope, AsyncDependsScope)
+
+
+class DependsScopes(Generic[ScopeType]):
+    """
+    The scopes available while building a step's arguments. Dependencies
+    whose scope isn't available (such as worker-scoped dependencies used
+    outside of a worker) fall back to the next narrower scope.
+    """
+
+    def __init__(
+        self,
+        step: ScopeType,
+        job: ScopeType | None = None,
+        worker: ScopeType | None = None,
+    ) -> None:
+        self.step: ScopeType = step
+        self.job: ScopeType = job or step
+        self.worker: ScopeType = worker or self.job
+
+    def __getitem__(self, name: DependsScopeName) -> ScopeType:
+        if name == "worker":
+            return self.worker
+        if name == "job":
+            return self.job
+        return self.step
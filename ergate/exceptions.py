@@ -1,8 +1,11 @@
-from typing import Any
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
 
 from pydantic import ValidationError  # noqa: F401
 
-from .workflow_step import WorkflowStep
+if TYPE_CHECKING:
+    from .workflow_step import WorkflowStep
 
 
 class ErgateError(Exception):
@@ -21,6 +24,26 @@ class UnknownStepError(ErgateError):
     """Raised when a workflow/step attempts to `go to` an unknown step."""
 
 
+class SerializationError(ErgateError):
+    """Raised when a serialized job can't be read."""
+
+
+class StepTimeoutError(ErgateError):
+    """Raised when a step runs for longer than it's allowed to."""
+
+
+class JobTimeoutError(StepTimeoutError):
+    """Raised when a job runs for longer than its workflow's timeout."""
+
+
+class IsolatedStepError(ErgateError):
+    """Raised when the process running an isolated step exits unexpectedly."""
+
+
+class MapStepError(ErgateError):
+    """Raised when any of the child jobs of a mapped step doesn't complete."""
+
+
 class AbortJob(ErgateError):  # noqa: N818
     """Raised from a step to abort a workflow.
     Should be interpreted as an expected failure.
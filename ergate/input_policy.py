@@ -0,0 +1,166 @@
+import copy
+from collections.abc import Iterator, Mapping, Sequence
+from enum import Enum, auto
+from typing import Any, overload
+
+from pydantic_core import SchemaSerializer, core_schema
+
+
+class InputPolicy(Enum):
+    """Determines how a job's input value is handed to the step that runs."""
+
+    DEEPCOPY = auto()
+    """
+    The step receives a deep copy of the input value. This is the safest
+    option, but also the most expensive one for large input values.
+    """
+
+    COPY = auto()
+    """
+    The step receives a shallow copy of the input value, so it may replace
+    top-level items freely but must not mutate nested ones.
+    """
+
+    FROZEN = auto()
+    """
+    The step receives a read-only view of the input value without anything
+    being copied. Dictionaries and lists (including nested ones) are wrapped
+    in read-only views and mutable byte buffers are exposed as read-only
+    `memoryview`s. Other objects are handed over as they are.
+    """
+
+    PASSTHROUGH = auto()
+    """
+    The step receives the input value itself. The step must not mutate it.
+    """
+
+
+# These are never copied, regardless of the policy in use
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None), range)
+
+
+def _serialize_view(view: "FrozenMapping | FrozenSequence") -> Any:
+    return view._data
+
+
+# Views are serialized as the data they wrap when dumping a job with pydantic
+_VIEW_SERIALIZER = SchemaSerializer(
+    core_schema.any_schema(
+        serialization=core_schema.plain_serializer_function_ser_schema(_serialize_view)
+    )
+)
+
+
+class FrozenMapping(Mapping[Any, Any]):
+    """Read-only view of a dictionary."""
+
+    __slots__ = ("_data",)
+    __pydantic_serializer__ = _VIEW_SERIALIZER
+
+    def __init__(self, data: Mapping[Any, Any]) -> None:
+        self._data = data
+
+    def __getitem__(self, key: Any) -> Any:
+        return freeze(self._data[key])
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+    def thaw(self) -> dict[Any, Any]:
+        """Returns a mutable deep copy of the underlying data."""
+        return copy.deepcopy(dict(self._data))
+
+
+class FrozenSequence(Sequence[Any]):
+    """Read-only view of a list or tuple."""
+
+    __slots__ = ("_data",)
+    __pydantic_serializer__ = _VIEW_SERIALIZER
+
+    def __init__(self, data: Sequence[Any]) -> None:
+        self._data = data
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "FrozenSequence": ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return FrozenSequence(self._data[index])
+        return freeze(self._data[index])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FrozenSequence):
+            other = other._data
+        if not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+    def thaw(self) -> list[Any]:
+        """Returns a mutable deep copy of the underlying data."""
+        return copy.deepcopy(list(self._data))
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+
+    if isinstance(value, (FrozenMapping, FrozenSequence)):
+        return value
+
+    if isinstance(value, dict):
+        return FrozenMapping(value)
+
+    if isinstance(value, (list, tuple)):
+        return FrozenSequence(value)
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+
+    if isinstance(value, (bytearray, memoryview)):
+        return memoryview(value).toreadonly()
+
+    return value
+
+
+def apply_input_policy(value: Any, policy: InputPolicy, *, shared: bool = True) -> Any:
+    """
+    Returns the value to hand to a step according to the policy. Values
+    that aren't `shared` with anything else aren't copied, since the step
+    may as well have them.
+    """
+    if isinstance(value, _IMMUTABLE_TYPES) or policy is InputPolicy.PASSTHROUGH:
+        return value
+
+    # Memory views can't be copied, but a read-only view of the same
+    # buffer protects it from the step just as well.
+    if isinstance(value, memoryview):
+        return value.toreadonly()
+
+    if policy is InputPolicy.FROZEN:
+        return freeze(value)
+
+    if not shared:
+        return value
+
+    if policy is InputPolicy.COPY:
+        return copy.copy(value)
+
+    return copy.deepcopy(value)
@@ -1,18 +1,76 @@
 import copy
-from contextlib import ExitStack
 from inspect import Parameter
 from inspect import signature as get_signature
-from typing import Annotated, Any, Callable, get_args, get_origin
+from types import UnionType
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 from .annotations import Context, Depends, Input
-from .depends_cache import DependsCache
+from .depends_cache import AsyncDependsScope, DependsScope, DependsScopes
+from .exceptions import InvalidDefinitionError
 from .types import Annotation
 
+# Positions of the input value and user context in the list of values
+# that argument slots refer to. Dependency values follow them in plan order.
+INPUT_SLOT = 0
+CONTEXT_SLOT = 1
+
+
+class ArgumentSlots:
+    """
+    The position, within a list of already created values, of the value
+    that each argument of a function receives.
+    """
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(
+        self,
+        args: tuple[int, ...],
+        kwargs: tuple[tuple[str, int], ...],
+    ) -> None:
+        self.args = args
+        self.kwargs = kwargs
+
+    def resolve(self, values: list[Any]) -> tuple[list[Any], dict[str, Any]]:
+        return (
+            [values[slot] for slot in self.args],
+            {name: values[slot] for name, slot in self.kwargs},
+        )
+
+
+class ArgumentPlan:
+    """
+    A flat plan for building a function's arguments. Every dependency used
+    by the function, directly or through other dependencies, appears once
+    and after the dependencies it uses, so building the arguments is a
+    single pass over the plan.
+    """
+
+    __slots__ = ("dependencies", "slots")
+
+    def __init__(
+        self,
+        dependencies: tuple[tuple[Depends, ArgumentSlots], ...],
+        slots: ArgumentSlots,
+    ) -> None:
+        self.dependencies = dependencies
+        self.slots = slots
+
 
 class FunctionArgumentInfo:
     def __init__(self) -> None:
         self._args_types: list[Annotation] = []
         self._kwarg_types: dict[str, Annotation] = {}
+        self._plan: ArgumentPlan | None = None
 
     @property
     def args_types(self) -> list[Annotation]:
@@ -22,67 +80,92 @@ class FunctionArgumentInfo:
     def kwarg_types(self) -> dict[str, Annotation]:
         return self._kwarg_types
 
+    @property
+    def plan(self) -> ArgumentPlan:
+        assert self._plan is not None, "FunctionArgumentInfo not compiled"
+        return self._plan
+
+    @property
+    def has_dependencies(self) -> bool:
+        return bool(self.plan.dependencies)
+
     def add_param(self, param: Parameter, type_: Annotation) -> None:
         if param.kind == Parameter.POSITIONAL_ONLY:
             self._args_types.append(type_)
             return
         self._kwarg_types[param.name] = type_
 
-    def build_type(
+    def compile(self) -> None:
+        """
+        Builds the plan used to build arguments, with the dependency graph
+        sorted so that dependencies come before the ones that use them.
+        Dependencies used more than once within the same scope are only
+        created once, as they would be cached by the scope anyway.
+        """
+
+        dependencies: list[tuple[Depends, ArgumentSlots]] = []
+        positions: dict[tuple[Callable[..., Any], str], int] = {}
+
+        def slot_for(type_: Annotation) -> int:
+            if isinstance(type_, Input):
+                return INPUT_SLOT
+
+            if isinstance(type_, Context):
+                return CONTEXT_SLOT
+
+            assert isinstance(type_, Depends)
+            key = (type_.dependency, type_.scope)
+            if key not in positions:
+                assert type_.argument_info is not None, "Depends not initialized"
+                slots = slots_for(type_.argument_info)
+                positions[key] = CONTEXT_SLOT + 1 + len(dependencies)
+                dependencies.append((type_, slots))
+
+            return positions[key]
+
+        def slots_for(argument_info: FunctionArgumentInfo) -> ArgumentSlots:
+            return ArgumentSlots(
+                tuple(slot_for(type_) for type_ in argument_info.args_types),
+                tuple(
+                    (name, slot_for(type_))
+                    for name, type_ in argument_info.kwarg_types.items()
+                ),
+            )
+
+        slots = slots_for(self)
+        self._plan = ArgumentPlan(tuple(dependencies), slots)
+
+    def build_args(
         self,
-        type_: Annotation,
-        stack: ExitStack,
-        depends_cache: DependsCache,
+        scopes: DependsScopes[DependsScope] | None,
         user_context: Any,
         input_value: Any,
-    ) -> Any:
-        if isinstance(type_, Input):
-            return input_value
-
-        if isinstance(type_, Depends):
-            return stack.enter_context(
-                type_.create(
-                    stack,
-                    depends_cache,
-                    user_context,
-                    input_value,
-                )
-            )
+    ) -> tuple[list[Any], dict[str, Any]]:
+        plan = self.plan
+        values = [input_value, user_context]
 
-        assert isinstance(type_, Context)
-        return user_context
+        if plan.dependencies:
+            assert scopes is not None, "Dependencies require scopes"
+            for depends, slots in plan.dependencies:
+                values.append(depends.create(scopes, slots, values))
 
-    def build_args(
+        return plan.slots.resolve(values)
+
+    async def build_args_async(
         self,
-        stack: ExitStack,
-        depends_cache: DependsCache,
+        scopes: DependsScopes[AsyncDependsScope] | None,
         user_context: Any,
         input_value: Any,
     ) -> tuple[list[Any], dict[str, Any]]:
-        args: list[Any] = []
-        kwargs: dict[str, Any] = {}
-
-        for type_ in self._args_types:
-            args.append(
-                self.build_type(
-                    type_,
-                    stack,
-                    depends_cache,
-                    user_context,
-                    input_value,
-                )
-            )
+        plan = self.plan
+        values = [input_value, user_context]
 
-        for name, type_ in self._kwarg_types.items():
-            kwargs[name] = self.build_type(
-                type_,
-                stack,
-                depends_cache,
-                user_context,
-                input_value,
-            )
+        if plan.dependencies:
+            assert scopes is not None, "Dependencies require scopes"
+            for depends, slots in plan.dependencies:
+                values.append(await depends.create_async(scopes, slots, values))
 
-        return args, kwargs
+        return plan.slots.resolve(values)
 
 
 def get_param_info(param: Parameter) -> Input | Depends | Context:
@@ -109,6 +192,41 @@ def get_param_info(param: Parameter) -> Input | Depends | Context:
     return ergate_annotations[0]
 
 
+def validate_scope(depends: Depends, argument_info: FunctionArgumentInfo) -> None:
+    """
+    Ensures a dependency only uses values that live at least as long as it
+    does. Worker-scoped dependencies are shared by every job, so they can't
+    use a job's context or input value; job-scoped dependencies are shared
+    by every step a worker runs for a job, so they can't use the input value.
+    """
+
+    if depends.scope == "step":
+        return
+
+    narrower_scopes = ("job", "step") if depends.scope == "worker" else ("step",)
+    name = depends.dependency.__name__
+
+    for type_ in [*argument_info.args_types, *argument_info.kwarg_types.values()]:
+        if isinstance(type_, Input):
+            raise InvalidDefinitionError(
+                f"Dependency {name} is {depends.scope}-scoped and therefore "
+                "cannot use the input value"
+            )
+
+        if isinstance(type_, Context) and depends.scope == "worker":
+            raise InvalidDefinitionError(
+                f"Dependency {name} is worker-scoped and therefore "
+                "cannot use the user context"
+            )
+
+        if isinstance(type_, Depends) and type_.scope in narrower_scopes:
+            raise InvalidDefinitionError(
+                f"Dependency {name} is {depends.scope}-scoped and therefore cannot "
+                f"depend on {type_.scope}-scoped dependency "
+                f"{type_.dependency.__name__}"
+            )
+
+
 def build_function_arg_info(function: Callable[..., Any]) -> FunctionArgumentInfo:
     signature = get_signature(function)
     function_wrapper = FunctionArgumentInfo()
@@ -119,9 +237,49 @@ def build_function_arg_info(function: Callable[..., Any]) -> FunctionArgumentInf
         if isinstance(param_info, Depends):
             depends_copy = copy.copy(param_info)
             dependency_arg_info = build_function_arg_info(depends_copy.dependency)
+            validate_scope(depends_copy, dependency_arg_info)
             depends_copy.initialize(dependency_arg_info)
             param_info = depends_copy
 
         function_wrapper.add_param(param, param_info)
 
+    function_wrapper.compile()
     return function_wrapper
+
+
+def _accepts_list(annotation: Any) -> bool:
+    if annotation is Parameter.empty or annotation is Any:
+        return True
+
+    if isinstance(annotation, TypeVar):
+        return True
+
+    origin = get_origin(annotation)
+    if origin is Annotated:
+        return _accepts_list(get_args(annotation)[0])
+
+    if origin is Union or origin is UnionType:
+        return any(_accepts_list(argument) for argument in get_args(annotation))
+
+    type_ = origin or annotation
+    return isinstance(type_, type) and issubclass(list, type_)
+
+
+def input_accepts_list(function: Callable[..., Any]) -> bool:
+    """
+    Whether a list can be passed as the input value of a function, judging
+    by the annotations of the parameters that receive it. Annotations that
+    can't be resolved are assumed to allow it.
+    """
+    try:
+        hints = get_type_hints(function, include_extras=True)
+    except (NameError, TypeError):
+        return True
+
+    for param in get_signature(function).parameters.values():
+        annotation = hints.get(param.name, Parameter.empty)
+        param_info = get_param_info(param.replace(annotation=annotation))
+        if isinstance(param_info, Input) and not _accepts_list(annotation):
+            return False
+
+    return True
@@ -1,4 +1,6 @@
 import signal
+from collections.abc import Generator
+from contextlib import contextmanager
 from types import FrameType
 from typing import Any, Callable
 
@@ -30,3 +32,45 @@ class DelayedKeyboardInterrupt:
             if not callable(old_handler):
                 continue
             old_handler(*signal_)
+
+
+class StopSignals:
+    """
+    Records `SIGTERM` and `SIGINT` in `received`, so that the worker can stop
+    once it's done with what it's doing. Inside `interruptible`, they also
+    raise `KeyboardInterrupt`, to stop waits that may take a long time.
+    Raising it anywhere else could leave a lock that other threads need held.
+    """
+
+    def __init__(self) -> None:
+        self.received = False
+        self._interruptible = False
+
+    def __enter__(self) -> None:
+        self.old_handlers: dict[signal.Signals, _SIGNAL_HANDLER] = {
+            signal.SIGTERM: signal.signal(signal.SIGTERM, self.handler),
+            signal.SIGINT: signal.signal(signal.SIGINT, self.handler),
+        }
+
+    def handler(self, sig, frame) -> None:
+        if not self.received:
+            signal_ = signal.Signals(sig)
+            LOG.info("%s received - stopping after running jobs complete", signal_.name)
+        self.received = True
+        if self._interruptible:
+            raise KeyboardInterrupt
+
+    @contextmanager
+    def interruptible(self) -> Generator[None, None, None]:
+        if self.received:
+            raise KeyboardInterrupt
+
+        self._interruptible = True
+        try:
+            yield
+        finally:
+            self._interruptible = False
+
+    def __exit__(self, type, value, traceback) -> None:
+        for sig, old_handler in self.old_handlers.items():
+            signal.signal(sig, old_handler)
@@ -1,12 +1,35 @@
-import copy
-from datetime import datetime
-from typing import Any
+import time
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from typing import Any, TypeVar
 
 from pydantic import BaseModel, Field
 
+from .input_policy import InputPolicy, apply_input_policy
 from .job_status import JobStatus
+from .result_store import ResultOffloading
+from .serialization import JsonSerializer, LazyPayload, Serializer, dump_job, load_job
 from .workflow import WorkflowStep
 
+JobType = TypeVar("JobType", bound="Job")
+
+
+@cache
+def _can_set_fields_directly(job_type: type[BaseModel]) -> bool:
+    """
+    Whether setting fields doesn't need pydantic's `__setattr__`, which is
+    the case unless the model validates assignments, has frozen fields, or
+    customizes `__setattr__`.
+    """
+    config = job_type.model_config
+    return (
+        not config.get("validate_assignment")
+        and not config.get("frozen")
+        and not any(field.frozen for field in job_type.model_fields.values())
+        and job_type.__setattr__ is BaseModel.__setattr__
+    )
+
 
 class Job(BaseModel):
     id: Any = None
@@ -19,15 +42,126 @@ class Job(BaseModel):
     last_return_value: Any = None
     user_context: Any = None
     requested_start_time: datetime | None = None
+    started_time: datetime | None = None
+    attempt: int = Field(default=1, ge=1)
+    parent_id: Any = None
+    map_index: int | None = Field(default=None, ge=0)
+    step_return_values: dict[int, Any] = Field(default_factory=dict)
+    priority: int = 0
+    published_time: datetime | None = None
+
+    def _set_fields(self, **values: Any) -> None:
+        """
+        Sets several fields at once. Unless the model has to check them,
+        this skips pydantic's per-attribute `__setattr__` dispatch, which is
+        a noticeable share of the time spent updating a job between steps.
+        """
+        if not _can_set_fields_directly(type(self)):
+            for name, value in values.items():
+                setattr(self, name, value)
+            return
 
-    def get_input_value(self) -> Any:
-        input_val = (
-            self.initial_input_value
-            if self.steps_completed == 0
-            else self.last_return_value
+        self.__dict__.update(values)
+        self.__pydantic_fields_set__.update(values)
+
+    def _get_payload(self, name: str) -> Any:
+        value = getattr(self, name)
+        if isinstance(value, LazyPayload):
+            value = value.load()
+            setattr(self, name, value)
+        return value
+
+    def _get_input_payload(self, name: str) -> tuple[Any, bool]:
+        """
+        Returns the value of a payload field for use as an input value, and
+        whether it's shared with anything else. Values that can be loaded
+        without referring to the encoded data are loaded again every time
+        (rather than kept), so that they don't have to be copied.
+        """
+        value = getattr(self, name)
+        if isinstance(value, LazyPayload) and getattr(
+            value.serializer, "copies_data", False
+        ):
+            return value.load(), False
+        return self._get_payload(name), True
+
+    def get_input_value(
+        self,
+        policy: InputPolicy = InputPolicy.DEEPCOPY,
+        results: ResultOffloading | None = None,
+    ) -> Any:
+        input_val, shared = self._get_input_payload(
+            "initial_input_value" if self.steps_completed == 0 else "last_return_value"
         )
 
-        return copy.deepcopy(input_val)
+        if results is not None and results.is_ref(input_val):
+            # Resolved values may refer to memory-mapped files
+            input_val, shared = results.resolve(input_val), True
+
+        return apply_input_policy(input_val, policy, shared=shared)
+
+    def get_dependency_values(
+        self,
+        depends_on: Sequence[int],
+        policy: InputPolicy = InputPolicy.DEEPCOPY,
+        results: ResultOffloading | None = None,
+    ) -> Any:
+        """
+        Returns the input value of a step that depends on the steps with the
+        given indexes: the return value of the only one, a list of the
+        return values of each, or the job's initial input value if none.
+        """
+        if not depends_on:
+            input_val, shared = self._get_input_payload("initial_input_value")
+            return apply_input_policy(input_val, policy, shared=shared)
+
+        if len(depends_on) == 1:
+            input_val = self._get_step_return_value(depends_on[0], results)
+        else:
+            input_val = [
+                self._get_step_return_value(index, results) for index in depends_on
+            ]
+
+        return apply_input_policy(input_val, policy)
+
+    def _get_step_return_value(
+        self, index: int, results: ResultOffloading | None
+    ) -> Any:
+        value = self.step_return_values[index]
+        if results is not None:
+            value = results.resolve(value)
+        return value
+
+    def get_return_value(self, results: ResultOffloading | None = None) -> Any:
+        return_val = self._get_payload("last_return_value")
+
+        if results is not None:
+            return_val = results.resolve(return_val)
+
+        return return_val
+
+    def get_user_context(self) -> Any:
+        return self._get_payload("user_context")
+
+    def to_bytes(self, serializer: Serializer | None = None) -> bytes:
+        """
+        Serializes the job into a compact binary format, encoding payload
+        fields with the given serializer (JSON by default).
+        """
+        return dump_job(self, serializer or JsonSerializer())
+
+    @classmethod
+    def from_bytes(  # noqa: PYI019
+        cls: type[JobType],
+        data: bytes | bytearray | memoryview,
+        serializer: Serializer | None = None,
+    ) -> JobType:
+        """
+        Reads a job serialized by `to_bytes`. Payload fields typed as `Any`
+        are only decoded once they're used. Jobs written by one of ergate's
+        serializers are read with the same one unless another is given.
+        """
+        return load_job(cls, data, serializer)
 
     def mark_aborted(self, message: str) -> None:
         self.status = JobStatus.ABORTED
@@ -35,21 +169,85 @@ class Job(BaseModel):
     def mark_failed(self, exception: Exception) -> None:
         self.status = JobStatus.FAILED
 
+    def mark_retrying(self, delay: float) -> None:
+        """Schedules the current step to be attempted again after `delay` seconds."""
+        self._set_fields(
+            status=JobStatus.SCHEDULED,
+            attempt=self.attempt + 1,
+            requested_start_time=datetime.now(timezone.utc) + timedelta(seconds=delay),
+        )
+
+    def mark_deferred(self, delay: float) -> None:
+        """
+        Schedules the current step to be run after `delay` seconds, without
+        counting it as an attempt.
+        """
+        self._set_fields(
+            status=JobStatus.SCHEDULED,
+            requested_start_time=datetime.now(timezone.utc) + timedelta(seconds=delay),
+        )
+
+    def mark_published(self) -> None:
+        self.published_time = datetime.now(timezone.utc)
+
+    def seconds_since_published(self) -> float | None:
+        """Seconds since the job was last published, if it ever was."""
+        if self.published_time is None:
+            return None
+        return time.time() - self.published_time.timestamp()
+
+    def mark_waiting(self) -> None:
+        self.status = JobStatus.WAITING
+
+    def mark_map_chunk_completed(self, return_value: list[Any]) -> None:
+        self._set_fields(
+            status=JobStatus.COMPLETED,
+            steps_completed=1,
+            percent_completed=100.0,
+            last_return_value=return_value,
+            attempt=1,
+        )
+
+    def mark_cancelled(self) -> None:
+        self.status = JobStatus.CANCELLED
+
     def mark_running(self, step: WorkflowStep) -> None:
-        self.status = JobStatus.RUNNING
+        if self.started_time is None:
+            self._set_fields(
+                status=JobStatus.RUNNING,
+                started_time=datetime.now(timezone.utc),
+            )
+        else:
+            self.status = JobStatus.RUNNING
+
+    def seconds_running(self) -> float:
+        """Seconds since the job's first step started running."""
+        if self.started_time is None:
+            return 0.0
+        return time.time() - self.started_time.timestamp()
 
     def mark_step_n_completed(
         self,
         n: int,
         return_value: Any,
         total_steps: int,
+        *,
+        steps_run: int = 1,
+        step_return_values: dict[int, Any] | None = None,
     ) -> None:
-        self.current_step = n
-        self.steps_completed = min(self.steps_completed + 1, total_steps)
-        self.percent_completed = float((self.steps_completed / total_steps) * 100)
-        self.status = (
-            JobStatus.COMPLETED
-            if self.steps_completed == total_steps
-            else JobStatus.PENDING
+        if step_return_values is not None:
+            self._set_fields(step_return_values=step_return_values)
+
+        steps_completed = min(self.steps_completed + steps_run, total_steps)
+        self._set_fields(
+            current_step=n,
+            steps_completed=steps_completed,
+            percent_completed=float((steps_completed / total_steps) * 100),
+            status=(
+                JobStatus.COMPLETED
+                if steps_completed == total_steps
+                else JobStatus.PENDING
+            ),
+            last_return_value=return_value,
+            attempt=1,
         )
-        self.last_return_value = return_value
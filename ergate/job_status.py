@@ -64,3 +64,9 @@ class JobStatus(IntEnum):
     Job was marked for cancellation and has now reached
     a state where no further steps will run.
     """
+
+    WAITING = auto()
+    """
+    Job has reached a mapped step, and is waiting for the child
+    jobs it was split into to finish.
+    """
@@ -1,3 +1,131 @@
-from logging import getLogger
+import reprlib
+from logging import Handler, Logger, getLogger
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Any, Literal
 
 LOG = getLogger("ergate")
+
+ValueLoggingMode = Literal["repr", "summary", "omit"]
+
+VALUE_LOGGING_MODES: tuple[ValueLoggingMode, ...] = ("repr", "summary", "omit")
+
+
+class LogSettings:
+    """
+    Settings for what a worker logs about the jobs it runs.
+
+    `values` determines how input and return values appear in logs:
+    `"repr"` (the default) logs them in full, as they always have been,
+    `"summary"` logs a representation abbreviated with `reprlib` and cut to
+    at most `max_length` characters, and `"omit"` leaves them out entirely.
+    Values are only ever formatted if the record is actually emitted.
+
+    If `queue` is set, records from the `ergate` logger are handed to a
+    queue and passed on to the handlers by a background thread while the
+    worker runs, so slow handlers don't hold up the steps being run.
+    """
+
+    def __init__(
+        self,
+        *,
+        values: ValueLoggingMode = "repr",
+        max_length: int = 200,
+        queue: bool = False,
+    ) -> None:
+        if values not in VALUE_LOGGING_MODES:
+            raise ValueError(f"Invalid value logging mode: {values}")
+
+        if max_length < 4:
+            raise ValueError("max_length must be at least 4")
+
+        self.values = values
+        self.max_length = max_length
+        self.queue = queue
+
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = max_length
+        self._repr.maxother = max_length
+
+    def describe(self, value: Any) -> object:
+        """
+        Returns an object that is formatted as the given value according to
+        these settings, for use as a logging argument.
+        """
+        if self.values == "repr":
+            return value
+
+        if self.values == "omit":
+            return "<omitted>"
+
+        return _LoggedValue(self, value)
+
+    def format_value(self, value: Any) -> str:
+        if self.values == "repr":
+            return str(value)
+
+        text = self._repr.repr(value)
+        if len(text) > self.max_length:
+            text = text[: self.max_length - 3] + "..."
+        return text
+
+
+class _LoggedValue:
+    __slots__ = ("settings", "value")
+
+    def __init__(self, settings: LogSettings, value: Any) -> None:
+        self.settings = settings
+        self.value = value
+
+    def __str__(self) -> str:
+        return self.settings.format_value(self.value)
+
+    __repr__ = __str__
+
+
+def _effective_handlers(logger: Logger) -> list[Handler]:
+    handlers: list[Handler] = []
+    current: Logger | None = logger
+    while current is not None:
+        handlers.extend(current.handlers)
+        if not current.propagate:
+            break
+        current = current.parent
+    return handlers
+
+
+class QueuedLogging:
+    """
+    Routes a logger's records through a queue to the handlers it would
+    otherwise use, which are called by a background thread instead.
+    """
+
+    def __init__(self, logger: Logger = LOG) -> None:
+        self.logger = logger
+        self._listener: QueueListener | None = None
+        self._handlers: list[Handler] = []
+        self._propagate = logger.propagate
+
+    def start(self) -> None:
+        handlers = _effective_handlers(self.logger)
+        queue: SimpleQueue[Any] = SimpleQueue()
+
+        self._handlers = self.logger.handlers[:]
+        self._propagate = self.logger.propagate
+
+        self._listener = QueueListener(queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+
+        self.logger.handlers = [QueueHandler(queue)]
+        self.logger.propagate = False
+
+    def stop(self) -> None:
+        if self._listener is None:
+            return
+
+        self.logger.handlers = self._handlers
+        self.logger.propagate = self._propagate
+
+        # Handles whatever is still queued before returning
+        self._listener.stop()
+        self._listener = None
@@ -1,6 +1,18 @@
 class WorkflowPath:
     """Base class for workflow paths."""
 
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return vars(self) == vars(other)
+
+    def __hash__(self) -> int:
+        return hash((type(self), *sorted(vars(self).items())))
+
+    def __repr__(self) -> str:
+        attributes = ", ".join(f"{key}={value!r}" for key, value in vars(self).items())
+        return f"{type(self).__name__}({attributes})"
+
 
 class GoToEndPath(WorkflowPath):
     """WorkflowPath class for the `GoToEnd` exception."""
@@ -1,3 +1,6 @@
 from .app import ErgatePublisher
+from .batching import PublishBatching
+from .routing import QueueRouter
+from .schedule import Polling
 
-__all__ = ("ErgatePublisher",)
+__all__ = ("ErgatePublisher", "Polling", "PublishBatching", "QueueRouter")
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import time
 from collections.abc import Generator
-from contextlib import ExitStack
-from typing import Generic, TypeVar
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, closing
+from typing import Generic, TypeVar, cast
 
 from ..job import Job
+from ..log import LOG
 from ..types import Lifespan
-from .protocols import PublisherDriverProtocol, PublisherQueueProtocol
+from .batching import JobFeed, PublishBatching
+from .protocols import (
+    BatchPublisherDriverProtocol,
+    PublisherDriverProtocol,
+    PublisherQueueProtocol,
+)
+from .schedule import JobSchedule, Polling
 
 JobType = TypeVar("JobType", bound=Job)
 
@@ -24,10 +33,20 @@ class ErgatePublisher(Generic[JobType]):
         driver: PublisherDriverProtocol[JobType],
         queue: PublisherQueueProtocol[JobType],
         lifespan: Lifespan[ErgatePublisher[JobType]] | None = None,
+        *,
+        batching: PublishBatching | None = None,
+        polling: Polling | None = None,
     ) -> None:
+        if batching is not None and not hasattr(driver, "report_failures"):
+            raise ValueError(
+                "Batched publishing requires the driver to implement `report_failures`"
+            )
+
         self.driver = driver
         self.queue = queue
         self.lifespan = lifespan
+        self.batching = batching
+        self.polling = polling
 
     def run(self) -> None:
         """
@@ -37,35 +56,254 @@ class ErgatePublisher(Generic[JobType]):
         This method will continue to fetch and publish jobs until
         there are no more jobs to process (`StopIteration` is raised
         from the state store), at which point it will exit gracefully.
+
+        If polling is enabled, the publisher will instead keep asking
+        the driver for more jobs until it is interrupted.
         """
 
         with ExitStack() as stack:
             if self.lifespan:
                 stack.enter_context(self.lifespan(self))
 
-            generator = self.driver.generate_jobs()
-            while True:
+            if self.polling is not None:
                 try:
-                    self._get_and_publish_next_job(generator)
+                    self._run_persistently(self.polling)
+                except KeyboardInterrupt:
+                    LOG.info("Publisher interrupted - exiting")
+                return
+
+            self._publish(self.driver.generate_jobs())
+
+    def _run_persistently(self, polling: Polling) -> None:
+        """
+        Repeatedly asks the driver for jobs, backing off while it has none.
+
+        Jobs whose `requested_start_time` is in the future are taken from the
+        driver and held in memory until they are due, at which point they are
+        published. Drivers should therefore yield scheduled jobs ahead of time
+        (and only once), and keep in mind that held jobs are lost if the
+        publisher stops before they are due.
+        """
+
+        schedule: JobSchedule[JobType] = JobSchedule()
+        interval = polling.min_interval
+
+        while True:
+            received = [0]
+            self._publish(
+                self._hold_scheduled(self.driver.generate_jobs(), schedule, received)
+            )
+            interval = polling.next_interval(interval, received[0] > 0)
+
+            refill_at = time.monotonic() + interval
+            while (remaining := refill_at - time.monotonic()) > 0:
+                until_due = schedule.seconds_until_next()
+                time.sleep(
+                    remaining if until_due is None else min(remaining, until_due)
+                )
+                self._publish(self._release_due(schedule))
+
+    def _hold_scheduled(
+        self,
+        generator: Generator[JobType, None, None],
+        schedule: JobSchedule[JobType],
+        received: list[int],
+    ) -> Generator[JobType, None, None]:
+        """
+        Wraps the driver's generator so that jobs which aren't due yet are
+        held in the schedule, and held jobs are published as soon as they
+        become due. Exceptions thrown in for jobs coming from the driver are
+        thrown back to the driver's generator.
+        """
+
+        job: JobType | None = None
+
+        while True:
+            yield from self._release_due(schedule)
+
+            if job is None:
+                try:
+                    job = next(generator)
                 except StopIteration:
-                    break
+                    return
+                received[0] += 1
 
-    def _get_and_publish_next_job(
+            if schedule.hold(job):
+                job = None
+                continue
+
+            try:
+                yield job
+            except Exception as exc:
+                try:
+                    job = generator.throw(exc)
+                except StopIteration:
+                    return
+                received[0] += 1
+            else:
+                job = None
+
+    def _release_due(
+        self,
+        schedule: JobSchedule[JobType],
+    ) -> Generator[JobType, None, None]:
+        for job in schedule.pop_due():
+            try:
+                yield job
+            except Exception as exc:
+                self._report_failures([(job, exc)])
+
+    def _publish(self, generator: Generator[JobType, None, None]) -> None:
+        if self.batching is not None:
+            self._publish_in_batches(generator, self.batching)
+            return
+
+        try:
+            job = next(generator)
+        except StopIteration:
+            return
+
+        while True:
+            try:
+                job = self._publish_and_get_next_job(generator, job)
+            except StopIteration:
+                break
+
+    def _publish_and_get_next_job(
         self,
         generator: Generator[JobType, None, None],
-    ) -> None:
+        job: JobType,
+    ) -> JobType:
         """
-        Fetches the next job from the generator and publishes it to the queue.
-        If an exception occurs while publishing, it will be thrown back
-        to the generator, allowing it to handle the exception appropriately.
+        Publishes the job to the queue and fetches the next one from the
+        generator. If an exception occurs while publishing, it will be thrown
+        back to the generator, allowing it to handle the exception
+        appropriately; if the generator then yields another job, that job is
+        the next one to be published.
 
         This method is intended to be called repeatedly until the generator
         raises `StopIteration`, indicating that there are no more jobs to process.
         """
 
-        job = next(generator)
-
         try:
+            job.mark_published()
             self.queue.publish_job(job)
         except Exception as exc:
-            generator.throw(exc)
+            return generator.throw(exc)
+
+        return next(generator)
+
+    def _publish_in_batches(
+        self,
+        generator: Generator[JobType, None, None],
+        batching: PublishBatching,
+    ) -> None:
+        """
+        Publishes jobs from the generator in batches. While a batch is being
+        published, the next one is already being collected from the driver.
+
+        Failures are reported to the driver through `report_failures` once
+        the batch they belong to has been published. Note that, unlike when
+        publishing jobs one at a time, the generator is resumed before the
+        job it yielded has been published.
+        """
+
+        feed = JobFeed(generator, batching.size)
+        with (
+            ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="ergate-publisher",
+            ) as executor,
+            closing(feed),
+        ):
+            in_flight: Future[list[tuple[JobType, Exception]]] | None = None
+
+            while True:
+                batch: list[JobType] = []
+                try:
+                    self._collect_batch(feed, batching, batch)
+                except BaseException:
+                    # The driver raised, but the jobs it yielded before that
+                    # are still published, and every failure is reported.
+                    try:
+                        if in_flight is not None:
+                            self._report_failures(in_flight.result())
+                    finally:
+                        if batch:
+                            self._report_failures(self._publish_batch(batch))
+                    raise
+
+                if in_flight is not None:
+                    self._report_failures(in_flight.result())
+                    in_flight = None
+
+                if not batch:
+                    break
+
+                in_flight = executor.submit(self._publish_batch, batch)
+
+    def _collect_batch(
+        self,
+        feed: JobFeed[JobType],
+        batching: PublishBatching,
+        batch: list[JobType],
+    ) -> None:
+        """
+        Adds jobs from the feed to the batch until it's full or its linger
+        time has passed. Jobs are added as they're received, so the batch
+        holds them even if the driver raises.
+        """
+        deadline: float | None = None
+
+        while len(batch) < batching.size:
+            timeout = (
+                None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            )
+            try:
+                job = feed.get(timeout)
+            except StopIteration:
+                break
+
+            if job is None:
+                break
+
+            batch.append(job)
+
+            if deadline is None:
+                deadline = time.monotonic() + batching.linger
+
+    def _publish_batch(self, batch: list[JobType]) -> list[tuple[JobType, Exception]]:
+        for job in batch:
+            job.mark_published()
+
+        publish_jobs = getattr(self.queue, "publish_jobs", None)
+
+        if publish_jobs is None:
+            failures: list[tuple[JobType, Exception]] = []
+            for job in batch:
+                try:
+                    self.queue.publish_job(job)
+                except Exception as exc:
+                    failures.append((job, exc))
+            return failures
+
+        try:
+            results = publish_jobs(batch)
+        except Exception as exc:
+            return [(job, exc) for job in batch]
+
+        return [(job, exc) for job, exc in zip(batch, results) if exc is not None]
+
+    def _report_failures(self, failures: list[tuple[JobType, Exception]]) -> None:
+        if not failures:
+            return
+
+        LOG.warning("Failed to publish %d job(s)", len(failures))
+
+        if not hasattr(self.driver, "report_failures"):
+            for job, exc in failures:
+                LOG.error("Failed to publish job %s", job.id, exc_info=exc)
+            return
+
+        driver = cast(BatchPublisherDriverProtocol[JobType], self.driver)
+        driver.report_failures(failures)
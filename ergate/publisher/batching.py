@@ -0,0 +1,110 @@
+import queue
+import threading
+from collections.abc import Generator
+from typing import Generic, TypeVar
+
+from ..job import Job
+
+JobType = TypeVar("JobType", bound=Job)
+
+# How often the thread reading the driver checks whether it must stop
+_PUT_INTERVAL = 0.1
+
+
+class PublishBatching:
+    """
+    Settings for publishing jobs in batches.
+
+    Jobs are collected from the driver until `size` jobs have been gathered
+    or `linger` seconds have passed since the first job of the batch was
+    received, whichever happens first. The driver is read by a background
+    thread, so a batch is published on time even while the driver takes a
+    while to yield the next job.
+    """
+
+    def __init__(self, *, size: int = 100, linger: float = 0.05) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+
+        if linger < 0:
+            raise ValueError("linger cannot be negative")
+
+        self.size = size
+        self.linger = linger
+
+
+class JobFeed(Generic[JobType]):
+    """
+    Reads jobs from a generator in a background thread, so that waiting
+    for the next one can be given a time limit. At most `maxsize` jobs are
+    read ahead.
+    """
+
+    def __init__(
+        self, generator: Generator[JobType, None, None], maxsize: int
+    ) -> None:
+        self._generator = generator
+        # Holds jobs, then `(None, None)` once the generator is exhausted or
+        # `(None, exception)` if it raised
+        self._items: queue.Queue[tuple[JobType | None, BaseException | None]] = (
+            queue.Queue(maxsize)
+        )
+        self._stopped = threading.Event()
+        self._exhausted = False
+        self._thread = threading.Thread(
+            target=self._read,
+            name="ergate-publisher-feed",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _put(self, item: tuple[JobType | None, BaseException | None]) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._items.put(item, timeout=_PUT_INTERVAL)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _read(self) -> None:
+        try:
+            for job in self._generator:
+                if not self._put((job, None)):
+                    self._generator.close()
+                    return
+        except BaseException as exc:
+            self._put((None, exc))
+        else:
+            self._put((None, None))
+
+    def get(self, timeout: float | None) -> JobType | None:
+        """
+        Returns the next job, or `None` if there wasn't one within `timeout`
+        seconds. Raises `StopIteration` once the generator is exhausted, and
+        whatever the generator raised.
+        """
+        if self._exhausted:
+            raise StopIteration
+
+        try:
+            job, exc = self._items.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        if job is not None:
+            return job
+
+        self._exhausted = True
+        if exc is not None:
+            raise exc
+        raise StopIteration
+
+    def close(self) -> None:
+        """
+        Stops reading jobs. If the generator hasn't been exhausted, it's
+        closed by the background thread once it yields another job.
+        """
+        self._stopped.set()
+        if self._exhausted:
+            self._thread.join()
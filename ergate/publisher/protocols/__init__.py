@@ -1,7 +1,9 @@
-from .driver import PublisherDriverProtocol
-from .queue import PublisherQueueProtocol
+from .driver import BatchPublisherDriverProtocol, PublisherDriverProtocol
+from .queue import BatchPublisherQueueProtocol, PublisherQueueProtocol
 
 __all__ = (
+    "BatchPublisherDriverProtocol",
+    "BatchPublisherQueueProtocol",
     "PublisherQueueProtocol",
     "PublisherDriverProtocol",
 )
@@ -1,10 +1,20 @@
-from collections.abc import Generator
+from collections.abc import Generator, Sequence
 from typing import Protocol, TypeVar
 
 from ...job import Job
 
 JobType = TypeVar("JobType", bound=Job, covariant=True)
+BatchJobType = TypeVar("BatchJobType", bound=Job)
 
 
 class PublisherDriverProtocol(Protocol[JobType]):
     def generate_jobs(self) -> Generator[JobType, None, None]: ...
+
+
+class BatchPublisherDriverProtocol(
+    PublisherDriverProtocol[BatchJobType], Protocol[BatchJobType]
+):
+    def report_failures(
+        self,
+        failures: Sequence[tuple[BatchJobType, Exception]],
+    ) -> None: ...
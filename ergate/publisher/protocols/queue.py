@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from typing import Protocol, TypeVar
 
 from ...job import Job
@@ -7,3 +8,7 @@ JobType = TypeVar("JobType", bound=Job, contravariant=True)
 
 class PublisherQueueProtocol(Protocol[JobType]):
     def publish_job(self, job: JobType) -> None: ...
+
+
+class BatchPublisherQueueProtocol(PublisherQueueProtocol[JobType], Protocol[JobType]):
+    def publish_jobs(self, jobs: Sequence[JobType]) -> Sequence[Exception | None]: ...
@@ -0,0 +1,66 @@
+from collections.abc import Callable, Mapping, Sequence
+from typing import Generic, TypeVar
+
+from ..job import Job
+from .protocols import PublisherQueueProtocol
+
+JobType = TypeVar("JobType", bound=Job)
+
+
+def _workflow_name(job: Job) -> str:
+    return job.workflow_name
+
+
+class QueueRouter(Generic[JobType]):
+    """
+    Publisher queue that publishes each job to one of several queues, by
+    the class `classify` returns for it (its workflow's name by default).
+    Pairs with the worker's `FairScheduler`, which takes jobs from the same
+    queues.
+
+    Publishing a job whose class has no queue raises `KeyError`.
+    """
+
+    def __init__(
+        self,
+        queues: Mapping[str, PublisherQueueProtocol[JobType]],
+        *,
+        classify: Callable[[JobType], str] = _workflow_name,
+    ) -> None:
+        if not queues:
+            raise ValueError("At least one queue is required")
+
+        self.queues = queues
+        self.classify = classify
+
+    def publish_job(self, job: JobType) -> None:
+        self.queues[self.classify(job)].publish_job(job)
+
+    def publish_jobs(self, jobs: Sequence[JobType]) -> Sequence[Exception | None]:
+        results: list[Exception | None] = [None] * len(jobs)
+        groups: dict[str, list[int]] = {}
+
+        for index, job in enumerate(jobs):
+            job_class = self.classify(job)
+            if job_class in self.queues:
+                groups.setdefault(job_class, []).append(index)
+            else:
+                results[index] = KeyError(job_class)
+
+        for job_class, indexes in groups.items():
+            queue = self.queues[job_class]
+            group = [jobs[index] for index in indexes]
+
+            publish_jobs = getattr(queue, "publish_jobs", None)
+            if publish_jobs is not None:
+                for index, result in zip(indexes, publish_jobs(group)):
+                    results[index] = result
+                continue
+
+            for index, job in zip(indexes, group):
+                try:
+                    queue.publish_job(job)
+                except Exception as exc:
+                    results[index] = exc
+
+        return results
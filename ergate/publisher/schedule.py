@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import time
+from typing import Generic, TypeVar
+
+from ..job import Job
+
+JobType = TypeVar("JobType", bound=Job)
+
+
+class Polling:
+    """
+    Settings for running the publisher persistently.
+
+    Rather than exiting once the driver runs out of jobs, the publisher asks
+    the driver for more jobs again after `min_interval` seconds. Every time
+    the driver comes back empty-handed, the interval is multiplied by
+    `backoff`, up to `max_interval`, and it is reset as soon as the driver
+    yields jobs again.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_interval: float = 0.5,
+        max_interval: float = 10.0,
+        backoff: float = 2.0,
+    ) -> None:
+        if min_interval <= 0:
+            raise ValueError("min_interval must be positive")
+
+        if max_interval < min_interval:
+            raise ValueError("max_interval cannot be lower than min_interval")
+
+        if backoff < 1:
+            raise ValueError("backoff must be at least 1")
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+    def next_interval(self, interval: float, received: bool) -> float:
+        if received:
+            return self.min_interval
+        return min(interval * self.backoff, self.max_interval)
+
+
+class JobSchedule(Generic[JobType]):
+    """
+    Min-heap of jobs that are waiting for their requested start time.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, JobType]] = []
+        # Counter of the current entry of each held job with an ID. Entries
+        # that have been replaced stay in the heap and are skipped later.
+        self._held: dict[object, int] = {}
+        self._replaced = 0
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._replaced
+
+    def hold(self, job: JobType) -> bool:
+        """
+        Holds the job until its requested start time if it isn't due yet.
+        A job with the same ID that was being held is replaced by it, since
+        its start time may have changed. Returns whether the job is held.
+        """
+
+        if job.id is not None and self._held.pop(job.id, None) is not None:
+            self._replaced += 1
+
+        if job.requested_start_time is None:
+            return False
+
+        start_time = job.requested_start_time.timestamp()
+        if start_time <= time.time():
+            return False
+
+        # The counter breaks ties so that jobs themselves are never compared
+        count = next(self._counter)
+        heapq.heappush(self._heap, (start_time, count, job))
+        if job.id is not None:
+            self._held[job.id] = count
+
+        return True
+
+    def _drop_replaced(self) -> None:
+        while self._heap:
+            _, count, job = self._heap[0]
+            if job.id is None or self._held.get(job.id) == count:
+                return
+            heapq.heappop(self._heap)
+            self._replaced -= 1
+
+    def pop_due(self) -> list[JobType]:
+        now = time.time()
+        due: list[JobType] = []
+
+        self._drop_replaced()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, job = heapq.heappop(self._heap)
+            if job.id is not None:
+                del self._held[job.id]
+            due.append(job)
+            self._drop_replaced()
+
+        return due
+
+    def seconds_until_next(self) -> float | None:
+        self._drop_replaced()
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - time.time(), 0.0)
@@ -0,0 +1,61 @@
+class RateLimit:
+    """
+    Limits how many of the steps it applies to may run at once, and how
+    often they may start, across every job.
+
+    At most `max_concurrency` of them may run at the same time, and they
+    may start at most `rate` times per second on average, in bursts of up
+    to `burst`. Limits with the same `key` are shared; by default, each
+    workflow or step that a limit is given to has a limit of its own.
+
+    Rather than waiting in the worker, a job whose step can't start yet is
+    marked as `SCHEDULED` with a `requested_start_time`, so the step is
+    published again once it's likely to be able to. That's once a token
+    is due when `rate` is what stops it, or after `defer` seconds when
+    `max_concurrency` is.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int | None = None,
+        rate: float | None = None,
+        burst: int = 1,
+        defer: float = 1.0,
+        key: str | None = None,
+    ) -> None:
+        if max_concurrency is None and rate is None:
+            raise ValueError("Either max_concurrency or rate must be given")
+
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        if defer <= 0:
+            raise ValueError("defer must be positive")
+
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.defer = defer
+        self.key = key
+
+    def refill(self, tokens: float | None, elapsed: float) -> float:
+        """
+        Returns how many tokens a bucket that had `tokens` (or that didn't
+        exist yet, if `None`) has after `elapsed` seconds.
+        """
+        if tokens is None or self.rate is None:
+            return float(self.burst)
+        return min(float(self.burst), tokens + elapsed * self.rate)
+
+    def get_token_delay(self, tokens: float) -> float:
+        """Seconds until a bucket that has `tokens` has a whole token."""
+        if self.rate is None or tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate
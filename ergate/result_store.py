@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import mmap
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol
+from urllib.parse import quote
+
+from .job_status import JobStatus
+from .serialization import LazyPayload, PickleSerializer, Serializer, get_serializer
+
+if TYPE_CHECKING:
+    from .job import Job
+
+RESULT_REF_KEY = "$ergate_result"
+
+FINAL_STATUSES = frozenset((
+    JobStatus.COMPLETED,
+    JobStatus.FAILED,
+    JobStatus.ABORTED,
+    JobStatus.CANCELLED,
+))
+
+
+class ResultStoreProtocol(Protocol):
+    def put(self, job_key: str, data: bytes) -> str:
+        """Stores data for a job and returns the key to retrieve it with."""
+        ...
+
+    def get(self, key: str) -> bytes | memoryview: ...
+
+    def delete_job(self, job_key: str) -> None:
+        """Deletes everything stored for a job."""
+        ...
+
+
+class FilesystemResultStore:
+    """
+    Stores results as files in a directory, with one subdirectory per job.
+    Results are memory-mapped when read, so formats that support it (such
+    as pickle with out-of-band buffers) can use them without copying.
+
+    Every worker (and publisher, if it reads results) must be able to
+    access the same directory.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.directory / key).resolve()
+        if not path.is_relative_to(self.directory.resolve()):
+            raise ValueError(f"Invalid result key: {key}")
+        return path
+
+    def put(self, job_key: str, data: bytes) -> str:
+        job_dir = quote(job_key, safe="")
+        key = f"{job_dir}/{uuid.uuid4().hex}"
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        # Written under a temporary name first so readers never see part of it
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+        return key
+
+    def get(self, key: str) -> bytes | memoryview:
+        with open(self._path(key), "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b""
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)
+
+    def delete_job(self, job_key: str) -> None:
+        shutil.rmtree(self._path(quote(job_key, safe="")), ignore_errors=True)
+
+
+class ResultOffloading:
+    """
+    Settings for storing large return values in a result store rather
+    than in the job itself.
+
+    When a job's state is persisted, a last return value that takes at
+    least `threshold` bytes once encoded with `serializer` is written to
+    `store`, and the job carries a small reference to it instead. So is
+    each of the return values kept for steps with `depends_on`. References
+    are resolved when the values are used as a step's input value. Once
+    the job reaches a final state, its return values are put back into
+    the job and everything stored for it is deleted.
+
+    Jobs without an ID are never offloaded.
+    """
+
+    def __init__(
+        self,
+        store: ResultStoreProtocol,
+        *,
+        threshold: int = 1024 * 1024,
+        serializer: Serializer | None = None,
+    ) -> None:
+        if threshold < 0:
+            raise ValueError("threshold cannot be negative")
+
+        self.store = store
+        self.threshold = threshold
+        self.serializer = serializer or PickleSerializer()
+
+    @staticmethod
+    def is_ref(value: Any) -> bool:
+        return isinstance(value, dict) and RESULT_REF_KEY in value
+
+    def _is_small(self, value: Any) -> bool:
+        # Avoids encoding values that can't possibly reach the threshold
+        if value is None or isinstance(value, (bool, int, float)):
+            return True
+        if isinstance(value, (str, bytes, bytearray)):
+            return len(value) < self.threshold
+        return False
+
+    def offload(self, job: Job, value: Any) -> Any:
+        """Returns a reference to the stored value if it's large enough."""
+        if job.id is None or self.is_ref(value) or self._is_small(value):
+            return value
+
+        data = self.serializer.dumps(value)
+        if len(data) < self.threshold:
+            return value
+
+        key = self.store.put(str(job.id), data)
+        return {RESULT_REF_KEY: key, "format": self.serializer.format_id}
+
+    def resolve(self, value: Any) -> Any:
+        """Returns the value a reference refers to, or the value itself."""
+        if not self.is_ref(value):
+            return value
+
+        format_id = value["format"]
+        serializer = (
+            self.serializer
+            if format_id == self.serializer.format_id
+            else get_serializer(format_id)
+        )
+        return serializer.loads(memoryview(self.store.get(value[RESULT_REF_KEY])))
+
+    def prepare(self, job: Job) -> None:
+        """Offloads or collects the job's results before its state is stored."""
+        if job.status in FINAL_STATUSES:
+            self.collect(job)
+            return
+
+        # Values still encoded as they were received went through this
+        # already before the job was stored by whoever ran the previous step.
+        if not isinstance(job.last_return_value, LazyPayload):
+            job.last_return_value = self.offload(job, job.last_return_value)
+
+        if job.step_return_values:
+            job.step_return_values = {
+                index: self.offload(job, value)
+                for index, value in job.step_return_values.items()
+            }
+
+    def _collect_value(self, value: Any) -> Any:
+        if isinstance(value, LazyPayload):
+            value = value.load()
+
+        if not self.is_ref(value):
+            return value
+
+        value = self.resolve(value)
+        # Must not keep referring to files that are about to be deleted
+        if isinstance(value, memoryview):
+            value = value.tobytes()
+        return value
+
+    def collect(self, job: Job) -> None:
+        if job.id is None:
+            return
+
+        value = job.last_return_value
+        if isinstance(value, LazyPayload) or self.is_ref(value):
+            job.last_return_value = self._collect_value(value)
+
+        if any(self.is_ref(value) for value in job.step_return_values.values()):
+            job.step_return_values = {
+                index: self._collect_value(value)
+                for index, value in job.step_return_values.items()
+            }
+
+        self.store.delete_job(str(job.id))
@@ -0,0 +1,84 @@
+import random
+
+from .exceptions import (
+    InvalidDefinitionError,
+    JobTimeoutError,
+    ReverseGoToError,
+    UnknownStepError,
+)
+
+# Retrying can't help with these, since they'd be raised again regardless
+_NEVER_RETRIED = (
+    InvalidDefinitionError,
+    JobTimeoutError,
+    ReverseGoToError,
+    UnknownStepError,
+)
+
+
+class RetryPolicy:
+    """
+    Determines whether a step that raised an exception is run again, and
+    after how long.
+
+    A step is attempted at most `max_attempts` times, as long as the
+    exceptions it raises are instances of `retry_on` and not of
+    `ignore`. Attempt `n` is retried after `backoff * multiplier ** (n - 1)`
+    seconds, up to `max_backoff`, of which a random fraction of up to
+    `jitter` is taken off so that jobs failing together don't all retry
+    at the same time.
+
+    Rather than waiting in the worker, a job that is to be retried is
+    marked as `SCHEDULED` with a `requested_start_time`, so the step is
+    published again once it's due.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        retry_on: type[Exception] | tuple[type[Exception], ...] = Exception,
+        ignore: type[Exception] | tuple[type[Exception], ...] = (),
+        backoff: float = 1.0,
+        multiplier: float = 2.0,
+        max_backoff: float = 300.0,
+        jitter: float = 1.0,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        if backoff < 0:
+            raise ValueError("backoff cannot be negative")
+
+        if multiplier < 1:
+            raise ValueError("multiplier must be at least 1")
+
+        if max_backoff < backoff:
+            raise ValueError("max_backoff cannot be lower than backoff")
+
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+
+        self.max_attempts = max_attempts
+        self.retry_on = retry_on
+        self.ignore = ignore
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def should_retry(self, exc: Exception, attempt: int) -> bool:
+        """Whether a step that raised `exc` on the given attempt runs again."""
+        return (
+            attempt < self.max_attempts
+            and isinstance(exc, self.retry_on)
+            and not isinstance(exc, self.ignore)
+            and not isinstance(exc, _NEVER_RETRIED)
+        )
+
+    def get_delay(self, attempt: int) -> float:
+        """Seconds to wait before retrying a step that failed on `attempt`."""
+        delay: float = min(
+            self.backoff * self.multiplier ** (attempt - 1), self.max_backoff
+        )
+        return delay * (1 - self.jitter * random.random())
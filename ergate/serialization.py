@@ -0,0 +1,304 @@
+"""
+Serializers for job payloads, and the compact binary format jobs are
+written in by `Job.to_bytes` and read from by `Job.from_bytes`.
+
+A serialized job starts with a fixed-size header, followed by the job's
+other fields and then each payload field (`initial_input_value`,
+`last_return_value`, `user_context` and `step_return_values`) as
+separately encoded sections:
+
+    magic (2) | version (1) | format ID (1) | 5 x section length (4 each)
+    | fields | initial_input_value | last_return_value | user_context
+    | step_return_values
+
+Payload sections are only decoded once they're accessed, and sections
+that were never accessed are written back as they are.
+"""
+
+from __future__ import annotations
+
+import importlib
+import pickle
+import struct
+from typing import TYPE_CHECKING, Any, Protocol, TypeVar
+
+from pydantic_core import (
+    SchemaSerializer,
+    core_schema,
+    from_json,
+    to_json,
+    to_jsonable_python,
+)
+
+from .exceptions import SerializationError
+
+if TYPE_CHECKING:
+    from .job import Job
+
+JobType = TypeVar("JobType", bound="Job")
+
+PAYLOAD_FIELDS = (
+    "initial_input_value",
+    "last_return_value",
+    "user_context",
+    "step_return_values",
+)
+
+_MAGIC = b"EJ"
+_VERSION = 1
+_HEADER = struct.Struct("<2sBB5I")
+_PICKLE_BUFFER_COUNT = struct.Struct("<I")
+_PICKLE_BUFFER_LENGTH = struct.Struct("<Q")
+
+
+class Serializer(Protocol):
+    format_id: int
+    """
+    Identifies the format in serialized jobs. IDs below 128 are reserved
+    for the serializers provided by ergate.
+    """
+
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, data: memoryview) -> Any: ...
+
+
+# Serializers may also set `copies_data = True` if the values they load never
+# refer to the data they were loaded from. Steps are then handed values that
+# were loaded just for them without another copy being made.
+
+
+class JsonSerializer:
+    """JSON, as produced by pydantic. Requires no additional dependencies."""
+
+    format_id = 1
+    copies_data = True
+
+    def dumps(self, value: Any) -> bytes:
+        return to_json(value)
+
+    def loads(self, data: memoryview) -> Any:
+        return from_json(bytes(data))
+
+
+def _import_optional(name: str, serializer: str) -> Any:
+    try:
+        return importlib.import_module(name)
+    except ImportError as exc:
+        raise ImportError(
+            f"{serializer} requires the {name} package, which can be installed "
+            f"with: pip install ergate[{name}]"
+        ) from exc
+
+
+class OrjsonSerializer:
+    """JSON, as produced by orjson. Requires the `orjson` package."""
+
+    format_id = 2
+    copies_data = True
+
+    def __init__(self) -> None:
+        self._orjson = _import_optional("orjson", type(self).__name__)
+
+    def dumps(self, value: Any) -> bytes:
+        data: bytes = self._orjson.dumps(value, default=to_jsonable_python)
+        return data
+
+    def loads(self, data: memoryview) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackSerializer:
+    """
+    MessagePack, as produced by msgpack. Requires the `msgpack` package.
+    Tuples are read back as lists.
+    """
+
+    format_id = 3
+    copies_data = True
+
+    def __init__(self) -> None:
+        self._msgpack = _import_optional("msgpack", type(self).__name__)
+
+    def dumps(self, value: Any) -> bytes:
+        data: bytes = self._msgpack.packb(
+            value, default=to_jsonable_python, use_bin_type=True
+        )
+        return data
+
+    def loads(self, data: memoryview) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+class PickleSerializer:
+    """
+    Pickle protocol 5. Buffers that support out-of-band pickling (such as
+    `bytearray`s or NumPy arrays) are written after the pickle stream as
+    they are rather than copied into it, and handed back to the unpickler
+    as views of the serialized job.
+
+    Only use it with jobs from trusted sources, since unpickling data can
+    execute arbitrary code.
+    """
+
+    format_id = 4
+    copies_data = False
+
+    def dumps(self, value: Any) -> bytes:
+        buffers: list[pickle.PickleBuffer] = []
+        stream = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+
+        parts: list[bytes | memoryview] = [_PICKLE_BUFFER_COUNT.pack(len(buffers))]
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        for raw in raw_buffers:
+            parts.append(_PICKLE_BUFFER_LENGTH.pack(raw.nbytes))
+        parts.extend(raw_buffers)
+        parts.append(stream)
+        return b"".join(parts)
+
+    def loads(self, data: memoryview) -> Any:
+        (count,) = _PICKLE_BUFFER_COUNT.unpack_from(data)
+        offset = _PICKLE_BUFFER_COUNT.size
+
+        lengths = []
+        for _ in range(count):
+            (length,) = _PICKLE_BUFFER_LENGTH.unpack_from(data, offset)
+            lengths.append(length)
+            offset += _PICKLE_BUFFER_LENGTH.size
+
+        buffers = []
+        for length in lengths:
+            end = offset + length
+            buffers.append(data[offset:end])
+            offset = end
+
+        return pickle.loads(data[offset:], buffers=buffers)
+
+
+_BUILTIN_SERIALIZERS: dict[int, type[Serializer]] = {
+    JsonSerializer.format_id: JsonSerializer,
+    OrjsonSerializer.format_id: OrjsonSerializer,
+    MsgpackSerializer.format_id: MsgpackSerializer,
+    PickleSerializer.format_id: PickleSerializer,
+}
+
+
+def get_serializer(format_id: int) -> Serializer:
+    """Returns a new instance of the built-in serializer for the given format."""
+    try:
+        serializer_type = _BUILTIN_SERIALIZERS[format_id]
+    except KeyError:
+        raise SerializationError(
+            f"Data was serialized with unknown format {format_id}; "
+            "pass the serializer it was written with"
+        ) from None
+    return serializer_type()
+
+
+def _load_payload(payload: LazyPayload) -> Any:
+    return payload.load()
+
+
+def _restore_payload(data: bytes, serializer: Serializer) -> LazyPayload:
+    return LazyPayload(memoryview(data), serializer)
+
+
+class LazyPayload:
+    """
+    A payload field of a deserialized job that hasn't been decoded yet.
+    Dumping a job with pydantic decodes it as needed.
+    """
+
+    __slots__ = ("data", "serializer")
+    __pydantic_serializer__ = SchemaSerializer(
+        core_schema.any_schema(
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                _load_payload
+            )
+        )
+    )
+
+    def __init__(self, data: memoryview, serializer: Serializer) -> None:
+        self.data = data
+        self.serializer = serializer
+
+    def load(self) -> Any:
+        return self.serializer.loads(self.data)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Memory views can't be pickled, which jobs sent to a process pool are
+        return _restore_payload, (self.data.tobytes(), self.serializer)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.data.nbytes} bytes)"
+
+
+def dump_job(job: Job, serializer: Serializer) -> bytes:
+    fields = job.model_dump(mode="json", exclude=set(PAYLOAD_FIELDS))
+    sections = [serializer.dumps(fields)]
+
+    for name in PAYLOAD_FIELDS:
+        value = getattr(job, name)
+        if (
+            isinstance(value, LazyPayload)
+            and value.serializer.format_id == serializer.format_id
+        ):
+            # Still encoded in the right format, so there's no need to decode it
+            sections.append(value.data.tobytes())
+        else:
+            sections.append(serializer.dumps(value))
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        serializer.format_id,
+        *(len(section) for section in sections),
+    )
+    return b"".join((header, *sections))
+
+
+def load_job(
+    job_type: type[JobType],
+    data: bytes | bytearray | memoryview,
+    serializer: Serializer | None = None,
+) -> JobType:
+    view = memoryview(data).cast("B")
+
+    try:
+        magic, version, format_id, *lengths = _HEADER.unpack_from(view)
+    except struct.error as exc:
+        raise SerializationError("Data is too short to be a serialized job") from exc
+
+    if magic != _MAGIC:
+        raise SerializationError("Data is not a serialized job")
+
+    if version != _VERSION:
+        raise SerializationError(f"Unsupported serialized job version: {version}")
+
+    if serializer is None:
+        serializer = get_serializer(format_id)
+    elif serializer.format_id != format_id:
+        raise SerializationError(
+            f"Job was serialized with format {format_id}, but the given "
+            f"serializer reads format {serializer.format_id}"
+        )
+
+    sections = []
+    offset = _HEADER.size
+    for length in lengths:
+        end = offset + length
+        sections.append(view[offset:end])
+        offset = end
+
+    if offset != view.nbytes:
+        raise SerializationError("Serialized job is truncated or malformed")
+
+    fields = serializer.loads(sections[0])
+    for name, section in zip(PAYLOAD_FIELDS, sections[1:]):
+        if job_type.model_fields[name].annotation is Any:
+            fields[name] = LazyPayload(section, serializer)
+        else:
+            # Fields with a specific type are decoded now so they get validated
+            fields[name] = serializer.loads(section)
+
+    return job_type.model_validate(fields)
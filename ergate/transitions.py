@@ -0,0 +1,31 @@
+class StepTransitions:
+    """
+    Precomputed outcome of every path declared by a step.
+
+    Each remaining-steps count is the length of the longest run of steps,
+    starting at (and including) the step itself, if that path is taken.
+    A count is `None` if the step doesn't declare the corresponding path.
+    """
+
+    __slots__ = ("go_to", "go_to_end_remaining", "next_remaining")
+
+    def __init__(
+        self,
+        next_remaining: int | None,
+        go_to_end_remaining: int | None,
+        go_to: dict[str, tuple[int, int]],
+    ) -> None:
+        self.next_remaining = next_remaining
+        self.go_to_end_remaining = go_to_end_remaining
+        self.go_to = go_to
+        """Maps step names to their index and the remaining-steps count."""
+
+    @property
+    def longest(self) -> int:
+        return max(
+            (
+                self.next_remaining or 0,
+                self.go_to_end_remaining or 0,
+                *(remaining for _, remaining in self.go_to.values()),
+            ),
+        )
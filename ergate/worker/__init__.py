@@ -1,3 +1,26 @@
+from ..log import LogSettings
+from ..result_store import FilesystemResultStore, ResultOffloading
 from .app import ErgateWorker
+from .async_app import AsyncErgateWorker
+from .batching import Batching
+from .chaining import StepChaining
+from .instrumentation import Instrumentation, MetricsRegistry, start_metrics_server
+from .limiter import LocalLimiter
+from .scheduling import FairScheduler
+from .supervisor import WorkerSupervisor
 
-__all__ = ("ErgateWorker",)
+__all__ = (
+    "AsyncErgateWorker",
+    "Batching",
+    "ErgateWorker",
+    "FairScheduler",
+    "FilesystemResultStore",
+    "Instrumentation",
+    "LocalLimiter",
+    "LogSettings",
+    "MetricsRegistry",
+    "ResultOffloading",
+    "StepChaining",
+    "WorkerSupervisor",
+    "start_metrics_server",
+)
@@ -5,11 +5,18 @@ from contextlib import ExitStack
 from typing import Generic, TypeVar
 
 from ..job import Job
+from ..log import LogSettings
+from ..result_store import ResultOffloading
 from ..types import Lifespan
 from ..types import SignalHandler as SignalHandlerType
 from ..workflow import Workflow
 from ..workflow_registry import WorkflowRegistry
+from .batching import Batching
+from .chaining import StepChaining
+from .instrumentation import Instrumentation
 from .job_runner import JobRunner
+from .limiter import LimiterProtocol
+from .pool import PoolType
 from .queue import QueueProtocol
 from .signals import ErgateSignal, SignalHandler
 from .state_store import StateStoreProtocol
@@ -24,6 +31,16 @@ class ErgateWorker(Generic[JobType]):
         state_store: StateStoreProtocol[JobType],
         lifespan: Lifespan[ErgateWorker[JobType]] | None = None,
         signal_handler: SignalHandler[JobType] | None = None,
+        *,
+        concurrency: int = 1,
+        pool: PoolType = "thread",
+        prefetch: int = 0,
+        chaining: StepChaining | None = None,
+        batching: Batching | None = None,
+        log_settings: LogSettings | None = None,
+        results: ResultOffloading | None = None,
+        instrumentation: Instrumentation | None = None,
+        limiter: LimiterProtocol | None = None,
     ) -> None:
         self.lifespan = lifespan
         self.signal_handler: SignalHandler[JobType] = signal_handler or SignalHandler()
@@ -34,6 +51,15 @@ class ErgateWorker(Generic[JobType]):
             self.workflow_registry,
             state_store,
             self.signal_handler,
+            concurrency=concurrency,
+            pool=pool,
+            prefetch=prefetch,
+            chaining=chaining,
+            batching=batching,
+            log_settings=log_settings,
+            results=results,
+            instrumentation=instrumentation,
+            limiter=limiter,
         )
 
     def signal(
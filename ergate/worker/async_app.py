@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from contextlib import AsyncExitStack
+from typing import Generic, TypeVar
+
+from ..job import Job
+from ..log import LogSettings
+from ..result_store import ResultOffloading
+from ..types import AsyncLifespan
+from ..types import SignalHandler as SignalHandlerType
+from ..workflow import Workflow
+from ..workflow_registry import WorkflowRegistry
+from .async_job_runner import AsyncJobRunner
+from .chaining import StepChaining
+from .instrumentation import Instrumentation
+from .limiter import LimiterProtocol
+from .queue import AsyncQueueProtocol
+from .signals import ErgateSignal, SignalHandler
+from .state_store import AsyncStateStoreProtocol
+
+JobType = TypeVar("JobType", bound=Job)
+
+
+class AsyncErgateWorker(Generic[JobType]):
+    """
+    Worker that runs jobs on an event loop.
+
+    Up to `concurrency` jobs run at the same time. Steps and dependencies
+    may be either synchronous or asynchronous; synchronous steps are run
+    in a separate thread so they don't block the event loop.
+    """
+
+    def __init__(
+        self,
+        queue: AsyncQueueProtocol[JobType],
+        state_store: AsyncStateStoreProtocol[JobType],
+        lifespan: AsyncLifespan[AsyncErgateWorker[JobType]] | None = None,
+        signal_handler: SignalHandler[JobType] | None = None,
+        *,
+        concurrency: int = 1,
+        chaining: StepChaining | None = None,
+        log_settings: LogSettings | None = None,
+        results: ResultOffloading | None = None,
+        instrumentation: Instrumentation | None = None,
+        limiter: LimiterProtocol | None = None,
+    ) -> None:
+        self.lifespan = lifespan
+        self.signal_handler: SignalHandler[JobType] = signal_handler or SignalHandler()
+
+        self.workflow_registry = WorkflowRegistry()
+        self.job_runner: AsyncJobRunner[JobType] = AsyncJobRunner(
+            queue,
+            self.workflow_registry,
+            state_store,
+            self.signal_handler,
+            concurrency=concurrency,
+            chaining=chaining,
+            log_settings=log_settings,
+            results=results,
+            instrumentation=instrumentation,
+            limiter=limiter,
+        )
+
+    def signal(
+        self, signal: ErgateSignal
+    ) -> Callable[[SignalHandlerType[JobType]], SignalHandlerType[JobType]]:
+        def decorator(func: SignalHandlerType[JobType]) -> SignalHandlerType[JobType]:
+            self.signal_handler.register(signal, func)
+            return func
+
+        return decorator
+
+    def register_workflow(self, workflow: Workflow) -> None:
+        self.workflow_registry.register(workflow)
+
+    async def run_async(self) -> None:
+        async with AsyncExitStack() as stack:
+            if self.lifespan:
+                await stack.enter_async_context(self.lifespan(self))
+            await self.job_runner.run()
+
+    def run(self) -> None:
+        asyncio.run(self.run_async())
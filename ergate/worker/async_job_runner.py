@@ -0,0 +1,504 @@
+import asyncio
+import signal
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from contextlib import AsyncExitStack
+from typing import Any, TypeVar
+
+from ..depends_cache import AsyncDependsScope
+from ..job import Job
+from ..job_status import JobStatus
+from ..log import LOG, LogSettings, QueuedLogging
+from ..result_store import ResultOffloading
+from ..workflow import Workflow
+from ..workflow_registry import WorkflowRegistry
+from ..workflow_step import WorkflowStep
+from .base_job_runner import NOT_CACHED, BaseJobRunner
+from .chaining import StepChaining
+from .instrumentation import Instrumentation, StepTimer
+from .limiter import LimiterProtocol
+from .queue import AsyncQueueProtocol
+from .signals import ErgateSignal, SignalHandler
+from .state_store import AsyncStateStoreProtocol
+from .timeouts import (
+    TimeLimit,
+    await_with_time_limit,
+    run_in_thread_with_time_limit,
+    run_isolated,
+)
+
+JobType = TypeVar("JobType", bound=Job)
+ResultType = TypeVar("ResultType")
+
+
+class _Stopped(Exception):  # noqa: N818
+    """Raised internally when the runner is asked to stop while waiting."""
+
+
+class AsyncJobRunner(BaseJobRunner[JobType]):
+    def __init__(
+        self,
+        queue: AsyncQueueProtocol[JobType],
+        workflow_registry: WorkflowRegistry,
+        state_store: AsyncStateStoreProtocol[JobType],
+        signal_handler: SignalHandler[JobType],
+        *,
+        concurrency: int = 1,
+        chaining: StepChaining | None = None,
+        log_settings: LogSettings | None = None,
+        results: ResultOffloading | None = None,
+        instrumentation: Instrumentation | None = None,
+        limiter: LimiterProtocol | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+
+        super().__init__(
+            workflow_registry,
+            signal_handler,
+            chaining,
+            log_settings,
+            results,
+            instrumentation,
+            limiter,
+        )
+        self.queue = queue
+        self.state_store = state_store
+        self.concurrency = concurrency
+        self._worker_scope = AsyncDependsScope(AsyncExitStack(), shared=True)
+        self._is_cancelling: Callable[[JobType], Awaitable[bool]] | None = getattr(
+            state_store, "is_cancelling", None
+        )
+        self._start_map: Callable[[JobType, list[JobType]], Awaitable[None]] | None = (
+            getattr(state_store, "start_map", None)
+        )
+        self._finish_map_child: (
+            Callable[[JobType], Awaitable[tuple[JobType, Sequence[JobType]] | None]]
+            | None
+        ) = getattr(state_store, "finish_map_child", None)
+
+    async def _cancel_if_requested(self, job: JobType) -> bool:
+        if job.status != JobStatus.CANCELLING and (
+            self._is_cancelling is None or not await self._is_cancelling(job)
+        ):
+            return False
+
+        job.mark_cancelled()
+        self._log_cancelled(job)
+        return True
+
+    async def _wait_for_map(
+        self, job: JobType, workflow: Workflow, children: list[JobType]
+    ) -> None:
+        if not children:
+            self._handle_step_success(job, workflow, [])
+            return
+
+        assert self._start_map is not None, "Mapped steps not supported"
+        job.mark_waiting()
+        await self._start_map(job, children)
+        self._log_map_started(job, children)
+
+    async def _store_map_child(self, job: JobType, workflow: Workflow) -> None:
+        if self.results is not None:
+            await asyncio.to_thread(self.results.prepare, job)
+
+        assert self._finish_map_child is not None, "Mapped steps not supported"
+        joined = await self._finish_map_child(job)
+        if joined is None:
+            return
+
+        parent, children = joined
+        self._join_map(parent, workflow, children)
+        await self._update_state(parent)
+
+    async def _update_state(self, job: JobType) -> None:
+        if self.results is not None:
+            # Offloading results is file I/O, which mustn't block the event loop
+            await asyncio.to_thread(self.results.prepare, job)
+
+        if self.instrumentation is None:
+            await self.state_store.update(job)
+            return
+
+        started = time.perf_counter()
+        await self.state_store.update(job)
+        self.instrumentation.record_state_update(
+            time.perf_counter() - started, job.workflow_name
+        )
+
+    async def _run_job(self, job: JobType) -> None:
+        with self._job_span(job):
+            await self._run_job_steps(job)
+
+    async def _run_job_steps(self, job: JobType) -> None:
+        self.signal_handler.trigger(ErgateSignal.JOB_RUN_START, job)
+
+        workflow = self.workflow_registry[job.workflow_name]
+
+        if not await self._cancel_if_requested(job):
+            await self._run_job_pass(job, workflow)
+
+        if self._is_finished_map_child(job):
+            await self._store_map_child(job, workflow)
+        elif job.status != JobStatus.WAITING:
+            # Waiting jobs were stored along with their child jobs already
+            await self._update_state(job)
+        self._record_job_run(job)
+        self.signal_handler.trigger(ErgateSignal.JOB_RUN_END, job)
+
+    async def _run_job_pass(self, job: JobType, workflow: Workflow) -> None:
+        job.mark_running(workflow[job.current_step])
+        await self._update_state(job)
+
+        async with AsyncExitStack() as job_stack:
+            job_scope = AsyncDependsScope(job_stack)
+
+            started = time.monotonic()
+            steps_run = 0
+            while True:
+                held = await self._acquire_limits_async(job, workflow)
+                if held is None:
+                    break
+
+                try:
+                    with self._step_span(job, workflow):
+                        await self._run_step(job, workflow, job_scope)
+                finally:
+                    if held:
+                        await asyncio.to_thread(self._release_limits, held)
+                steps_run += 1
+
+                # Checked before the job is handed back, since the worker's
+                # update would otherwise overwrite the `CANCELLING` status.
+                if job.status == JobStatus.PENDING and (
+                    await self._cancel_if_requested(job)
+                ):
+                    break
+
+                if not self._should_chain(job, workflow, steps_run, started):
+                    break
+
+                job.mark_running(workflow[job.current_step])
+                if self._should_checkpoint(steps_run):
+                    await self._update_state(job)
+
+    async def _run_step(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        job_scope: AsyncDependsScope,
+    ) -> None:
+        stage = workflow.get_stage(job.current_step)
+        if len(stage) > 1:
+            await self._run_stage(job, workflow, stage, job_scope)
+            return
+
+        step_to_run = stage[0]
+        timer = StepTimer() if self.instrumentation is not None else None
+
+        input_value = await self._get_input_value_async(job, step_to_run)
+        children: list[JobType] | None = None
+
+        try:
+            self._log_step_start(job, step_to_run, input_value)
+
+            try:
+                if not step_to_run.is_map:
+                    retval = await self._run_step_once(
+                        job, workflow, step_to_run, input_value, job_scope, timer
+                    )
+                elif job.map_index is None:
+                    self._require_map_support(self._start_map, step_to_run)
+                    children = self._split_map(job, step_to_run, input_value)
+                else:
+                    retval = []
+                    for index, item in enumerate(input_value):
+                        # Each item is timed on its own, and their times add up
+                        if timer is not None and index:
+                            timer.start_next()
+                        retval.append(
+                            await self._run_step_once(
+                                job, workflow, step_to_run, item, job_scope, timer
+                            )
+                        )
+            finally:
+                if timer is not None:
+                    timer.mark_finished()
+        except Exception as exc:
+            self._handle_step_exception(job, workflow, exc)
+        else:
+            if children is not None:
+                await self._wait_for_map(job, workflow, children)
+            elif job.map_index is not None:
+                self._handle_map_chunk_success(job, retval)
+            else:
+                self._handle_step_success(job, workflow, retval)
+
+        if timer is not None:
+            self._record_step(job, step_to_run, timer)
+
+    async def _run_stage(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        stage: list[WorkflowStep],
+        job_scope: AsyncDependsScope,
+    ) -> None:
+        timer = StepTimer() if self.instrumentation is not None else None
+        step = stage[0]
+
+        try:
+            try:
+                async with AsyncExitStack() as stack:
+                    calls = []
+                    keys: dict[int, str] = {}
+                    cached: dict[int, Any] = {}
+                    for step in stage:
+                        input_value = await self._get_input_value_async(job, step)
+                        self._log_step_start(job, step, input_value)
+
+                        key, retval = await self._get_cached_async(
+                            job, step, input_value
+                        )
+                        if retval is not NOT_CACHED:
+                            cached[step.index] = retval
+                            continue
+                        if key is not None:
+                            keys[step.index] = key
+
+                        time_limit = self._get_time_limit(job, workflow, step)
+                        args, kwargs = await stack.enter_async_context(
+                            step.build_args_async(
+                                job.get_user_context(),
+                                input_value,
+                                job_scope=job_scope,
+                                worker_scope=self._worker_scope,
+                            )
+                        )
+                        calls.append((step, args, kwargs, time_limit))
+
+                    if timer is not None:
+                        timer.mark_built()
+
+                    gathered = await asyncio.gather(
+                        *(self._call_step(*call) for call in calls),
+                        return_exceptions=True,
+                    )
+                    if timer is not None:
+                        timer.mark_ran()
+
+                    # Raises the exception of the first step that failed, if any
+                    ran = {
+                        call[0].index: result for call, result in zip(calls, gathered)
+                    }
+                    results = []
+                    for step in stage:
+                        if step.index in cached:
+                            results.append(cached[step.index])
+                            continue
+
+                        result = ran[step.index]
+                        if isinstance(result, BaseException):
+                            raise result
+                        if step.index in keys:
+                            await asyncio.to_thread(
+                                self._set_cached, job, step, keys[step.index], result
+                            )
+                        results.append(result)
+            finally:
+                if timer is not None:
+                    timer.mark_finished()
+        except Exception as exc:
+            self._handle_step_exception(job, workflow, exc, step)
+        else:
+            self._handle_step_success(job, workflow, results)
+
+        if timer is not None:
+            for step in stage:
+                self._record_step(job, step, timer)
+
+    async def _run_step_once(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        step: WorkflowStep,
+        input_value: Any,
+        job_scope: AsyncDependsScope,
+        timer: StepTimer | None,
+    ) -> Any:
+        key, retval = await self._get_cached_async(job, step, input_value)
+        if retval is not NOT_CACHED:
+            return retval
+
+        time_limit = self._get_time_limit(job, workflow, step)
+
+        async with step.build_args_async(
+            job.get_user_context(),
+            input_value,
+            job_scope=job_scope,
+            worker_scope=self._worker_scope,
+        ) as all_args:
+            if timer is not None:
+                timer.mark_built()
+            args, kwargs = all_args
+            try:
+                retval = await self._call_step(step, args, kwargs, time_limit)
+            finally:
+                if timer is not None:
+                    timer.mark_ran()
+
+        if key is not None:
+            await asyncio.to_thread(self._set_cached, job, step, key, retval)
+        return retval
+
+    async def _acquire_limits_async(
+        self, job: JobType, workflow: Workflow
+    ) -> list[tuple[str, str]] | None:
+        if not self._is_limited(job, workflow):
+            return []
+        # Limiters may wait for a lock shared with other processes, which
+        # mustn't block the event loop
+        return await asyncio.to_thread(self._acquire_limits, job, workflow)
+
+    async def _get_input_value_async(self, job: JobType, step: WorkflowStep) -> Any:
+        # Input values may have to be read from offloaded files, decoded and
+        # copied, none of which may block the event loop
+        return await asyncio.to_thread(self._get_input_value, job, step)
+
+    async def _get_cached_async(
+        self,
+        job: JobType,
+        step: WorkflowStep,
+        input_value: Any,
+    ) -> tuple[str | None, Any]:
+        if step.cache is None:
+            return None, NOT_CACHED
+        # Caches may do file I/O, which mustn't block the event loop
+        return await asyncio.to_thread(self._get_cached, job, step, input_value)
+
+    async def _call_step(
+        self,
+        step: WorkflowStep,
+        args: list[Any],
+        kwargs: dict[str, Any],
+        time_limit: TimeLimit | None,
+    ) -> Any:
+        if step.is_async:
+            if time_limit is None:
+                return await step(*args, **kwargs)
+            return await await_with_time_limit(step(*args, **kwargs), time_limit)
+
+        # Synchronous steps would otherwise block every other job that is
+        # running on the event loop.
+        if step.isolated:
+            return await asyncio.to_thread(run_isolated, step, args, kwargs, time_limit)
+        if time_limit is not None:
+            return await run_in_thread_with_time_limit(step, args, kwargs, time_limit)
+        return await asyncio.to_thread(step, *args, **kwargs)
+
+    async def _until_stopped(
+        self,
+        awaitable: Awaitable[ResultType],
+        stop: asyncio.Event,
+    ) -> ResultType:
+        task = asyncio.ensure_future(awaitable)
+        stopper = asyncio.ensure_future(stop.wait())
+
+        try:
+            await asyncio.wait({task, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopper.cancel()
+
+        # If both finished at the same time, the result must not be dropped
+        # since it may be a job that has already been taken from the queue.
+        if task.done():
+            return task.result()
+
+        task.cancel()
+        raise _Stopped
+
+    def _add_signal_handlers(self, stop: asyncio.Event) -> list[signal.Signals]:
+        loop = asyncio.get_running_loop()
+        installed: list[signal.Signals] = []
+
+        def handler(signal_: signal.Signals) -> None:
+            LOG.info("%s received - stopping after running jobs complete", signal_.name)
+            stop.set()
+
+        for signal_ in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_, handler, signal_)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform or not in the main thread
+                continue
+            installed.append(signal_)
+
+        return installed
+
+    async def run(self) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+        stop = asyncio.Event()
+        running: set[asyncio.Task[None]] = set()
+        errors: list[BaseException] = []
+
+        def on_done(task: asyncio.Task[None]) -> None:
+            running.discard(task)
+            slots.release()
+            if task.cancelled():
+                return
+
+            self._notify_job_done()
+
+            exc = task.exception()
+            if exc is not None:
+                errors.append(exc)
+                stop.set()
+
+        queued_logging = QueuedLogging() if self.log_settings.queue else None
+        if queued_logging is not None:
+            queued_logging.start()
+
+        self._worker_scope = AsyncDependsScope(AsyncExitStack(), shared=True)
+        installed_signals = self._add_signal_handlers(stop)
+        try:
+            while not stop.is_set():
+                try:
+                    await self._until_stopped(slots.acquire(), stop)
+                except _Stopped:
+                    break
+
+                LOG.info("Listening for next job")
+                dequeue_started = time.perf_counter()
+                try:
+                    job = await self._until_stopped(self.queue.get_one(), stop)
+                except _Stopped:
+                    slots.release()
+                    break
+
+                if self.instrumentation is not None:
+                    self.instrumentation.record_dequeue(
+                        time.perf_counter() - dequeue_started, 1
+                    )
+
+                LOG.info("Job acquired")
+                task = asyncio.create_task(self._run_job(job))
+                running.add(task)
+                task.add_done_callback(on_done)
+        finally:
+            if running:
+                LOG.info("Waiting for running jobs to complete")
+                await asyncio.gather(*running, return_exceptions=True)
+
+            loop = asyncio.get_running_loop()
+            for signal_ in installed_signals:
+                loop.remove_signal_handler(signal_)
+
+            try:
+                await self._worker_scope.stack.aclose()
+            finally:
+                if queued_logging is not None:
+                    queued_logging.stop()
+
+        if errors:
+            raise errors[0]
@@ -0,0 +1,620 @@
+import time
+import uuid
+from collections.abc import Callable, Sequence
+from contextlib import AbstractContextManager, nullcontext
+from logging import INFO
+from typing import Any, Generic, TypeVar
+
+from ..exceptions import (
+    AbortJob,
+    GoToEnd,
+    GoToStep,
+    InvalidDefinitionError,
+    JobTimeoutError,
+    MapStepError,
+    ReverseGoToError,
+    StepTimeoutError,
+)
+from ..job import Job
+from ..job_status import JobStatus
+from ..log import LOG, LogSettings
+from ..rate_limit import RateLimit
+from ..result_store import FINAL_STATUSES, ResultOffloading
+from ..retry import RetryPolicy
+from ..workflow import Workflow
+from ..workflow_registry import WorkflowRegistry
+from ..workflow_step import WorkflowStep
+from .chaining import StepChaining
+from .instrumentation import Instrumentation, StepTimer
+from .limiter import LimiterProtocol, LocalLimiter
+from .signals import ErgateSignal, SignalHandler
+from .timeouts import TimeLimit
+
+JobType = TypeVar("JobType", bound=Job)
+
+_NULL_CONTEXT = nullcontext()
+# Returned instead of a step's return value when it isn't cached
+NOT_CACHED: Any = object()
+
+
+class BaseJobRunner(Generic[JobType]):
+    """
+    Logic shared by the synchronous and asynchronous job runners.
+
+    Subclasses are responsible for fetching jobs, executing steps and
+    persisting job state; this class only decides how a job moves
+    forward once a step has returned or raised.
+    """
+
+    def __init__(
+        self,
+        workflow_registry: WorkflowRegistry,
+        signal_handler: SignalHandler[JobType],
+        chaining: StepChaining | None = None,
+        log_settings: LogSettings | None = None,
+        results: ResultOffloading | None = None,
+        instrumentation: Instrumentation | None = None,
+        limiter: LimiterProtocol | None = None,
+    ) -> None:
+        self.workflow_registry = workflow_registry
+        self.signal_handler = signal_handler
+        self.chaining = chaining
+        self.log_settings = log_settings or LogSettings()
+        self.results = results
+        self.instrumentation = instrumentation
+        self.limiter: LimiterProtocol = (
+            limiter if limiter is not None else LocalLimiter()
+        )
+        # Called in the process that takes jobs from the queue whenever a
+        # job run finishes, even if the job ran in another process.
+        self.job_done_callbacks: list[Callable[[], None]] = []
+
+    def _notify_job_done(self) -> None:
+        for callback in self.job_done_callbacks:
+            try:
+                callback()
+            except Exception:
+                LOG.exception("Job done callback %s failed - ignoring", callback)
+
+    def _job_span(self, job: JobType) -> AbstractContextManager[Any]:
+        if self.instrumentation is None:
+            return _NULL_CONTEXT
+
+        return self.instrumentation.span(
+            "ergate.job",
+            {"ergate.job_id": str(job.id), "ergate.workflow": job.workflow_name},
+        )
+
+    def _step_span(
+        self, job: JobType, workflow: Workflow
+    ) -> AbstractContextManager[Any]:
+        if self.instrumentation is None:
+            return _NULL_CONTEXT
+
+        return self.instrumentation.span(
+            "ergate.step",
+            {
+                "ergate.job_id": str(job.id),
+                "ergate.workflow": job.workflow_name,
+                "ergate.step": workflow[job.current_step].name,
+            },
+        )
+
+    def _record_step(self, job: JobType, step: WorkflowStep, timer: StepTimer) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.record_step(
+                timer, job.workflow_name, step.name, job.status.name
+            )
+
+    def _record_job_run(self, job: JobType) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.record_job_run(job.workflow_name, job.status.name)
+
+    def _log_extra(self, job: JobType) -> dict[str, Any]:
+        """Fields added to log records about a job, for structured logging."""
+        return {
+            "ergate_job_id": job.id,
+            "ergate_workflow": job.workflow_name,
+            "ergate_step": job.current_step,
+        }
+
+    def _log_step_start(
+        self, job: JobType, step: WorkflowStep, input_value: Any
+    ) -> None:
+        if not LOG.isEnabledFor(INFO):
+            return
+
+        LOG.info(
+            "Running %s - input value: %s",
+            step,
+            self.log_settings.describe(input_value),
+            extra=self._log_extra(job),
+        )
+
+    def _get_time_limit(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        step: WorkflowStep,
+    ) -> TimeLimit | None:
+        """
+        Returns how long the step may run for, considering both its own
+        timeout and whatever is left of its workflow's. Raises
+        `JobTimeoutError` if the workflow's timeout has already expired.
+        """
+        step_limit = (
+            TimeLimit(
+                step.timeout,
+                StepTimeoutError(f"{step} did not finish within {step.timeout}s"),
+            )
+            if step.timeout is not None
+            else None
+        )
+        if workflow.timeout is None:
+            return step_limit
+
+        remaining = workflow.timeout - job.seconds_running()
+        if step_limit is not None and step_limit.seconds <= remaining:
+            return step_limit
+
+        job_error = JobTimeoutError(
+            f"Job did not finish within its workflow's {workflow.timeout}s timeout"
+        )
+        if remaining <= 0:
+            raise job_error
+        return TimeLimit(remaining, job_error)
+
+    def _get_limits(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        stage: list[WorkflowStep],
+    ) -> dict[str, RateLimit]:
+        # Splitting a job into child jobs doesn't run the mapped step itself
+        if stage[0].is_map and job.map_index is None:
+            return {}
+
+        limits: dict[str, RateLimit] = {}
+        if workflow.limit is not None:
+            limits[workflow.limit_key] = workflow.limit
+        for step in stage:
+            if step.limit is not None:
+                limits.setdefault(step.limit_key, step.limit)
+        return limits
+
+    def _is_limited(self, job: JobType, workflow: Workflow) -> bool:
+        return workflow.limit is not None or any(
+            step.limit is not None for step in workflow.get_stage(job.current_step)
+        )
+
+    def _acquire_limits(
+        self,
+        job: JobType,
+        workflow: Workflow,
+    ) -> list[tuple[str, str]] | None:
+        """
+        Takes a slot of each rate limit that applies to the job's current
+        stage, whose steps share them, and returns the slots taken. If any
+        limit has been reached, frees the slots already taken, defers the
+        job and returns `None` instead.
+        """
+        if not self._is_limited(job, workflow):
+            return []
+
+        stage = workflow.get_stage(job.current_step)
+        held: list[tuple[str, str]] = []
+        for key, limit in self._get_limits(job, workflow, stage).items():
+            slot = uuid.uuid4().hex
+            try:
+                delay = self.limiter.acquire(key, limit, slot)
+            except Exception as exc:
+                self._release_limits(held)
+                self._handle_step_exception(job, workflow, exc)
+                return None
+
+            if delay > 0:
+                self._release_limits(held)
+                self._defer(job, key, delay)
+                return None
+            held.append((key, slot))
+
+        return held
+
+    def _release_limits(self, held: list[tuple[str, str]]) -> None:
+        for key, slot in held:
+            try:
+                self.limiter.release(key, slot)
+            except Exception:
+                LOG.exception("Failed to release rate limit %s", key)
+
+    def _defer(self, job: JobType, key: str, delay: float) -> None:
+        LOG.info(
+            "Rate limit %s reached - deferring job by %.2fs",
+            key,
+            delay,
+            extra=self._log_extra(job),
+        )
+        job.mark_deferred(delay)
+        if self.instrumentation is not None:
+            self.instrumentation.record_deferral(job.workflow_name, key)
+
+    def _get_cached(
+        self,
+        job: JobType,
+        step: WorkflowStep,
+        input_value: Any,
+    ) -> tuple[str | None, Any]:
+        """
+        Returns the key the step's return value for the input value is
+        cached under, and the cached value or `NOT_CACHED`. The key is
+        `None` if the step isn't cached, or if the value can't be cached.
+        """
+        cache = step.cache
+        if cache is None:
+            return None, NOT_CACHED
+
+        try:
+            key = cache.make_key(str(step), input_value, job.get_user_context())
+        except Exception:
+            LOG.warning(
+                "Input value of %s can't be cached",
+                step,
+                exc_info=True,
+                extra=self._log_extra(job),
+            )
+            return None, NOT_CACHED
+
+        try:
+            data = cache.store.get(key)
+            retval = cache.load(data) if data is not None else NOT_CACHED
+        except Exception:
+            LOG.warning(
+                "Failed to read cached return value of %s",
+                step,
+                exc_info=True,
+                extra=self._log_extra(job),
+            )
+            retval = NOT_CACHED
+
+        if self.instrumentation is not None:
+            self.instrumentation.record_cache_lookup(
+                job.workflow_name, step.name, retval is not NOT_CACHED
+            )
+        if retval is not NOT_CACHED:
+            LOG.info(
+                "Using cached return value of %s", step, extra=self._log_extra(job)
+            )
+        return key, retval
+
+    def _set_cached(
+        self,
+        job: JobType,
+        step: WorkflowStep,
+        key: str,
+        retval: Any,
+    ) -> None:
+        cache = step.cache
+        assert cache is not None, "Step isn't cached"
+
+        try:
+            cache.store.set(key, cache.dump(retval), cache.ttl)
+        except Exception:
+            LOG.warning(
+                "Failed to cache return value of %s",
+                step,
+                exc_info=True,
+                extra=self._log_extra(job),
+            )
+
+    def _require_map_support(self, method: object, step: WorkflowStep) -> None:
+        if method is None:
+            raise InvalidDefinitionError(
+                f"Step {step} is mapped, which requires a state store that "
+                "implements `start_map` and `finish_map_child`"
+            )
+
+    def _is_finished_map_child(self, job: JobType) -> bool:
+        return job.map_index is not None and job.status in FINAL_STATUSES
+
+    def _split_map(
+        self,
+        job: JobType,
+        step: WorkflowStep,
+        input_value: Any,
+    ) -> list[JobType]:
+        """
+        Creates the child jobs that run a mapped step over chunks of the
+        job's input value. Their ids are left for the state store to assign.
+        """
+        items = list(input_value)
+        chunk_size = step.map_chunk_size or 1
+        children: list[JobType] = []
+
+        for start in range(0, len(items), chunk_size):
+            stop = start + chunk_size
+            children.append(
+                job.model_copy(
+                    update={
+                        "id": None,
+                        "status": JobStatus.PENDING,
+                        "steps_completed": 0,
+                        "percent_completed": 0.0,
+                        "initial_input_value": items[start:stop],
+                        "last_return_value": None,
+                        "step_return_values": {},
+                        "requested_start_time": None,
+                        "attempt": 1,
+                        "parent_id": job.id,
+                        "map_index": len(children),
+                    }
+                )
+            )
+
+        return children
+
+    def _log_map_started(self, job: JobType, children: list[JobType]) -> None:
+        LOG.info(
+            "Waiting for %d child job(s) to run mapped step",
+            len(children),
+            extra=self._log_extra(job),
+        )
+
+    def _handle_map_chunk_success(self, job: JobType, retvals: list[Any]) -> None:
+        if LOG.isEnabledFor(INFO):
+            LOG.info(
+                "Mapped step completed successfully - return values: %s",
+                self.log_settings.describe(retvals),
+                extra=self._log_extra(job),
+            )
+
+        job.mark_map_chunk_completed(retvals)
+
+    def _join_map(
+        self,
+        parent: JobType,
+        workflow: Workflow,
+        children: Sequence[JobType],
+    ) -> None:
+        """
+        Moves a job past its mapped step once every child job has finished,
+        handing the next step their return values in order.
+        """
+        if parent.status == JobStatus.CANCELLING:
+            parent.mark_cancelled()
+            self._log_cancelled(parent)
+            return
+
+        unfinished = sum(child.status != JobStatus.COMPLETED for child in children)
+        if unfinished:
+            err = MapStepError(
+                f"{unfinished} of {len(children)} child job(s) of "
+                f"{workflow[parent.current_step]} did not complete"
+            )
+            LOG.error("Job raised an exception: %s", err, extra=self._log_extra(parent))
+            parent.mark_failed(err)
+            self.signal_handler.trigger(ErgateSignal.JOB_RUN_FAIL, parent)
+            return
+
+        retvals = [
+            retval
+            for child in children
+            for retval in child.get_return_value(self.results)
+        ]
+        self._handle_step_success(parent, workflow, retvals)
+
+    def _log_cancelled(self, job: JobType) -> None:
+        LOG.info("Job cancelled", extra=self._log_extra(job))
+
+    def _should_chain(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        steps_run: int,
+        started: float,
+    ) -> bool:
+        if job.status != JobStatus.PENDING:
+            return False
+
+        chainable = workflow[job.current_step].chainable
+        if chainable is None:
+            chainable = self.chaining is not None
+
+        if not chainable:
+            return False
+
+        chaining = self.chaining or StepChaining()
+
+        if chaining.max_steps is not None and steps_run >= chaining.max_steps:
+            return False
+
+        return (
+            chaining.time_budget is None
+            or time.monotonic() - started < chaining.time_budget
+        )
+
+    def _should_checkpoint(self, steps_run: int) -> bool:
+        return (
+            self.chaining is not None
+            and self.chaining.checkpoint_every is not None
+            and steps_run % self.chaining.checkpoint_every == 0
+        )
+
+    def _get_input_value(self, job: JobType, step: WorkflowStep) -> Any:
+        # Child jobs of mapped steps take their chunk as their input value
+        if step.depends_on is None or job.map_index is not None:
+            return job.get_input_value(step.input_policy, self.results)
+        return job.get_dependency_values(
+            step.depends_on, step.input_policy, self.results
+        )
+
+    def _get_kept_return_values(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        return_values: dict[int, Any],
+        next_index: int,
+    ) -> dict[int, Any] | None:
+        """
+        Returns the return values that must be kept once the job moves on
+        to the step with the given index, or `None` if nothing changes.
+        """
+        kept = workflow.get_kept_return_values(min(next_index, len(workflow)))
+        if not kept and not job.step_return_values:
+            return None
+
+        return {
+            index: value
+            for index, value in (
+                *job.step_return_values.items(),
+                *return_values.items(),
+            )
+            if index in kept
+        }
+
+    def _handle_step_success(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        retval: Any,
+    ) -> None:
+        """
+        Moves the job past the stage starting at its current step. If the
+        stage has several steps, `retval` is the list of their return values.
+        """
+        if LOG.isEnabledFor(INFO):
+            LOG.info(
+                "Step completed successfully - return value: %s",
+                self.log_settings.describe(retval),
+                extra=self._log_extra(job),
+            )
+
+        stage = workflow.get_stage(job.current_step)
+        next_index = stage[-1].index + 1
+
+        remaining_steps = workflow.transitions[job.current_step].next_remaining
+        if remaining_steps is None:
+            remaining_steps = len(workflow) - job.current_step + 1
+
+        job.mark_step_n_completed(
+            next_index,
+            retval,
+            job.steps_completed + remaining_steps,
+            steps_run=len(stage),
+            step_return_values=self._get_kept_return_values(
+                job,
+                workflow,
+                (
+                    dict(zip((step.index for step in stage), retval))
+                    if len(stage) > 1
+                    else {job.current_step: retval}
+                ),
+                next_index,
+            ),
+        )
+
+    def _handle_step_exception(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        exc: Exception,
+        step: WorkflowStep | None = None,
+    ) -> None:
+        """
+        Handles an exception raised by a step, which is the job's current
+        step unless another step of the same stage is given.
+        """
+        if step is None:
+            step = workflow[job.current_step]
+
+        try:
+            if isinstance(exc, AbortJob):
+                LOG.info(
+                    "User requested to abort job: %s", exc, extra=self._log_extra(job)
+                )
+
+                job.mark_aborted(exc.message)
+            elif isinstance(exc, (GoToEnd, GoToStep)) and (
+                job.map_index is not None
+                or len(workflow.get_stage(job.current_step)) > 1
+            ):
+                raise InvalidDefinitionError(
+                    f"Step {step} is mapped or runs alongside other steps, so "
+                    "it can't go to the end of the workflow or to another step"
+                ) from exc
+            elif isinstance(exc, GoToEnd):
+                if LOG.isEnabledFor(INFO):
+                    LOG.info(
+                        "User requested to go to end of workflow - return value: %s",
+                        self.log_settings.describe(exc.retval),
+                        extra=self._log_extra(job),
+                    )
+
+                job.mark_step_n_completed(
+                    job.steps_completed,
+                    exc.retval,
+                    job.steps_completed + 1,
+                    step_return_values=self._get_kept_return_values(
+                        job, workflow, {}, len(workflow)
+                    ),
+                )
+            elif isinstance(exc, GoToStep):
+                self._handle_go_to_step(job, workflow, exc)
+            else:
+                raise exc
+        except Exception as err:
+            # Since handling `GoToStep` potentially raises an exception, failures
+            # are handled here regardless of where they originally came from.
+            retry = step.retry
+            if retry is not None and retry.should_retry(err, job.attempt):
+                self._schedule_retry(job, retry, err)
+                return
+
+            LOG.exception("Job raised an exception", extra=self._log_extra(job))
+            job.mark_failed(err)
+            self.signal_handler.trigger(ErgateSignal.JOB_RUN_FAIL, job)
+
+    def _schedule_retry(self, job: JobType, retry: RetryPolicy, exc: Exception) -> None:
+        delay = retry.get_delay(job.attempt)
+        LOG.warning(
+            "Step raised an exception on attempt %d of %d - retrying in %.2fs",
+            job.attempt,
+            retry.max_attempts,
+            delay,
+            exc_info=exc,
+            extra=self._log_extra(job),
+        )
+        job.mark_retrying(delay)
+
+    def _handle_go_to_step(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        exc: GoToStep,
+    ) -> None:
+        if LOG.isEnabledFor(INFO):
+            LOG.info(
+                "User requested to go to step: %s (%s) - return value: %s",
+                exc.step.name,
+                exc.step.index,
+                self.log_settings.describe(exc.retval),
+                extra=self._log_extra(job),
+            )
+
+        if exc.step.index <= job.current_step:
+            raise ReverseGoToError(
+                "User attempted to go to an earlier step, which is not permitted."
+            )
+
+        go_to = workflow.transitions[job.current_step].go_to.get(exc.step.name)
+        remaining_steps = (
+            go_to[1] if go_to is not None else len(workflow) - job.current_step
+        )
+
+        job.mark_step_n_completed(
+            exc.step.index,
+            exc.retval,
+            job.steps_completed + remaining_steps,
+            step_return_values=self._get_kept_return_values(
+                job, workflow, {job.current_step: exc.retval}, exc.step.index
+            ),
+        )
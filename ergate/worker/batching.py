@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Generic, TypeVar
+
+from ..job import Job
+from ..log import LOG
+from .instrumentation import Instrumentation
+from .state_store import StateStoreProtocol
+
+JobType = TypeVar("JobType", bound=Job)
+
+
+class Batching:
+    """
+    Settings for fetching jobs and writing job state in batches.
+
+    `fetch_size` is the maximum number of jobs requested from the queue at
+    once, which requires the queue to implement `get_many`.
+
+    State store writes are buffered and flushed whenever `flush_size` jobs
+    are pending or `flush_interval` seconds have passed. Writes for the same
+    job that happen before a flush (such as the `RUNNING` and final write of
+    a short step) are coalesced into a single write with the latest state.
+    Flushes use the state store's `update_many` if it exists, or `update`
+    once per job otherwise.
+    """
+
+    def __init__(
+        self,
+        *,
+        fetch_size: int = 1,
+        flush_size: int = 100,
+        flush_interval: float = 0.05,
+    ) -> None:
+        if fetch_size < 1:
+            raise ValueError("fetch_size must be at least 1")
+
+        if flush_size < 1:
+            raise ValueError("flush_size must be at least 1")
+
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+
+        self.fetch_size = fetch_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+
+class StateStoreBuffer(Generic[JobType]):
+    def __init__(
+        self,
+        state_store: StateStoreProtocol[JobType],
+        *,
+        flush_size: int,
+        flush_interval: float,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        self.state_store = state_store
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.instrumentation = instrumentation
+        # Entries keep a reference to the original job so that its id can't
+        # be reused by a different job while a write is still pending.
+        self._pending: dict[int, tuple[JobType, JobType]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher: threading.Thread | None = None
+        self._errors: list[Exception] = []
+
+    def update(self, job: JobType) -> None:
+        self._raise_pending_error()
+
+        # The job may keep changing while the write is pending, including
+        # values nested in its fields, so a snapshot of its current state is
+        # what gets written.
+        snapshot = job.model_copy(deep=True)
+
+        with self._lock:
+            self._pending[id(job)] = (job, snapshot)
+            full = len(self._pending) >= self.flush_size
+
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch = [snapshot for _, snapshot in self._pending.values()]
+                self._pending.clear()
+
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            self._write(batch)
+            if self.instrumentation is not None:
+                self.instrumentation.record_state_flush(time.perf_counter() - started)
+
+    def _write(self, batch: list[JobType]) -> None:
+        update_many = getattr(self.state_store, "update_many", None)
+        if update_many is not None:
+            update_many(batch)
+            return
+
+        for job in batch:
+            self.state_store.update(job)
+
+    def _raise_pending_error(self) -> None:
+        if self._errors:
+            raise self._errors.pop(0)
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as exc:
+                LOG.exception("Failed to flush job state updates")
+                self._errors.append(exc)
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically,
+            name="ergate-state-flusher",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+        self.flush()
+        self._raise_pending_error()
@@ -0,0 +1,33 @@
+class StepChaining:
+    """
+    Limits for running consecutive steps of a job within a single worker pass.
+
+    Rather than handing a job back to the state store after every step (and
+    waiting for it to come back through the queue), a worker may keep running
+    the next steps locally while the job stays `RUNNING`. A pass ends once the
+    job reaches a final state, a step opts out of chaining, `max_steps` steps
+    have run or `time_budget` seconds have elapsed.
+
+    The job's state is persisted when the pass ends and, if `checkpoint_every`
+    is set, after every `checkpoint_every` chained steps.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_steps: int | None = None,
+        time_budget: float | None = None,
+        checkpoint_every: int | None = None,
+    ) -> None:
+        if max_steps is not None and max_steps < 1:
+            raise ValueError("max_steps must be at least 1")
+
+        if time_budget is not None and time_budget <= 0:
+            raise ValueError("time_budget must be positive")
+
+        if checkpoint_every is not None and checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1")
+
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.checkpoint_every = checkpoint_every
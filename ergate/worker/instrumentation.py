@@ -0,0 +1,348 @@
+import bisect
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import AbstractContextManager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Protocol
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+METRIC_DESCRIPTIONS = {
+    "ergate_dequeue_duration_seconds": "Time spent waiting for jobs from the queue",
+    "ergate_args_build_duration_seconds": "Time spent building step arguments",
+    "ergate_step_duration_seconds": "Time spent running steps",
+    "ergate_teardown_duration_seconds": "Time spent tearing down step dependencies",
+    "ergate_state_update_duration_seconds": "Time spent writing job state",
+    "ergate_state_flush_duration_seconds": "Time spent writing batches of job state",
+    "ergate_jobs_dequeued_total": "Jobs taken from the queue",
+    "ergate_steps_total": "Steps run, by the job status they left the job in",
+    "ergate_job_runs_total": "Job runs, by the job status they ended with",
+    "ergate_queue_wait_seconds": "Time jobs spent queued, by scheduling class",
+    "ergate_starved_jobs_total": "Jobs taken out of turn for having waited too long",
+    "ergate_deferred_jobs_total": "Jobs deferred for having reached a rate limit",
+    "ergate_step_cache_lookups_total": "Cached steps run, by whether they were cached",
+}
+
+_NULL_CONTEXT = nullcontext()
+
+Labels = Mapping[str, str]
+
+
+class MetricsRecorderProtocol(Protocol):
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        """Records a value (such as a duration) in a histogram."""
+        ...
+
+    def increment(self, name: str, labels: Labels) -> None:
+        """Increments a counter by one."""
+        ...
+
+
+class TracerProtocol(Protocol):
+    """
+    Anything that starts spans the way OpenTelemetry tracers do, such as
+    `opentelemetry.trace.get_tracer("ergate")`.
+    """
+
+    def start_as_current_span(
+        self,
+        name: str,
+        *,
+        attributes: Mapping[str, Any] | None = None,
+    ) -> AbstractContextManager[Any]: ...
+
+
+class _HistogramValue:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    In-memory histograms and counters, which can be rendered in the
+    Prometheus text exposition format.
+
+    Metrics are kept per process: with a process pool, use a recorder that
+    reports to something shared instead.
+    """
+
+    def __init__(self, *, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError("buckets must be a non-empty, sorted sequence")
+
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: dict[
+            str, dict[tuple[tuple[str, str], ...], _HistogramValue]
+        ] = {}
+        self._counters: dict[str, dict[tuple[tuple[str, str], ...], int]] = {}
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _HistogramValue(len(self.buckets))
+
+            if index < len(self.buckets):
+                histogram.bucket_counts[index] += 1
+            histogram.count += 1
+            histogram.sum += value
+
+    def increment(self, name: str, labels: Labels) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + 1
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+
+        with self._lock:
+            for name, histograms in sorted(self._histograms.items()):
+                self._render_header(lines, name, "histogram")
+                for key, histogram in sorted(histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram.bucket_counts):
+                        cumulative += count
+                        labels = _format_labels((*key, ("le", repr(bound))))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+
+                    labels = _format_labels((*key, ("le", "+Inf")))
+                    lines.extend((
+                        f"{name}_bucket{labels} {histogram.count}",
+                        f"{name}_sum{_format_labels(key)} {histogram.sum}",
+                        f"{name}_count{_format_labels(key)} {histogram.count}",
+                    ))
+
+            for name, counters in sorted(self._counters.items()):
+                self._render_header(lines, name, "counter")
+                for key, value in sorted(counters.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_header(lines: list[str], name: str, type_: str) -> None:
+        description = METRIC_DESCRIPTIONS.get(name)
+        if description is not None:
+            lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {type_}")
+
+
+def start_metrics_server(
+    registry: MetricsRegistry,
+    *,
+    host: str = "0.0.0.0",
+    port: int = 9100,
+) -> ThreadingHTTPServer:
+    """
+    Serves the registry's metrics in the Prometheus text format from a
+    background thread. Call `shutdown()` on the returned server to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Scrapes would otherwise be logged to stderr
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(
+        target=server.serve_forever,
+        name="ergate-metrics-server",
+        daemon=True,
+    )
+    thread.start()
+    return server
+
+
+class StepTimer:
+    """
+    Points in time while running a step, as measured by `perf_counter`.
+    Steps that run more than once, such as for each item of a map chunk,
+    call `start_next` before each run after the first, and the durations of
+    every run add up.
+    """
+
+    __slots__ = ("built", "finished", "previous", "ran", "started")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.built: float | None = None
+        self.ran: float | None = None
+        self.finished: float | None = None
+        self.previous: tuple[float, float, float] | None = None
+
+    def mark_built(self) -> None:
+        self.built = time.perf_counter()
+
+    def mark_ran(self) -> None:
+        self.ran = time.perf_counter()
+
+    def mark_finished(self) -> None:
+        self.finished = time.perf_counter()
+
+    def start_next(self) -> None:
+        self.mark_finished()
+        build, run, teardown = self.get_durations()
+        self.previous = (build or 0.0, run or 0.0, teardown or 0.0)
+        self.started = self.finished or self.started
+        self.built = self.ran = self.finished = None
+
+    def get_durations(self) -> tuple[float | None, float | None, float | None]:
+        """
+        Returns the time spent building arguments, running the step and
+        tearing down its dependencies, or `None` for those that weren't
+        reached.
+        """
+        built = self.built if self.built is not None else self.finished
+        build = built - self.started if built is not None else None
+        run = (
+            self.ran - self.built
+            if self.built is not None and self.ran is not None
+            else None
+        )
+        teardown = (
+            self.finished - self.ran
+            if self.ran is not None and self.finished is not None
+            else None
+        )
+        if self.previous is None:
+            return build, run, teardown
+
+        previous_build, previous_run, previous_teardown = self.previous
+        return (
+            previous_build + (build or 0.0),
+            previous_run + (run or 0.0),
+            previous_teardown + (teardown or 0.0),
+        )
+
+
+class Instrumentation:
+    """
+    Records metrics about the jobs a worker runs through `recorder` (an
+    in-memory `MetricsRegistry` by default) and, if a `tracer` is given,
+    wraps each job run and step in a span.
+    """
+
+    def __init__(
+        self,
+        recorder: MetricsRecorderProtocol | None = None,
+        *,
+        tracer: TracerProtocol | None = None,
+    ) -> None:
+        self.recorder: MetricsRecorderProtocol = (
+            recorder if recorder is not None else MetricsRegistry()
+        )
+        self.tracer = tracer
+
+    def span(
+        self,
+        name: str,
+        attributes: Mapping[str, Any],
+    ) -> AbstractContextManager[Any]:
+        if self.tracer is None:
+            return _NULL_CONTEXT
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    def record_dequeue(self, duration: float, n_jobs: int) -> None:
+        self.recorder.observe("ergate_dequeue_duration_seconds", duration, {})
+        for _ in range(n_jobs):
+            self.recorder.increment("ergate_jobs_dequeued_total", {})
+
+    def record_queue_wait(self, duration: float, job_class: str) -> None:
+        self.recorder.observe(
+            "ergate_queue_wait_seconds", duration, {"class": job_class}
+        )
+
+    def record_starved_job(self, job_class: str) -> None:
+        self.recorder.increment("ergate_starved_jobs_total", {"class": job_class})
+
+    def record_state_update(self, duration: float, workflow: str) -> None:
+        self.recorder.observe(
+            "ergate_state_update_duration_seconds", duration, {"workflow": workflow}
+        )
+
+    def record_state_flush(self, duration: float) -> None:
+        self.recorder.observe("ergate_state_flush_duration_seconds", duration, {})
+
+    def record_step(
+        self,
+        timer: StepTimer,
+        workflow: str,
+        step: str,
+        status: str,
+    ) -> None:
+        labels = {"workflow": workflow, "step": step}
+        build, run, teardown = timer.get_durations()
+
+        if build is not None:
+            self.recorder.observe("ergate_args_build_duration_seconds", build, labels)
+
+        if run is not None:
+            self.recorder.observe("ergate_step_duration_seconds", run, labels)
+
+        if teardown is not None:
+            self.recorder.observe("ergate_teardown_duration_seconds", teardown, labels)
+
+        self.recorder.increment("ergate_steps_total", {**labels, "status": status})
+
+    def record_deferral(self, workflow: str, limit: str) -> None:
+        self.recorder.increment(
+            "ergate_deferred_jobs_total", {"workflow": workflow, "limit": limit}
+        )
+
+    def record_cache_lookup(self, workflow: str, step: str, hit: bool) -> None:
+        self.recorder.increment(
+            "ergate_step_cache_lookups_total",
+            {"workflow": workflow, "step": step, "result": "hit" if hit else "miss"},
+        )
+
+    def record_job_run(self, workflow: str, status: str) -> None:
+        self.recorder.increment(
+            "ergate_job_runs_total", {"workflow": workflow, "status": status}
+        )
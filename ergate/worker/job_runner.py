@@ -1,128 +1,583 @@
-from typing import Generic, TypeVar
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from typing import Any, TypeVar
 
-from ..exceptions import AbortJob, GoToEnd, GoToStep, ReverseGoToError
-from ..interrupt import DelayedKeyboardInterrupt
+from ..depends_cache import DependsScope
+from ..exceptions import InvalidDefinitionError
+from ..interrupt import DelayedKeyboardInterrupt, StopSignals
 from ..job import Job
-from ..log import LOG
-from ..paths import GoToStepPath, NextStepPath
+from ..job_status import JobStatus
+from ..log import LOG, LogSettings, QueuedLogging
+from ..result_store import ResultOffloading
+from ..workflow import Workflow
 from ..workflow_registry import WorkflowRegistry
+from ..workflow_step import WorkflowStep
+from .base_job_runner import NOT_CACHED, BaseJobRunner
+from .batching import Batching, StateStoreBuffer
+from .chaining import StepChaining
+from .instrumentation import Instrumentation, StepTimer
+from .limiter import LimiterProtocol
+from .pool import PoolType, create_executor, submit_job
 from .queue import QueueProtocol
 from .signals import ErgateSignal, SignalHandler
 from .state_store import StateStoreProtocol
+from .timeouts import TimeLimit, run_isolated, run_with_time_limit
 
 JobType = TypeVar("JobType", bound=Job)
 
+# How often workers waiting for a free slot check whether they must stop
+_SLOT_WAIT_INTERVAL = 0.1
 
-class JobRunner(Generic[JobType]):
+
+class JobRunner(BaseJobRunner[JobType]):
     def __init__(
         self,
         queue: QueueProtocol[JobType],
         workflow_registry: WorkflowRegistry,
         state_store: StateStoreProtocol[JobType],
         signal_handler: SignalHandler[JobType],
+        *,
+        concurrency: int = 1,
+        pool: PoolType = "thread",
+        prefetch: int = 0,
+        chaining: StepChaining | None = None,
+        batching: Batching | None = None,
+        log_settings: LogSettings | None = None,
+        results: ResultOffloading | None = None,
+        instrumentation: Instrumentation | None = None,
+        limiter: LimiterProtocol | None = None,
     ) -> None:
+        if concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+
+        if prefetch < 0:
+            raise ValueError("Prefetch cannot be negative")
+
+        super().__init__(
+            workflow_registry,
+            signal_handler,
+            chaining,
+            log_settings,
+            results,
+            instrumentation,
+            limiter,
+        )
         self.queue = queue
-        self.workflow_registry = workflow_registry
         self.state_store = state_store
-        self.signal_handler = signal_handler
+        self.concurrency = concurrency
+        self.pool = pool
+        self.prefetch = prefetch
+        self.batching = batching
+        self._worker_scope = DependsScope(ExitStack(), shared=True)
+        self._state_buffer: StateStoreBuffer[JobType] | None = (
+            StateStoreBuffer(
+                state_store,
+                flush_size=batching.flush_size,
+                flush_interval=batching.flush_interval,
+                instrumentation=instrumentation,
+            )
+            if batching is not None
+            else None
+        )
+        self._queued_logging = QueuedLogging() if self.log_settings.queue else None
+        # Runs the steps of a stage that run at the same time
+        self._branch_executor: ThreadPoolExecutor | None = None
+        self._is_cancelling: Callable[[JobType], bool] | None = getattr(
+            state_store, "is_cancelling", None
+        )
+        self._start_map: Callable[[JobType, list[JobType]], None] | None = getattr(
+            state_store, "start_map", None
+        )
+        self._finish_map_child: (
+            Callable[[JobType], tuple[JobType, Sequence[JobType]] | None] | None
+        ) = getattr(state_store, "finish_map_child", None)
+
+    def _cancel_if_requested(self, job: JobType) -> bool:
+        if job.status != JobStatus.CANCELLING and (
+            self._is_cancelling is None or not self._is_cancelling(job)
+        ):
+            return False
+
+        job.mark_cancelled()
+        self._log_cancelled(job)
+        return True
+
+    def _flush_state(self) -> None:
+        # Writes that are still buffered must not land after the ones that
+        # follow, which go straight to the state store.
+        if self._state_buffer is not None:
+            self._state_buffer.flush()
+
+    def _wait_for_map(
+        self, job: JobType, workflow: Workflow, children: list[JobType]
+    ) -> None:
+        if not children:
+            self._handle_step_success(job, workflow, [])
+            return
+
+        assert self._start_map is not None, "Mapped steps not supported"
+        self._flush_state()
+        job.mark_waiting()
+        self._start_map(job, children)
+        self._log_map_started(job, children)
+
+    def _store_map_child(self, job: JobType, workflow: Workflow) -> None:
+        if self.results is not None:
+            self.results.prepare(job)
+
+        assert self._finish_map_child is not None, "Mapped steps not supported"
+        self._flush_state()
+        joined = self._finish_map_child(job)
+        if joined is None:
+            return
+
+        parent, children = joined
+        self._join_map(parent, workflow, children)
+        self._update_state(parent)
+
+    def _update_state(self, job: JobType) -> None:
+        if self.results is not None:
+            self.results.prepare(job)
+
+        if self._state_buffer is not None:
+            self._state_buffer.update(job)
+        elif self.instrumentation is not None:
+            started = time.perf_counter()
+            self.state_store.update(job)
+            self.instrumentation.record_state_update(
+                time.perf_counter() - started, job.workflow_name
+            )
+        else:
+            self.state_store.update(job)
+
+    def _fetch_jobs(self, max_jobs: int) -> list[JobType]:
+        started = time.perf_counter()
+
+        get_many = getattr(self.queue, "get_many", None)
+        if max_jobs > 1 and get_many is not None:
+            jobs = list(get_many(max_jobs))
+        else:
+            jobs = [self.queue.get_one()]
+
+        if self.instrumentation is not None:
+            self.instrumentation.record_dequeue(
+                time.perf_counter() - started, len(jobs)
+            )
+        return jobs
+
+    @property
+    def fetch_size(self) -> int:
+        return self.batching.fetch_size if self.batching is not None else 1
+
+    def open(self) -> None:
+        """Prepares the resources shared by every job this runner runs."""
+        if self._queued_logging is not None:
+            self._queued_logging.start()
+        self._worker_scope = DependsScope(ExitStack(), shared=True)
+        if self._state_buffer is not None:
+            self._state_buffer.start()
+
+    def close(self) -> None:
+        """Tears down worker-scoped dependencies and flushes pending updates."""
+        try:
+            self._worker_scope.stack.close()
+            self._close_branch_executor()
+        finally:
+            try:
+                if self._state_buffer is not None:
+                    self._state_buffer.close()
+            finally:
+                if self._queued_logging is not None:
+                    self._queued_logging.stop()
+
+    def _close_branch_executor(self) -> None:
+        if self._branch_executor is not None:
+            self._branch_executor.shutdown()
+            self._branch_executor = None
+
+    def after_fork(self) -> ExitStack:
+        """
+        Prepares the runner in a forked pool process, which has its own
+        worker-scoped dependencies, state buffer and log listener. Closing
+        the returned stack tears those down, and nothing else.
+        """
+        limiter_after_fork = getattr(self.limiter, "after_fork", None)
+        if limiter_after_fork is not None:
+            limiter_after_fork()
+
+        stack = ExitStack()
+        if self._queued_logging is not None:
+            self._queued_logging.start()
+            stack.callback(self._queued_logging.stop)
+        if self._state_buffer is not None:
+            self._state_buffer.start()
+            stack.callback(self._state_buffer.close)
+
+        self._worker_scope = DependsScope(ExitStack(), shared=True)
+        stack.callback(self._worker_scope.stack.close)
+        self._branch_executor = None
+        stack.callback(self._close_branch_executor)
+        return stack
 
     def _run_job(self, job: JobType) -> None:
-        self.signal_handler.trigger(ErgateSignal.JOB_RUN_START, job)
+        with self._job_span(job):
+            self._run_job_steps(job)
 
-        input_value = job.get_input_value()
+    def _run_job_steps(self, job: JobType) -> None:
+        self.signal_handler.trigger(ErgateSignal.JOB_RUN_START, job)
 
         workflow = self.workflow_registry[job.workflow_name]
-        paths = workflow.paths[job.current_step]
-        step_to_run = workflow[job.current_step]
 
-        job.mark_running(step_to_run)
-        self.state_store.update(job)
+        if not self._cancel_if_requested(job):
+            self._run_job_pass(job, workflow)
+
+        if self._is_finished_map_child(job):
+            self._store_map_child(job, workflow)
+        elif job.status != JobStatus.WAITING:
+            # Waiting jobs were stored along with their child jobs already
+            self._update_state(job)
+        self._record_job_run(job)
+        self.signal_handler.trigger(ErgateSignal.JOB_RUN_END, job)
+
+    def _run_job_pass(self, job: JobType, workflow: Workflow) -> None:
+        job.mark_running(workflow[job.current_step])
+        self._update_state(job)
+
+        with ExitStack() as job_stack:
+            job_scope = DependsScope(job_stack)
+
+            started = time.monotonic()
+            steps_run = 0
+            while True:
+                held = self._acquire_limits(job, workflow)
+                if held is None:
+                    break
+
+                try:
+                    with self._step_span(job, workflow):
+                        self._run_step(job, workflow, job_scope)
+                finally:
+                    self._release_limits(held)
+                steps_run += 1
+
+                # Checked before the job is handed back, since the worker's
+                # update would otherwise overwrite the `CANCELLING` status.
+                if job.status == JobStatus.PENDING and self._cancel_if_requested(job):
+                    break
+
+                if not self._should_chain(job, workflow, steps_run, started):
+                    break
+
+                job.mark_running(workflow[job.current_step])
+                if self._should_checkpoint(steps_run):
+                    self._update_state(job)
+
+    def _run_step(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        job_scope: DependsScope,
+    ) -> None:
+        stage = workflow.get_stage(job.current_step)
+        if len(stage) > 1:
+            self._run_stage(job, workflow, stage, job_scope)
+            return
+
+        step_to_run = stage[0]
+        timer = StepTimer() if self.instrumentation is not None else None
+
+        input_value = self._get_input_value(job, step_to_run)
+        children: list[JobType] | None = None
 
         try:
+            self._log_step_start(job, step_to_run, input_value)
+            self._ensure_sync(step_to_run)
+
             try:
-                LOG.info("Running %s - input value: %s", str(step_to_run), input_value)
-
-                with step_to_run.build_args(job.user_context, input_value) as all_args:
-                    args, kwargs = all_args
-                    retval = step_to_run(*args, **kwargs)
-            except AbortJob as exc:
-                LOG.info("User requested to abort job: %s", exc)
-
-                job.mark_aborted(exc.message)
-            except GoToEnd as exc:
-                LOG.info(
-                    "User requested to go to end of workflow - return value: %s",
-                    exc.retval,
-                )
-
-                job.mark_step_n_completed(
-                    job.steps_completed, exc.retval, job.steps_completed + 1
-                )
-            except GoToStep as exc:
-                LOG.info(
-                    "User requested to go to step: %s (%s) - return value: %s",
-                    exc.step.name,
-                    exc.step.index,
-                    exc.retval,
-                )
-
-                if exc.step.index <= job.current_step:
-                    raise ReverseGoToError(
-                        "User attempted to go to an earlier step, "
-                        "which is not permitted."
+                if not step_to_run.is_map:
+                    retval = self._call_step(
+                        job, workflow, step_to_run, input_value, job_scope, timer
                     )
-
-                remaining_steps = max(
-                    (
-                        len(path)
-                        for path in paths
-                        if isinstance(path[0][0], GoToStepPath)
-                        and path[0][0].step_name == exc.step.name
-                    ),
-                    default=len(workflow) - job.current_step,
-                )
-
-                job.mark_step_n_completed(
-                    exc.step.index, exc.retval, job.steps_completed + remaining_steps
-                )
-            except Exception as exc:
-                # Since `except GoToStep` potentially raises an exception, the logic
-                # for handling exceptions had to be moved to a higher scope.
-                raise exc
-            else:
-                LOG.info("Step completed successfully - return value: %s", retval)
-
-                remaining_steps = max(
-                    (
-                        len(path)
-                        for path in paths
-                        if isinstance(path[0][0], NextStepPath)
-                    ),
-                    default=len(workflow) - job.current_step + 1,
-                )
-
-                job.mark_step_n_completed(
-                    job.current_step + 1, retval, job.steps_completed + remaining_steps
-                )
+                elif job.map_index is None:
+                    self._require_map_support(self._start_map, step_to_run)
+                    children = self._split_map(job, step_to_run, input_value)
+                else:
+                    retval = []
+                    for index, item in enumerate(input_value):
+                        # Each item is timed on its own, and their times add up
+                        if timer is not None and index:
+                            timer.start_next()
+                        retval.append(
+                            self._call_step(
+                                job, workflow, step_to_run, item, job_scope, timer
+                            )
+                        )
+            finally:
+                if timer is not None:
+                    timer.mark_finished()
         except Exception as exc:
-            LOG.exception("Job raised an exception")
-            job.mark_failed(exc)
-            self.signal_handler.trigger(ErgateSignal.JOB_RUN_FAIL, job)
+            self._handle_step_exception(job, workflow, exc)
+        else:
+            if children is not None:
+                self._wait_for_map(job, workflow, children)
+            elif job.map_index is not None:
+                self._handle_map_chunk_success(job, retval)
+            else:
+                self._handle_step_success(job, workflow, retval)
 
-        self.state_store.update(job)
-        self.signal_handler.trigger(ErgateSignal.JOB_RUN_END, job)
+        if timer is not None:
+            self._record_step(job, step_to_run, timer)
 
-    def run(self) -> None:
-        while True:
-            LOG.info("Listening for next job")
+    def _run_stage(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        stage: list[WorkflowStep],
+        job_scope: DependsScope,
+    ) -> None:
+        timer = StepTimer() if self.instrumentation is not None else None
+        step = stage[0]
+
+        try:
             try:
-                job = self.queue.get_one()
-            except KeyboardInterrupt:
-                return
+                with ExitStack() as stack:
+                    # Arguments are built one step at a time, since dependency
+                    # scopes aren't shared between threads.
+                    calls = []
+                    keys: dict[int, str] = {}
+                    cached: dict[int, Any] = {}
+                    for step in stage:
+                        input_value = self._get_input_value(job, step)
+                        self._log_step_start(job, step, input_value)
+                        self._ensure_sync(step)
+
+                        key, retval = self._get_cached(job, step, input_value)
+                        if retval is not NOT_CACHED:
+                            cached[step.index] = retval
+                            continue
+                        if key is not None:
+                            keys[step.index] = key
+
+                        time_limit = self._get_time_limit(job, workflow, step)
+                        args, kwargs = stack.enter_context(
+                            step.build_args(
+                                job.get_user_context(),
+                                input_value,
+                                job_scope=job_scope,
+                                worker_scope=self._worker_scope,
+                            )
+                        )
+                        calls.append((step, args, kwargs, time_limit))
+
+                    if timer is not None:
+                        timer.mark_built()
+
+                    executor = self._get_branch_executor()
+                    futures = {
+                        call[0].index: executor.submit(self._invoke_step, *call)
+                        for call in calls
+                    }
+                    wait(futures.values())
+                    if timer is not None:
+                        timer.mark_ran()
 
-            LOG.info("Job acquired")
+                    # Raises the exception of the first step that failed, if any
+                    retvals = []
+                    for step in stage:
+                        if step.index in cached:
+                            retvals.append(cached[step.index])
+                            continue
+
+                        retval = futures[step.index].result()
+                        if step.index in keys:
+                            self._set_cached(job, step, keys[step.index], retval)
+                        retvals.append(retval)
+            finally:
+                if timer is not None:
+                    timer.mark_finished()
+        except Exception as exc:
+            self._handle_step_exception(job, workflow, exc, step)
+        else:
+            self._handle_step_success(job, workflow, retvals)
+
+        if timer is not None:
+            for step in stage:
+                self._record_step(job, step, timer)
+
+    def _get_branch_executor(self) -> ThreadPoolExecutor:
+        if self._branch_executor is None:
+            self._branch_executor = ThreadPoolExecutor(
+                thread_name_prefix="ergate-branch"
+            )
+        return self._branch_executor
+
+    def _ensure_sync(self, step: WorkflowStep) -> None:
+        if step.is_async:
+            raise InvalidDefinitionError(
+                f"Step {step} is asynchronous and can only be run "
+                "by an asynchronous worker"
+            )
+
+    def _call_step(
+        self,
+        job: JobType,
+        workflow: Workflow,
+        step: WorkflowStep,
+        input_value: Any,
+        job_scope: DependsScope,
+        timer: StepTimer | None,
+    ) -> Any:
+        key, retval = self._get_cached(job, step, input_value)
+        if retval is not NOT_CACHED:
+            return retval
+
+        time_limit = self._get_time_limit(job, workflow, step)
+
+        with step.build_args(
+            job.get_user_context(),
+            input_value,
+            job_scope=job_scope,
+            worker_scope=self._worker_scope,
+        ) as all_args:
+            if timer is not None:
+                timer.mark_built()
+            args, kwargs = all_args
             try:
-                with DelayedKeyboardInterrupt():
+                retval = self._invoke_step(step, args, kwargs, time_limit)
+            finally:
+                if timer is not None:
+                    timer.mark_ran()
+
+        if key is not None:
+            self._set_cached(job, step, key, retval)
+        return retval
+
+    def _invoke_step(
+        self,
+        step: WorkflowStep,
+        args: list[Any],
+        kwargs: dict[str, Any],
+        time_limit: TimeLimit | None,
+    ) -> Any:
+        if step.isolated:
+            return run_isolated(step, args, kwargs, time_limit)
+        if time_limit is not None:
+            return run_with_time_limit(step, args, kwargs, time_limit)
+        return step(*args, **kwargs)
+
+    def run(self) -> None:
+        # The pool is created before `open` starts any threads, since its
+        # processes are forked and would inherit the locks they hold.
+        executor: Executor | None = None
+        if self.concurrency > 1 or self.prefetch > 0:
+            executor = create_executor(self.pool, self.concurrency, self)
+
+        try:
+            self.open()
+        except BaseException:
+            if executor is not None:
+                executor.shutdown()
+            raise
+
+        try:
+            if executor is None:
+                self._run_sequentially()
+            else:
+                self._run_concurrently(executor)
+        finally:
+            with DelayedKeyboardInterrupt():
+                self.close()
+
+    def _run_sequentially(self) -> None:
+        # Signals are handled like when running jobs concurrently: they only
+        # interrupt waiting for the queue, and the worker returns once the
+        # jobs it holds have run.
+        stop = StopSignals()
+        with stop:
+            while not stop.received:
+                LOG.info("Listening for next job")
+                try:
+                    with stop.interruptible():
+                        jobs = self._fetch_jobs(self.fetch_size)
+                except KeyboardInterrupt:
+                    return
+
+                LOG.info("%d job(s) acquired", len(jobs))
+                # Every job in the batch has been taken from the queue already,
+                # so they must all run before the worker is allowed to stop.
+                for job in jobs:
                     self._run_job(job)
+                    self._notify_job_done()
+
+    def _run_concurrently(self, executor: Executor) -> None:
+        # Every job that has been taken from the queue occupies a slot until it
+        # finishes running, so at most `concurrency + prefetch` jobs are held
+        # by this worker at any given time.
+        slots = threading.BoundedSemaphore(self.concurrency + self.prefetch)
+        errors: list[BaseException] = []
+
+        def on_done(future: Future[None]) -> None:
+            slots.release()
+            exc = future.exception()
+            if exc is not None:
+                errors.append(exc)
+            self._notify_job_done()
+
+        # `SIGTERM` and `SIGINT` are handled for the whole run: the worker
+        # stops taking jobs, lets the ones it holds finish and then returns,
+        # like it does when running jobs one at a time.
+        stop = StopSignals()
+        with stop:
+            try:
+                while not errors and not stop.received:
+                    self._submit_next_jobs(executor, slots, errors, on_done, stop)
             except KeyboardInterrupt:
+                # Raised by the queue once it's closed, or by a signal while
+                # waiting for it
+                pass
+            finally:
+                LOG.info("Waiting for running jobs to complete")
+                executor.shutdown(wait=True)
+
+        if errors:
+            raise errors[0]
+
+    def _submit_next_jobs(
+        self,
+        executor: Executor,
+        slots: threading.BoundedSemaphore,
+        errors: list[BaseException],
+        on_done: Callable[[Future[None]], None],
+        stop: StopSignals,
+    ) -> None:
+        # Waiting for a slot isn't interrupted by signals, which could leave
+        # the lock that finishing jobs release it with held.
+        while not slots.acquire(timeout=_SLOT_WAIT_INTERVAL):
+            if errors or stop.received:
                 return
+
+        if errors or stop.received:
+            slots.release()
+            return
+
+        # Fetch as many jobs as there are free slots, up to the batch size
+        acquired = 1
+        while acquired < self.fetch_size and slots.acquire(blocking=False):
+            acquired += 1
+
+        LOG.info("Listening for next job")
+        jobs: list[JobType] = []
+        try:
+            with stop.interruptible():
+                jobs = self._fetch_jobs(acquired)
+        finally:
+            for _ in range(acquired - len(jobs)):
+                slots.release()
+
+        LOG.info("%d job(s) acquired", len(jobs))
+        for job in jobs:
+            future = submit_job(executor, self, job)
+            future.add_done_callback(on_done)
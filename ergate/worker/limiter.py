@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Protocol
+
+from ..rate_limit import RateLimit
+
+
+class LimiterProtocol(Protocol):
+    """
+    Keeps track of the concurrency slots and token buckets of rate limits.
+    It's called before and after each step that has a limit, and may block,
+    such as to wait for a lock shared with other processes: asynchronous
+    workers call it from a thread, never from the event loop.
+    """
+
+    def acquire(self, key: str, limit: RateLimit, slot: str) -> float:
+        """
+        Takes a token from the bucket of the limit with the given key and, if
+        it limits concurrency, the slot with the given ID. Returns `0` if
+        both were available, or how many seconds to wait before trying again
+        otherwise, in which case nothing is taken.
+        """
+        ...
+
+    def release(self, key: str, slot: str) -> None:
+        """Frees a slot taken with `acquire` once its step has finished."""
+        ...
+
+
+class LocalLimiter:
+    """
+    Limiter that lives in the memory of the current process, so limits only
+    hold across the jobs run by one worker process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: dict[str, tuple[float, float]] = {}
+        self._slots: dict[str, set[str]] = {}
+
+    def acquire(self, key: str, limit: RateLimit, slot: str) -> float:
+        now = time.monotonic()
+
+        with self._lock:
+            slots = self._slots.setdefault(key, set())
+            if limit.max_concurrency is not None and (
+                len(slots) >= limit.max_concurrency
+            ):
+                return limit.defer
+
+            if limit.rate is not None:
+                bucket = self._tokens.get(key)
+                tokens = (
+                    limit.refill(bucket[0], now - bucket[1])
+                    if bucket is not None
+                    else limit.refill(None, 0)
+                )
+                delay = limit.get_token_delay(tokens)
+                if delay:
+                    return delay
+                self._tokens[key] = (tokens - 1, now)
+
+            if limit.max_concurrency is not None:
+                slots.add(slot)
+            return 0.0
+
+    def release(self, key: str, slot: str) -> None:
+        with self._lock:
+            self._slots.get(key, set()).discard(slot)
+
+    def after_fork(self) -> None:
+        # Another thread may have held the lock when the process forked
+        self._lock = threading.Lock()
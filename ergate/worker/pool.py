@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import multiprocessing
+import multiprocessing.util
+import signal
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from multiprocessing.synchronize import Barrier
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from .job_runner import JobRunner
+
+PoolType = Literal["thread", "process"]
+
+_PROCESS_RUNNER: JobRunner[Any] | None = None
+_PROCESSES_STARTED: Barrier | None = None
+
+
+def _initialize_process(runner: JobRunner[Any], started: Barrier) -> None:
+    global _PROCESS_RUNNER, _PROCESSES_STARTED
+    _PROCESS_RUNNER = runner
+    _PROCESSES_STARTED = started
+
+    # The parent process owns shutdown: it stops fetching jobs and waits
+    # for every slot to drain, so children must not die mid-step.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    # Each child has its own worker-scoped dependencies and state buffer,
+    # which are torn down and flushed when the child exits.
+    opened = runner.after_fork()
+    multiprocessing.util.Finalize(None, opened.close, exitpriority=10)
+
+
+def _wait_for_other_processes() -> None:
+    assert _PROCESSES_STARTED is not None, "Process pool not initialized"
+    _PROCESSES_STARTED.wait()
+
+
+def _start_processes(
+    executor: ProcessPoolExecutor, max_workers: int, started: Barrier
+) -> None:
+    # The pool only forks when a job is submitted and no process is idle,
+    # which could be while another thread holds a lock that would then never
+    # be released in the child. Every process is started right away instead,
+    # by keeping each one busy until all of them are running.
+    futures = [executor.submit(_wait_for_other_processes) for _ in range(max_workers)]
+    try:
+        for future in futures:
+            future.result()
+    except BaseException:
+        started.abort()
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def _run_job_in_process(job: Any) -> None:
+    assert _PROCESS_RUNNER is not None, "Process pool not initialized"
+    _PROCESS_RUNNER._run_job(job)
+
+
+def create_executor(
+    pool: PoolType,
+    max_workers: int,
+    runner: JobRunner[Any],
+) -> Executor:
+    if pool == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ergate-worker",
+        )
+
+    if pool == "process":
+        # Forking lets children inherit the runner (and with it the workflow
+        # registry, queue and state store) without having to pickle it.
+        context = multiprocessing.get_context("fork")
+        started = context.Barrier(max_workers)
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_initialize_process,
+            initargs=(runner, started),
+        )
+        _start_processes(executor, max_workers, started)
+        return executor
+
+    raise ValueError(f"Unknown pool type: {pool}")
+
+
+def submit_job(
+    executor: Executor,
+    runner: JobRunner[Any],
+    job: Any,
+) -> Future[None]:
+    if isinstance(executor, ProcessPoolExecutor):
+        return executor.submit(_run_job_in_process, job)
+    return executor.submit(runner._run_job, job)
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from typing import Protocol, TypeVar
 
 from ..job import Job
@@ -7,3 +8,21 @@ JobType = TypeVar("JobType", bound=Job, covariant=True)
 
 class QueueProtocol(Protocol[JobType]):
     def get_one(self) -> JobType: ...
+
+
+class BatchQueueProtocol(QueueProtocol[JobType], Protocol[JobType]):
+    def get_many(self, n: int) -> Sequence[JobType]: ...
+
+
+class AsyncQueueProtocol(Protocol[JobType]):
+    async def get_one(self) -> JobType: ...
+
+
+class PollableQueueProtocol(QueueProtocol[JobType], Protocol[JobType]):
+    def poll(self) -> JobType | None:
+        """
+        Takes a job if one is available straight away, or returns `None`
+        otherwise. Like `get_one`, raises `KeyboardInterrupt` once the queue
+        is closed and empty.
+        """
+        ...
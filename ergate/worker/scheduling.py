@@ -0,0 +1,175 @@
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from typing import Generic, TypeVar
+
+from ..job import Job
+from .instrumentation import Instrumentation
+from .queue import PollableQueueProtocol
+
+JobType = TypeVar("JobType", bound=Job)
+
+
+class _JobClass(Generic[JobType]):
+    __slots__ = ("closed", "lagging", "name", "queue", "tag", "weight")
+
+    def __init__(
+        self,
+        name: str,
+        queue: PollableQueueProtocol[JobType],
+        weight: float,
+    ) -> None:
+        self.name = name
+        self.queue = queue
+        self.weight = weight
+        # Virtual time at which the class's next job finishes being served
+        self.tag = 0.0
+        self.lagging = False
+        self.closed = False
+
+
+class FairScheduler(Generic[JobType]):
+    """
+    Queue that takes jobs from several underlying queues, one per class of
+    job (such as one per workflow or per priority), sharing the worker
+    between them by weighted fair queuing. Over time, each class that has
+    jobs waiting gets a share of the jobs taken proportional to its weight
+    in `weights` (1 by default), however many jobs the others have queued.
+
+    A class whose last job had been queued for longer than `max_wait`
+    seconds is served before the others until that's no longer the case,
+    so a heavily weighted class can't starve the rest. Queue wait times are
+    measured from when the publisher last published each job, so clocks
+    should be in sync across machines.
+
+    The underlying queues must implement `poll`. While all of them are
+    empty, they're polled every `poll_interval` seconds. Once all of them
+    are closed and empty, `get_one` and `get_many` raise
+    `KeyboardInterrupt`, which is how workers are told to stop.
+
+    If `instrumentation` is given, the time each job spent queued is
+    recorded per class, along with the jobs taken out of turn.
+    """
+
+    def __init__(
+        self,
+        queues: Mapping[str, PollableQueueProtocol[JobType]],
+        *,
+        weights: Mapping[str, float] | None = None,
+        max_wait: float | None = 60.0,
+        poll_interval: float = 0.01,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        if not queues:
+            raise ValueError("At least one queue is required")
+
+        weights = weights or {}
+        unknown = set(weights) - set(queues)
+        if unknown:
+            raise ValueError(f"Weights given for unknown classes: {sorted(unknown)}")
+
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError("weights must be positive")
+
+        if max_wait is not None and max_wait <= 0:
+            raise ValueError("max_wait must be positive")
+
+        if poll_interval <= 0:
+            raise ValueError("poll_interval must be positive")
+
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.instrumentation = instrumentation
+        self._classes = [
+            _JobClass(name, queue, weights.get(name, 1.0))
+            for name, queue in queues.items()
+        ]
+        self._lock = threading.Lock()
+        self._virtual_time = 0.0
+
+    def get_many(self, n: int) -> Sequence[JobType]:
+        while True:
+            with self._lock:
+                jobs = self._take(n)
+                all_closed = all(job_class.closed for job_class in self._classes)
+
+            if jobs:
+                return jobs
+
+            if all_closed:
+                raise KeyboardInterrupt
+
+            time.sleep(self.poll_interval)
+
+    def get_one(self) -> JobType:
+        return self.get_many(1)[0]
+
+    def poll(self) -> JobType | None:
+        with self._lock:
+            jobs = self._take(1)
+            if jobs:
+                return jobs[0]
+            if all(job_class.closed for job_class in self._classes):
+                raise KeyboardInterrupt
+            return None
+
+    def _take(self, n: int) -> list[JobType]:
+        jobs: list[JobType] = []
+        # Classes found empty aren't polled again until the next call
+        empty: set[str] = set()
+
+        while len(jobs) < n:
+            job = self._take_one(empty)
+            if job is None:
+                break
+            jobs.append(job)
+
+        return jobs
+
+    def _take_one(self, empty: set[str]) -> JobType | None:
+        candidates = sorted(
+            (
+                job_class
+                for job_class in self._classes
+                if not job_class.closed and job_class.name not in empty
+            ),
+            key=lambda job_class: (
+                not job_class.lagging,
+                max(job_class.tag, self._virtual_time),
+            ),
+        )
+
+        for job_class in candidates:
+            try:
+                job = job_class.queue.poll()
+            except KeyboardInterrupt:
+                job_class.closed = True
+                continue
+
+            if job is None:
+                empty.add(job_class.name)
+                continue
+
+            self._serve(job_class, job)
+            return job
+
+        return None
+
+    def _serve(self, job_class: _JobClass[JobType], job: JobType) -> None:
+        # Classes that had nothing queued start again from the current
+        # virtual time, rather than catching up on the turns they missed.
+        start = max(job_class.tag, self._virtual_time)
+        self._virtual_time = start
+        job_class.tag = start + 1 / job_class.weight
+
+        if self.instrumentation is not None and job_class.lagging:
+            self.instrumentation.record_starved_job(job_class.name)
+
+        wait = job.seconds_since_published()
+        if wait is None:
+            job_class.lagging = False
+            return
+
+        job_class.lagging = self.max_wait is not None and wait > self.max_wait
+        if self.instrumentation is not None:
+            self.instrumentation.record_queue_wait(wait, job_class.name)
@@ -1,9 +1,70 @@
+from collections.abc import Sequence
 from typing import Protocol, TypeVar
 
 from ..job import Job
 
 JobType = TypeVar("JobType", bound=Job, contravariant=True)
+# Jobs are both taken and returned when mapping, so this one can't vary
+MapJobType = TypeVar("MapJobType", bound=Job)
 
 
 class StateStoreProtocol(Protocol[JobType]):
     def update(self, job: JobType) -> None: ...
+
+
+class BatchStateStoreProtocol(StateStoreProtocol[JobType], Protocol[JobType]):
+    def update_many(self, jobs: Sequence[JobType]) -> None: ...
+
+
+class CancellableStateStoreProtocol(StateStoreProtocol[JobType], Protocol[JobType]):
+    def is_cancelling(self, job: JobType) -> bool:
+        """
+        Returns whether the job has been marked as `CANCELLING`. Workers ask
+        before running a job they've just taken from the queue and after
+        every step that leaves the job with steps still to run.
+        """
+        ...
+
+
+class MapStateStoreProtocol(StateStoreProtocol[MapJobType], Protocol[MapJobType]):
+    def start_map(self, parent: MapJobType, children: Sequence[MapJobType]) -> None:
+        """
+        Stores a job that has reached a mapped step, now `WAITING`, along
+        with the child jobs it was split into, which are `PENDING`. Both
+        must be stored at once, so that the parent can't be left waiting
+        for children that were never created.
+        """
+        ...
+
+    def finish_map_child(
+        self, child: MapJobType
+    ) -> tuple[MapJobType, Sequence[MapJobType]] | None:
+        """
+        Stores a child job that has reached a final state. If it was the
+        last of its siblings to do so, returns its parent along with every
+        child in `map_index` order, exactly once across every worker.
+        Returns `None` otherwise.
+        """
+        ...
+
+
+class AsyncStateStoreProtocol(Protocol[JobType]):
+    async def update(self, job: JobType) -> None: ...
+
+
+class AsyncCancellableStateStoreProtocol(
+    AsyncStateStoreProtocol[JobType], Protocol[JobType]
+):
+    async def is_cancelling(self, job: JobType) -> bool: ...
+
+
+class AsyncMapStateStoreProtocol(
+    AsyncStateStoreProtocol[MapJobType], Protocol[MapJobType]
+):
+    async def start_map(
+        self, parent: MapJobType, children: Sequence[MapJobType]
+    ) -> None: ...
+
+    async def finish_map_child(
+        self, child: MapJobType
+    ) -> tuple[MapJobType, Sequence[MapJobType]] | None: ...
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import time
+from types import FrameType
+from typing import TYPE_CHECKING, Any
+
+from ..log import LOG
+
+if TYPE_CHECKING:
+    from .app import ErgateWorker
+    from .async_app import AsyncErgateWorker
+
+# Exit code of children that stopped to be replaced by a fresh process
+_RECYCLE_EXIT_CODE = 75
+
+
+def get_memory_usage() -> int:
+    """Returns the resident set size of the current process, in bytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+
+    # Only the peak is available elsewhere, which is close enough for Python
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class WorkerSupervisor:
+    """
+    Runs a worker in `processes` child processes, forked from the current
+    one. The app only has to be imported (and its workflows registered and
+    finalized) once, before the supervisor is run, and children share it
+    with the supervisor until they change it.
+
+    Children that crash are replaced after `restart_delay` seconds.
+    Children are also replaced once they've run `max_jobs` job runs, or
+    once their memory usage exceeds `max_memory` bytes: they stop taking
+    jobs, finish the ones they hold and exit. With `pool="process"`, job
+    runs are counted by the child, but only the child's own memory usage
+    is measured, not that of its pool's processes, which are replaced
+    along with it.
+
+    On `SIGTERM` or `SIGINT`, every child is asked to stop the same way,
+    and the supervisor returns once they all have. Children still running
+    after `graceful_timeout` seconds, if given, are killed. Children that
+    stop by themselves, such as when their queue is closed, aren't
+    replaced either.
+
+    Requires a platform that supports `fork`. The worker mustn't have been
+    run in the current process, and nothing it uses may have started
+    threads yet.
+    """
+
+    def __init__(
+        self,
+        worker: ErgateWorker[Any] | AsyncErgateWorker[Any],
+        *,
+        processes: int = 1,
+        max_jobs: int | None = None,
+        max_memory: int | None = None,
+        graceful_timeout: float | None = None,
+        restart_delay: float = 1.0,
+        poll_interval: float = 0.1,
+    ) -> None:
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+
+        if max_jobs is not None and max_jobs < 1:
+            raise ValueError("max_jobs must be at least 1")
+
+        if max_memory is not None and max_memory < 1:
+            raise ValueError("max_memory must be at least 1")
+
+        if graceful_timeout is not None and graceful_timeout <= 0:
+            raise ValueError("graceful_timeout must be positive")
+
+        if restart_delay < 0:
+            raise ValueError("restart_delay cannot be negative")
+
+        if poll_interval <= 0:
+            raise ValueError("poll_interval must be positive")
+
+        self.worker = worker
+        self.processes = processes
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.graceful_timeout = graceful_timeout
+        self.restart_delay = restart_delay
+        self.poll_interval = poll_interval
+        self._children: dict[int, int] = {}
+        self._restarts: dict[int, float] = {}
+        self._stop_deadline: float | None = None
+        self._stopping = False
+        # Only used in children
+        self._jobs_run = 0
+        self._recycling = False
+
+    def run(self) -> None:
+        old_handlers = {
+            signal.SIGTERM: signal.signal(signal.SIGTERM, self._handle_stop),
+            signal.SIGINT: signal.signal(signal.SIGINT, self._handle_stop),
+        }
+
+        try:
+            for slot in range(self.processes):
+                self._spawn(slot)
+
+            while self._children or (self._restarts and not self._stopping):
+                self._reap()
+                self._restart_due()
+                self._kill_if_overdue()
+                time.sleep(self.poll_interval)
+        finally:
+            for sig, handler in old_handlers.items():
+                signal.signal(sig, handler)
+
+        LOG.info("Every worker process has stopped")
+
+    def _handle_stop(self, signum: int, frame: FrameType | None) -> None:
+        if not self._stopping:
+            LOG.info(
+                "%s received - stopping %d worker process(es)",
+                signal.Signals(signum).name,
+                len(self._children),
+            )
+            self._stopping = True
+            self._restarts.clear()
+            if self.graceful_timeout is not None:
+                self._stop_deadline = time.monotonic() + self.graceful_timeout
+
+        for pid in self._children:
+            self._signal_child(pid, signal.SIGTERM)
+
+    def _signal_child(self, pid: int, sig: signal.Signals) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            # Already exited, and about to be reaped
+            pass
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_child()
+
+        LOG.info("Started worker process %d", pid)
+        self._children[pid] = slot
+
+    def _reap(self) -> None:
+        while self._children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+
+            slot = self._children.pop(pid, None)
+            if slot is None:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                LOG.info("Worker process %d stopped", pid)
+            elif exit_code == _RECYCLE_EXIT_CODE:
+                LOG.info("Worker process %d recycled - replacing it", pid)
+                self._restarts[slot] = time.monotonic()
+            elif exit_code == 0:
+                LOG.info("Worker process %d stopped by itself", pid)
+            else:
+                LOG.error(
+                    "Worker process %d exited with code %d - replacing it in %.2fs",
+                    pid,
+                    exit_code,
+                    self.restart_delay,
+                )
+                self._restarts[slot] = time.monotonic() + self.restart_delay
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        for slot, due in list(self._restarts.items()):
+            if due <= now and not self._stopping:
+                self._restarts.pop(slot, None)
+                self._spawn(slot)
+
+    def _kill_if_overdue(self) -> None:
+        if self._stop_deadline is None or time.monotonic() < self._stop_deadline:
+            return
+
+        for pid in self._children:
+            LOG.warning("Worker process %d did not stop in time - killing it", pid)
+            self._signal_child(pid, signal.SIGKILL)
+        self._stop_deadline = None
+
+    def _run_child(self) -> None:
+        # Workers stop gracefully on `KeyboardInterrupt`, whichever signal
+        # asked them to.
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        # Job runs are counted by the process taking jobs from the queue,
+        # rather than with `JOB_RUN_END`, which a process pool triggers in
+        # its own processes.
+        self.worker.job_runner.job_done_callbacks.append(self._count_job_run)
+
+        exit_code = 0
+        try:
+            self.worker.run()
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            LOG.exception("Worker process crashed")
+            exit_code = 1
+        finally:
+            if exit_code == 0 and self._recycling:
+                exit_code = _RECYCLE_EXIT_CODE
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _count_job_run(self) -> None:
+        self._jobs_run += 1
+        if self._recycling:
+            return
+
+        if self.max_jobs is not None and self._jobs_run >= self.max_jobs:
+            reason = f"after {self._jobs_run} job runs"
+        elif self.max_memory is not None and get_memory_usage() > self.max_memory:
+            reason = f"for using more than {self.max_memory} bytes of memory"
+        else:
+            return
+
+        LOG.info("Recycling worker process %s", reason)
+        self._recycling = True
+        os.kill(os.getpid(), signal.SIGTERM)
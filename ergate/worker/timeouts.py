@@ -0,0 +1,192 @@
+"""
+Running steps with a time limit, so that a step that hangs only fails its
+own job instead of holding on to a worker slot forever.
+
+Python can't kill a thread, so a synchronous step that runs out of time in
+a thread is abandoned: the worker moves on, and the step's thread is
+interrupted as soon as it runs Python code again. Steps that may block in
+C code for good (such as a socket read without a timeout) should be
+`isolated`, which runs them in a forked process that is killed instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import multiprocessing
+import signal
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from multiprocessing.connection import Connection
+from typing import Any
+
+from ..exceptions import IsolatedStepError, SerializationError, StepTimeoutError
+
+StepFunction = Callable[..., Any]
+
+
+class TimeLimit:
+    """How long a step may run for, and what to raise once it runs out."""
+
+    __slots__ = ("error", "seconds")
+
+    def __init__(self, seconds: float, error: StepTimeoutError) -> None:
+        self.seconds = seconds
+        self.error = error
+
+
+def _interrupt_thread(thread: threading.Thread) -> None:
+    pythonapi = getattr(ctypes, "pythonapi", None)
+    if pythonapi is None or thread.ident is None:
+        # Not CPython, so the thread is left to finish on its own
+        return
+
+    pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread.ident), ctypes.py_object(StepTimeoutError)
+    )
+
+
+class _StepThread:
+    """A step running in a thread of its own, which may be abandoned."""
+
+    def __init__(self, func: StepFunction, args: Any, kwargs: Any) -> None:
+        self.future: Future[Any] = Future()
+        self.thread = threading.Thread(
+            target=self._run,
+            args=(func, args, kwargs),
+            name="ergate-step",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def _run(self, func: StepFunction, args: Any, kwargs: Any) -> None:
+        if not self.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(result)
+
+    def abandon(self) -> None:
+        _interrupt_thread(self.thread)
+
+
+def run_with_time_limit(
+    func: StepFunction,
+    args: Any,
+    kwargs: Any,
+    limit: TimeLimit,
+) -> Any:
+    step_thread = _StepThread(func, args, kwargs)
+
+    done, _ = wait((step_thread.future,), limit.seconds, FIRST_COMPLETED)
+    if not done:
+        step_thread.abandon()
+        raise limit.error
+
+    return step_thread.future.result()
+
+
+async def run_in_thread_with_time_limit(
+    func: StepFunction,
+    args: Any,
+    kwargs: Any,
+    limit: TimeLimit,
+) -> Any:
+    step_thread = _StepThread(func, args, kwargs)
+    future = asyncio.wrap_future(step_thread.future)
+
+    # Unlike `asyncio.wait_for`, this can't mistake a `TimeoutError` raised
+    # by the step itself for the step running out of time.
+    done, _ = await asyncio.wait((future,), timeout=limit.seconds)
+    if not done:
+        step_thread.abandon()
+        # Whatever the step ends up returning or raising is of no interest
+        future.cancel()
+        raise limit.error
+
+    return future.result()
+
+
+async def await_with_time_limit(awaitable: Awaitable[Any], limit: TimeLimit) -> Any:
+    task = asyncio.ensure_future(awaitable)
+
+    done, _ = await asyncio.wait((task,), timeout=limit.seconds)
+    if not done:
+        task.cancel()
+        # Lets the step unwind before its dependencies are torn down
+        await asyncio.wait((task,))
+        raise limit.error
+
+    return task.result()
+
+
+def _run_in_child(
+    sender: Connection,
+    func: StepFunction,
+    args: Any,
+    kwargs: Any,
+) -> None:
+    # The worker owns shutdown, and kills this process if it has to
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    try:
+        result = (True, func(*args, **kwargs))
+    except Exception as exc:
+        result = (False, exc)
+
+    try:
+        sender.send(result)
+    except Exception as exc:
+        sender.send((
+            False,
+            SerializationError(f"Isolated step result couldn't be pickled: {exc}"),
+        ))
+
+
+def run_isolated(
+    func: StepFunction,
+    args: Any,
+    kwargs: Any,
+    limit: TimeLimit | None,
+) -> Any:
+    """
+    Runs the step in a forked process, which is killed if it runs out of
+    time. Arguments are inherited by the process as they are, but the
+    return value (or exception) must be picklable.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_in_child,
+        args=(sender, func, args, kwargs),
+        name="ergate-step",
+    )
+
+    process.start()
+    sender.close()
+
+    try:
+        if limit is not None and not receiver.poll(limit.seconds):
+            process.kill()
+            raise limit.error
+
+        try:
+            succeeded, value = receiver.recv()
+        except EOFError:
+            process.join()
+            raise IsolatedStepError(
+                f"Isolated step exited unexpectedly with code {process.exitcode}"
+            ) from None
+    finally:
+        process.join()
+        receiver.close()
+
+    if not succeeded:
+        raise value
+    return value
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from typing import (
     Callable,
     Iterator,
@@ -7,8 +8,14 @@ from typing import (
     overload,
 )
 
-from .exceptions import ReverseGoToError, UnknownStepError
+from .caching import CachePolicy
+from .exceptions import InvalidDefinitionError, ReverseGoToError, UnknownStepError
+from .input_policy import InputPolicy
+from .inspect import input_accepts_list
 from .paths import GoToEndPath, GoToStepPath, NextStepPath, WorkflowPath
+from .rate_limit import RateLimit
+from .retry import RetryPolicy
+from .transitions import StepTransitions
 from .workflow_step import WorkflowStep
 
 CallableSpec = ParamSpec("CallableSpec")
@@ -19,10 +26,43 @@ WorkflowPathTypeHint: TypeAlias = tuple[WorkflowPath, int]
 
 
 class Workflow:
-    def __init__(self, unique_name: str) -> None:
+    def __init__(
+        self,
+        unique_name: str,
+        *,
+        chain_steps: bool | None = None,
+        input_policy: InputPolicy = InputPolicy.DEEPCOPY,
+        step_timeout: float | None = None,
+        timeout: float | None = None,
+        retry: RetryPolicy | None = None,
+        limit: RateLimit | None = None,
+    ) -> None:
+        if step_timeout is not None and step_timeout <= 0:
+            raise InvalidDefinitionError("Step timeouts must be positive")
+
+        if timeout is not None and timeout <= 0:
+            raise InvalidDefinitionError("Workflow timeouts must be positive")
+
         self.unique_name = unique_name
+        self.chain_steps = chain_steps
+        self.input_policy = input_policy
+        self.step_timeout = step_timeout
+        self.timeout = timeout
+        self.retry = retry
+        self.limit = limit
         self._steps: list[WorkflowStep] = []
-        self._paths: dict[int, list[list[WorkflowPathTypeHint]]] = {}
+        self._paths: dict[int, list[list[WorkflowPathTypeHint]]] | None = None
+        self._step_indexes: dict[str, int] = {}
+        self._transitions: list[StepTransitions] = []
+        self._stages: list[list[WorkflowStep]] = []
+        self._kept_return_values: list[frozenset[int]] = []
+
+    @property
+    def limit_key(self) -> str:
+        """Key of this workflow's rate limit, which is its own unless shared."""
+        if self.limit is not None and self.limit.key is not None:
+            return self.limit.key
+        return self.unique_name
 
     def __getitem__(self, index: int) -> WorkflowStep:
         try:
@@ -41,6 +81,15 @@ class Workflow:
 
     @property
     def paths(self) -> dict[int, list[list[WorkflowPathTypeHint]]]:
+        """
+        Every possible path from every step. The number of paths can grow
+        exponentially with the number of branches, so they are only
+        enumerated when first accessed; running jobs doesn't need them.
+        """
+        if self._paths is None:
+            self._paths = {
+                step.index: self.calculate_paths(step.index) for step in self
+            }
         return self._paths
 
     def _calculate_paths(
@@ -94,7 +143,72 @@ class Workflow:
         return self._calculate_paths(index, initial=True)
 
     def update_paths(self) -> None:
-        self._paths = {step.index: self.calculate_paths(step.index) for step in self}
+        """
+        Computes, for every step and each of its paths, the length of the
+        longest run of steps (including the step itself) that can follow if
+        that path is taken.
+
+        Since steps can only go forward, the workflow is a DAG whose steps
+        are already in topological order, so a single pass from the last
+        step to the first one is enough.
+        """
+
+        longest = [0] * (len(self) + 1)
+        transitions: dict[int, StepTransitions] = {}
+
+        for step in reversed(self._steps):
+            next_remaining: int | None = None
+            go_to_end_remaining: int | None = None
+            go_to: dict[str, tuple[int, int]] = {}
+
+            for path in step.paths:
+                next_index = self._find_next_step(step.index, path)
+
+                if next_index <= step.index:
+                    raise ReverseGoToError(
+                        "User attempted to go to an earlier step, "
+                        "which is not permitted."
+                    )
+
+                remaining = 1 + longest[min(next_index, len(self))]
+
+                if isinstance(path, GoToStepPath):
+                    go_to[path.step_name] = (next_index, remaining)
+                elif isinstance(path, GoToEndPath):
+                    go_to_end_remaining = remaining
+                else:
+                    next_remaining = remaining
+
+            step_transitions = StepTransitions(
+                next_remaining, go_to_end_remaining, go_to
+            )
+            transitions[step.index] = step_transitions
+            longest[step.index] = step_transitions.longest or 1
+
+        self._transitions = [transitions[index] for index in range(len(self))]
+        self._paths = None
+
+    @property
+    def transitions(self) -> list[StepTransitions]:
+        """Precomputed transitions of every step, indexed by step index."""
+        return self._transitions
+
+    def get_remaining_steps(self, index: int, path: WorkflowPath) -> int | None:
+        """
+        Returns the length of the longest run of steps, starting at the step
+        with the given index, if the given path is taken from it. Returns
+        `None` if the step doesn't declare the path.
+        """
+        transitions = self._transitions[index]
+
+        if isinstance(path, GoToStepPath):
+            go_to = transitions.go_to.get(path.step_name)
+            return go_to[1] if go_to is not None else None
+
+        if isinstance(path, GoToEndPath):
+            return transitions.go_to_end_remaining
+
+        return transitions.next_remaining
 
     def _find_next_step(self, index: int, path: WorkflowPath) -> int:
         if isinstance(path, GoToEndPath):
@@ -107,15 +221,125 @@ class Workflow:
 
     def get_step_index_by_name(self, step_name: str) -> int:
         try:
-            return next(step.index for step in self if step.name == step_name)
-        except StopIteration:
+            return self._step_indexes[step_name]
+        except KeyError:
             raise UnknownStepError(
                 f'No step named "{step_name}" is registered in '
                 f'Workflow "{self.unique_name}"'
+            ) from None
+
+    def _can_run_alongside(self, step: WorkflowStep) -> bool:
+        return not step.is_map and step.paths == [NextStepPath()]
+
+    def update_stages(self) -> None:
+        """
+        Groups steps into stages, which are run at the same time. Each stage
+        is a run of consecutive steps that don't depend on one another.
+        Steps that can branch, mapped steps and steps that are gone to by
+        name always start a stage of their own.
+
+        Also checks that every step a step depends on is certain to have
+        run before it, whichever paths the job takes, and works out which
+        return values must be kept for the steps after each stage.
+        """
+        go_to_targets = {
+            self.get_step_index_by_name(path.step_name)
+            for step in self
+            for path in step.paths
+            if isinstance(path, GoToStepPath)
+        }
+
+        stages: list[list[WorkflowStep]] = []
+        for step in self:
+            stage = stages[-1] if stages else None
+            if (
+                stage is not None
+                and step.depends_on is not None
+                and step.index not in go_to_targets
+                and self._can_run_alongside(step)
+                and self._can_run_alongside(stage[0])
+                and all(index < stage[0].index for index in step.depends_on)
+            ):
+                stage.append(step)
+            else:
+                stages.append([step])
+
+        self._check_dependencies()
+
+        for stage in stages:
+            following = stage[-1].index + 1
+            if len(stage) > 1 and following < len(self):
+                self._check_stage_input(self[following])
+
+        kept: set[int] = set()
+        self._kept_return_values = [frozenset()] * (len(self) + 1)
+        for step in reversed(self._steps):
+            kept.update(step.depends_on or ())
+            self._kept_return_values[step.index] = frozenset(kept)
+
+        self._stages = [stage for stage in stages for _ in stage]
+
+    def _check_dependencies(self) -> None:
+        # Since steps can only go forward, the steps that run before every
+        # step, regardless of the path taken, are found in a single pass.
+        always_before: list[set[int] | None] = [None] * len(self)
+        if self._steps:
+            always_before[0] = set()
+
+        for step in self:
+            before = always_before[step.index]
+            if before is None:
+                # Can't be reached from the first step
+                continue
+
+            missing = [index for index in step.depends_on or () if index not in before]
+            if missing:
+                raise InvalidDefinitionError(
+                    f"Step {step} depends on {self[missing[0]]}, which may "
+                    "not have run by the time it does"
+                )
+
+            for path in step.paths:
+                next_index = self._find_next_step(step.index, path)
+                if next_index >= len(self):
+                    continue
+
+                after = before | {step.index}
+                current = always_before[next_index]
+                always_before[next_index] = (
+                    after if current is None else current & after
+                )
+
+    def _check_stage_input(self, step: WorkflowStep) -> None:
+        # Steps that depend on other steps receive their return values, and
+        # mapped steps receive the items of the list one at a time.
+        if step.depends_on is not None or step.is_map:
+            return
+
+        if not input_accepts_list(step.callable):
+            raise InvalidDefinitionError(
+                f"Step {step} receives a list of the return values of the "
+                "steps before it, which run at the same time, but its input "
+                "value isn't annotated as one"
             )
 
+    def get_stage(self, index: int) -> list[WorkflowStep]:
+        """
+        Returns the steps that run at the same time as the step with the
+        given index, which is the first of them.
+        """
+        return self._stages[index]
+
+    def get_kept_return_values(self, index: int) -> frozenset[int]:
+        """
+        Returns the indexes of the steps whose return values are needed by
+        the step with the given index, or by any of the steps after it.
+        """
+        return self._kept_return_values[index]
+
     def finalize(self) -> None:
         self.update_paths()
+        self.update_stages()
 
     @overload
     def step(self, func: CallableTypeHint) -> WorkflowStepTypeHint: ...
@@ -125,6 +349,14 @@ class Workflow:
         self,
         *,
         paths: list[WorkflowPath] | None = None,
+        chain: bool | None = None,
+        input_policy: InputPolicy | None = None,
+        timeout: float | None = None,
+        isolated: bool = False,
+        retry: RetryPolicy | None = None,
+        depends_on: Sequence[WorkflowStep] | None = None,
+        limit: RateLimit | None = None,
+        cache: CachePolicy | None = None,
     ) -> CallableTypeHint: ...
 
     def step(
@@ -132,10 +364,114 @@ class Workflow:
         func: CallableTypeHint | None = None,
         *,
         paths: list[WorkflowPath] | None = None,
+        chain: bool | None = None,
+        input_policy: InputPolicy | None = None,
+        timeout: float | None = None,
+        isolated: bool = False,
+        retry: RetryPolicy | None = None,
+        depends_on: Sequence[WorkflowStep] | None = None,
+        limit: RateLimit | None = None,
+        cache: CachePolicy | None = None,
     ) -> CallableTypeHint | WorkflowStepTypeHint:
+        """
+        Registers a step. Steps receive the return value of the step before
+        them, unless `depends_on` lists the earlier steps they need instead.
+        Such steps receive the return value of the only step they depend
+        on, a list of the return values of each, or the job's initial input
+        value if they depend on none, and may run at the same time as the
+        steps before them that they don't depend on.
+
+        A step's `limit` applies on top of its workflow's, if any. Steps
+        given a `cache` policy reuse the return value of previous runs with
+        the same input value instead of running again.
+        """
+
         def _decorate(func: CallableTypeHint) -> WorkflowStepTypeHint:
-            step = WorkflowStep(self, func, len(self), paths=paths)
+            step = WorkflowStep(
+                self,
+                func,
+                len(self),
+                paths=paths,
+                chain=chain,
+                input_policy=input_policy,
+                timeout=timeout,
+                isolated=isolated,
+                retry=retry,
+                depends_on=depends_on,
+                limit=limit,
+                cache=cache,
+            )
+            self._steps.append(step)
+            self._step_indexes.setdefault(step.name, step.index)
+            return step
+
+        if func is None:
+            return _decorate
+
+        return _decorate(func)
+
+    @overload
+    def map_step(self, func: CallableTypeHint) -> WorkflowStepTypeHint: ...
+
+    @overload
+    def map_step(
+        self,
+        *,
+        chunk_size: int = 1,
+        input_policy: InputPolicy | None = None,
+        timeout: float | None = None,
+        isolated: bool = False,
+        retry: RetryPolicy | None = None,
+        depends_on: Sequence[WorkflowStep] | None = None,
+        limit: RateLimit | None = None,
+        cache: CachePolicy | None = None,
+    ) -> CallableTypeHint: ...
+
+    def map_step(
+        self,
+        func: CallableTypeHint | None = None,
+        *,
+        chunk_size: int = 1,
+        input_policy: InputPolicy | None = None,
+        timeout: float | None = None,
+        isolated: bool = False,
+        retry: RetryPolicy | None = None,
+        depends_on: Sequence[WorkflowStep] | None = None,
+        limit: RateLimit | None = None,
+        cache: CachePolicy | None = None,
+    ) -> CallableTypeHint | WorkflowStepTypeHint:
+        """
+        Registers a step that is run once for each item of its input value,
+        which must be iterable. The items are split into chunks of
+        `chunk_size`, and each chunk is run by a child job of its own, so
+        that they can be spread across every worker.
+
+        Once every child job has finished, the next step receives the list
+        of return values, in the same order as the items. If any child job
+        doesn't complete, the job fails instead.
+
+        Timeouts and caching apply to each call of the function, and
+        retries and limits to each child job separately. The state store
+        must implement `start_map` and `finish_map_child`.
+        """
+
+        def _decorate(func: CallableTypeHint) -> WorkflowStepTypeHint:
+            step = WorkflowStep(
+                self,
+                func,
+                len(self),
+                chain=False,
+                input_policy=input_policy,
+                timeout=timeout,
+                isolated=isolated,
+                retry=retry,
+                map_chunk_size=chunk_size,
+                depends_on=depends_on,
+                limit=limit,
+                cache=cache,
+            )
             self._steps.append(step)
+            self._step_indexes.setdefault(step.name, step.index)
             return step
 
         if func is None:
@@ -1,7 +1,16 @@
 from __future__ import annotations
 
-from collections.abc import Generator
-from contextlib import ExitStack, contextmanager
+from collections.abc import AsyncGenerator, Generator, Sequence
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    AsyncExitStack,
+    ExitStack,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+)
+from inspect import iscoroutinefunction
 from types import NoneType
 from typing import (
     TYPE_CHECKING,
@@ -13,9 +22,14 @@ from typing import (
     get_type_hints,
 )
 
-from .depends_cache import DependsCache
+from .caching import CachePolicy
+from .depends_cache import AsyncDependsScope, DependsScope, DependsScopes
+from .exceptions import InvalidDefinitionError
+from .input_policy import InputPolicy
 from .inspect import build_function_arg_info
 from .paths import NextStepPath, WorkflowPath
+from .rate_limit import RateLimit
+from .retry import RetryPolicy
 
 if TYPE_CHECKING:
     from .workflow import Workflow
@@ -33,25 +47,176 @@ class WorkflowStep(Generic[CallableSpec, CallableRetval]):
         index: int,
         *,
         paths: list[WorkflowPath] | None = None,
+        chain: bool | None = None,
+        input_policy: InputPolicy | None = None,
+        timeout: float | None = None,
+        isolated: bool = False,
+        retry: RetryPolicy | None = None,
+        map_chunk_size: int | None = None,
+        depends_on: Sequence[WorkflowStep] | None = None,
+        limit: RateLimit | None = None,
+        cache: CachePolicy | None = None,
     ) -> None:
+        if map_chunk_size is not None and map_chunk_size < 1:
+            raise InvalidDefinitionError("Mapped steps' chunk size must be at least 1")
+
+        if timeout is not None and timeout <= 0:
+            raise InvalidDefinitionError("Step timeouts must be positive")
+
+        if depends_on is not None and any(
+            dependency.workflow is not workflow for dependency in depends_on
+        ):
+            raise InvalidDefinitionError(
+                f"Step {callable.__name__} can only depend on steps of its own workflow"
+            )
+
+        if isolated and iscoroutinefunction(callable):
+            raise InvalidDefinitionError(
+                f"Step {callable.__name__} is asynchronous and can't be isolated"
+            )
+
         self.index = index
-        self.workflow = workflow
+        self.workflow: Workflow = workflow
         self.callable = callable
         self.arg_info = build_function_arg_info(callable)
         self.paths = self._prepare_paths(paths)
+        self.chain = chain
+        self._input_policy = input_policy
+        self._timeout = timeout
+        self.isolated = isolated
+        self._retry = retry
+        self.map_chunk_size = map_chunk_size
+        self.depends_on = (
+            [dependency.index for dependency in depends_on]
+            if depends_on is not None
+            else None
+        )
+        self.limit = limit
+        self.cache = cache
 
     @property
     def name(self) -> str:
         return self.callable.__name__
 
-    @contextmanager
+    @property
+    def is_async(self) -> bool:
+        return iscoroutinefunction(self.callable)
+
+    @property
+    def is_map(self) -> bool:
+        """
+        Whether this step is run over each item of its input value by
+        separate child jobs, rather than over the input value itself.
+        """
+        return self.map_chunk_size is not None
+
+    @property
+    def chainable(self) -> bool | None:
+        """
+        Whether this step may run straight after the previous one within the
+        same worker pass. `None` means the worker's configuration decides.
+        """
+        if self.chain is not None:
+            return self.chain
+        return self.workflow.chain_steps
+
+    @property
+    def input_policy(self) -> InputPolicy:
+        if self._input_policy is not None:
+            return self._input_policy
+        return self.workflow.input_policy
+
+    @property
+    def timeout(self) -> float | None:
+        """Seconds this step may run for, if it's limited at all."""
+        if self._timeout is not None:
+            return self._timeout
+        return self.workflow.step_timeout
+
+    @property
+    def limit_key(self) -> str:
+        """Key of this step's rate limit, which is its own unless shared."""
+        if self.limit is not None and self.limit.key is not None:
+            return self.limit.key
+        return str(self)
+
+    @property
+    def retry(self) -> RetryPolicy | None:
+        if self._retry is not None:
+            return self._retry
+        return self.workflow.retry
+
     def build_args(
-        self, user_context: Any, last_return_value: Any
+        self,
+        user_context: Any,
+        last_return_value: Any,
+        *,
+        job_scope: DependsScope | None = None,
+        worker_scope: DependsScope | None = None,
+    ) -> AbstractContextManager[tuple[list[Any], dict[str, Any]]]:
+        if not self.arg_info.has_dependencies:
+            # Nothing to tear down, so there's no need for an exit stack
+            return nullcontext(
+                self.arg_info.build_args(None, user_context, last_return_value)
+            )
+
+        return self._build_args_in_scope(
+            user_context,
+            last_return_value,
+            job_scope=job_scope,
+            worker_scope=worker_scope,
+        )
+
+    @contextmanager
+    def _build_args_in_scope(
+        self,
+        user_context: Any,
+        last_return_value: Any,
+        *,
+        job_scope: DependsScope | None,
+        worker_scope: DependsScope | None,
     ) -> Generator[tuple[list[Any], dict[str, Any]], None, None]:
         with ExitStack() as stack:
+            scopes = DependsScopes(DependsScope(stack), job_scope, worker_scope)
             yield self.arg_info.build_args(
-                stack,
-                DependsCache(),
+                scopes,
+                user_context,
+                last_return_value,
+            )
+
+    def build_args_async(
+        self,
+        user_context: Any,
+        last_return_value: Any,
+        *,
+        job_scope: AsyncDependsScope | None = None,
+        worker_scope: AsyncDependsScope | None = None,
+    ) -> AbstractAsyncContextManager[tuple[list[Any], dict[str, Any]]]:
+        if not self.arg_info.has_dependencies:
+            return nullcontext(
+                self.arg_info.build_args(None, user_context, last_return_value)
+            )
+
+        return self._build_args_in_scope_async(
+            user_context,
+            last_return_value,
+            job_scope=job_scope,
+            worker_scope=worker_scope,
+        )
+
+    @asynccontextmanager
+    async def _build_args_in_scope_async(
+        self,
+        user_context: Any,
+        last_return_value: Any,
+        *,
+        job_scope: AsyncDependsScope | None,
+        worker_scope: AsyncDependsScope | None,
+    ) -> AsyncGenerator[tuple[list[Any], dict[str, Any]], None]:
+        async with AsyncExitStack() as stack:
+            scopes = DependsScopes(AsyncDependsScope(stack), job_scope, worker_scope)
+            yield await self.arg_info.build_args_async(
+                scopes,
                 user_context,
                 last_return_value,
             )
@@ -0,0 +1,65 @@
+"""
+Worker run in a separate process by the tests, so that it can be sent
+signals. It's configured through environment variables.
+"""
+
+import os
+import time
+from collections.abc import Generator
+from typing import Annotated
+
+from ergate import Depends, Workflow
+from ergate.backends import SqliteQueue, SqliteStateStore
+from ergate.worker import Batching, ErgateWorker
+
+DB = os.environ["ERGATE_TEST_DB"]
+CONCURRENCY = int(os.environ.get("ERGATE_TEST_CONCURRENCY", "1"))
+POOL = os.environ.get("ERGATE_TEST_POOL", "thread")
+FETCH_SIZE = int(os.environ.get("ERGATE_TEST_FETCH_SIZE", "0"))
+
+# Touched by every step that starts, so tests know when jobs are running
+STARTED = DB + ".started"
+
+workflow = Workflow("sleep")
+
+
+@workflow.step
+def sleep(seconds: float) -> float:
+    with open(STARTED, "a"):
+        pass
+    time.sleep(seconds)
+    return seconds
+
+
+def open_resource() -> Generator[int, None, None]:
+    pid = os.getpid()
+    with open(f"{DB}.opened.{pid}", "w"):
+        pass
+    yield pid
+    with open(f"{DB}.closed.{pid}", "w"):
+        pass
+
+
+resource_workflow = Workflow("resource")
+
+
+@resource_workflow.step
+def use_resource(
+    resource: Annotated[int, Depends(open_resource, scope="worker")],
+) -> int:
+    return resource
+
+
+worker: ErgateWorker = ErgateWorker(
+    SqliteQueue(DB, poll_interval=0.01),
+    SqliteStateStore(DB),
+    concurrency=CONCURRENCY,
+    pool=POOL,  # type: ignore[arg-type]
+    batching=Batching(fetch_size=FETCH_SIZE) if FETCH_SIZE else None,
+)
+worker.register_workflow(workflow)
+worker.register_workflow(resource_workflow)
+
+
+if __name__ == "__main__":
+    worker.run()
@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from ergate import Job
+from ergate.backends import (
+    InMemoryQueue,
+    InMemoryStateStore,
+    SqliteQueue,
+    SqliteStateStore,
+)
+from ergate.publisher import ErgatePublisher
+from ergate.worker import ErgateWorker
+
+ROOT = Path(__file__).parent.parent
+
+WorkerStarter = Callable[..., subprocess.Popen[str]]
+
+
+def wait_for_file(path: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{path} was never created")
+        time.sleep(0.01)
+
+
+def finish_worker(process: subprocess.Popen[str], timeout: float = 30.0) -> str:
+    """Waits for a worker to exit, which it must do without errors."""
+    _, stderr = process.communicate(timeout=timeout)
+    assert process.returncode == 0, stderr
+    assert "Traceback" not in stderr, stderr
+    return stderr
+
+
+@pytest.fixture
+def db(tmp_path: Path) -> str:
+    return str(tmp_path / "ergate.db")
+
+
+@pytest.fixture
+def queue(db: str) -> SqliteQueue[Job]:
+    return SqliteQueue(db, poll_interval=0.01)
+
+
+@pytest.fixture
+def state_store(db: str) -> SqliteStateStore[Job]:
+    return SqliteStateStore(db)
+
+
+@pytest.fixture
+def publish(
+    state_store: SqliteStateStore[Job], queue: SqliteQueue[Job]
+) -> Callable[[str, list[object]], list[Job]]:
+    """Adds a job for each input value and publishes them to the queue."""
+
+    def publish(workflow_name: str, input_values: list[object]) -> list[Job]:
+        jobs = [
+            state_store.add(Job(workflow_name=workflow_name, initial_input_value=v))
+            for v in input_values
+        ]
+        ErgatePublisher(state_store, queue).run()
+        return jobs
+
+    return publish
+
+
+@pytest.fixture
+def memory_state_store() -> InMemoryStateStore[Job]:
+    return InMemoryStateStore()
+
+
+@pytest.fixture
+def run_once(
+    memory_state_store: InMemoryStateStore[Job],
+) -> Callable[[ErgateWorker[Job]], list[Job]]:
+    """
+    Publishes the jobs in the in-memory state store that are due, and has
+    the worker run each of them once. Returns them as stored afterwards.
+    """
+
+    def run_once(worker: ErgateWorker[Job]) -> list[Job]:
+        queue: InMemoryQueue[Job] = InMemoryQueue()
+        ErgatePublisher(memory_state_store, queue).run()
+
+        ran = []
+        while (job := queue.poll()) is not None:
+            worker.job_runner._run_job(job)
+            ran.append(memory_state_store[job.id])
+        return ran
+
+    return run_once
+
+
+@pytest.fixture
+def start_worker(db: str) -> Iterator[WorkerStarter]:
+    """
+    Starts `tests/apps/worker.py` in a new process using the test database.
+    If options are given, it's run by the `ergate worker` command with them.
+    """
+    processes: list[subprocess.Popen[str]] = []
+
+    def start(*options: str, **settings: object) -> subprocess.Popen[str]:
+        env = dict(os.environ, ERGATE_TEST_DB=db, PYTHONPATH=str(ROOT))
+        for name, value in settings.items():
+            env[f"ERGATE_TEST_{name.upper()}"] = str(value)
+
+        args = (
+            ["ergate", "worker", "tests.apps.worker:worker", *options]
+            if options
+            else ["tests.apps.worker"]
+        )
+        process = subprocess.Popen(
+            [sys.executable, "-m", *args],
+            cwd=ROOT,
+            env=env,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        processes.append(process)
+        return process
+
+    yield start
+
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+            process.communicate()
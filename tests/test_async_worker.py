@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from typing import Any
+
+import pytest
+
+from ergate import Job, JobStatus, Workflow
+from ergate.worker import AsyncErgateWorker
+
+
+class AsyncStateStore:
+    def __init__(self) -> None:
+        self.jobs: dict[object, Job] = {}
+
+    async def update(self, job: Job) -> None:
+        self.jobs[job.id] = job.model_copy(deep=True)
+
+
+class AsyncQueue:
+    async def get_one(self) -> Job:
+        raise NotImplementedError
+
+
+def run_job(workflow: Workflow, input_value: Any) -> Job:
+    state_store = AsyncStateStore()
+    worker: AsyncErgateWorker[Job] = AsyncErgateWorker(AsyncQueue(), state_store)
+    worker.register_workflow(workflow)
+
+    job = Job(id=1, workflow_name=workflow.unique_name, initial_input_value=input_value)
+    while job.status not in (JobStatus.COMPLETED, JobStatus.FAILED):
+        asyncio.run(worker.job_runner._run_job(job))
+    return state_store.jobs[job.id]
+
+
+def test_input_values_are_resolved_off_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    threads: list[threading.Thread] = []
+    get_input_value = Job.get_input_value
+    get_dependency_values = Job.get_dependency_values
+
+    def record(method: Any) -> Any:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            threads.append(threading.current_thread())
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(Job, "get_input_value", record(get_input_value))
+    monkeypatch.setattr(Job, "get_dependency_values", record(get_dependency_values))
+
+    workflow = Workflow("async_inputs")
+
+    @workflow.step
+    async def double(value: int) -> int:
+        return value * 2
+
+    @workflow.step(depends_on=[double])
+    async def add_one(value: int) -> int:
+        return value + 1
+
+    @workflow.step(depends_on=[double])
+    async def add_two(value: int) -> int:
+        return value + 2
+
+    @workflow.step
+    async def total(values: list[int]) -> int:
+        return sum(values)
+
+    job = run_job(workflow, 5)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.get_return_value() == 23
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
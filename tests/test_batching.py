@@ -0,0 +1,63 @@
+from collections.abc import Sequence
+
+from ergate import Job, JobStatus
+from ergate.worker.batching import StateStoreBuffer
+
+
+class RecordingStateStore:
+    def __init__(self) -> None:
+        self.writes: list[list[Job]] = []
+
+    def update(self, job: Job) -> None:
+        self.writes.append([job])
+
+    def update_many(self, jobs: Sequence[Job]) -> None:
+        self.writes.append(list(jobs))
+
+
+def test_writes_for_the_same_job_are_coalesced() -> None:
+    state_store = RecordingStateStore()
+    buffer: StateStoreBuffer[Job] = StateStoreBuffer(
+        state_store, flush_size=10, flush_interval=60
+    )
+    job = Job(id=1, workflow_name="w")
+
+    job.status = JobStatus.RUNNING
+    buffer.update(job)
+    job.status = JobStatus.COMPLETED
+    buffer.update(job)
+    buffer.flush()
+
+    assert [[job.status for job in batch] for batch in state_store.writes] == [
+        [JobStatus.COMPLETED]
+    ]
+
+
+def test_buffer_flushes_once_full() -> None:
+    state_store = RecordingStateStore()
+    buffer: StateStoreBuffer[Job] = StateStoreBuffer(
+        state_store, flush_size=2, flush_interval=60
+    )
+
+    buffer.update(Job(id=1, workflow_name="w"))
+    assert state_store.writes == []
+    buffer.update(Job(id=2, workflow_name="w"))
+
+    assert [[job.id for job in batch] for batch in state_store.writes] == [[1, 2]]
+
+
+def test_pending_write_is_not_affected_by_later_changes() -> None:
+    state_store = RecordingStateStore()
+    buffer: StateStoreBuffer[Job] = StateStoreBuffer(
+        state_store, flush_size=10, flush_interval=60
+    )
+    job = Job(id=1, workflow_name="w", last_return_value={"items": [1]})
+
+    buffer.update(job)
+    job.last_return_value["items"].append(2)
+    job.step_return_values[0] = "changed"
+    buffer.flush()
+
+    (written,) = state_store.writes[0]
+    assert written.last_return_value == {"items": [1]}
+    assert written.step_return_values == {}
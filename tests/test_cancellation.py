@@ -0,0 +1,120 @@
+import time
+from collections.abc import Callable
+
+from ergate import Job, JobStatus, Workflow
+from ergate.backends import InMemoryQueue, InMemoryStateStore
+from ergate.worker import ErgateWorker
+
+RunOnce = Callable[[ErgateWorker[Job]], list[Job]]
+
+
+def make_worker(
+    workflow: Workflow, state_store: InMemoryStateStore[Job]
+) -> ErgateWorker[Job]:
+    worker: ErgateWorker[Job] = ErgateWorker(InMemoryQueue(), state_store)
+    worker.register_workflow(workflow)
+    return worker
+
+
+def recording_workflow(
+    calls: list[str], state_store: InMemoryStateStore[Job]
+) -> Workflow:
+    """
+    Workflow whose steps all run in one go, and whose first step cancels
+    the job if its input value is a job ID.
+    """
+    workflow = Workflow("recording", chain_steps=True)
+
+    @workflow.step
+    def first(job_id: object) -> None:
+        calls.append("first")
+        if job_id is not None:
+            state_store.cancel(job_id)
+
+    @workflow.step
+    def second() -> None:
+        calls.append("second")
+
+    return workflow
+
+
+def test_job_cancelled_before_publishing_never_runs(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    calls: list[str] = []
+    worker = make_worker(
+        recording_workflow(calls, memory_state_store), memory_state_store
+    )
+    job = memory_state_store.add(Job(workflow_name="recording"))
+
+    assert memory_state_store.cancel(job.id) == JobStatus.CANCELLED
+    assert run_once(worker) == []
+    assert calls == []
+
+
+def test_queued_job_is_cancelled_by_the_worker(
+    memory_state_store: InMemoryStateStore[Job],
+) -> None:
+    calls: list[str] = []
+    worker = make_worker(
+        recording_workflow(calls, memory_state_store), memory_state_store
+    )
+    job = memory_state_store.add(Job(workflow_name="recording"))
+    (queued,) = memory_state_store.generate_jobs()
+
+    assert memory_state_store.cancel(job.id) == JobStatus.CANCELLING
+    worker.job_runner._run_job(queued)
+
+    assert memory_state_store[job.id].status == JobStatus.CANCELLED
+    assert calls == []
+
+
+def test_running_job_is_cancelled_between_steps(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    calls: list[str] = []
+    worker = make_worker(
+        recording_workflow(calls, memory_state_store), memory_state_store
+    )
+    memory_state_store.add(
+        Job(id="a", workflow_name="recording", initial_input_value="a")
+    )
+
+    (job,) = run_once(worker)
+
+    assert job.status == JobStatus.CANCELLED
+    assert calls == ["first"]
+
+
+def test_finished_job_cannot_be_cancelled(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    calls: list[str] = []
+    worker = make_worker(
+        recording_workflow(calls, memory_state_store), memory_state_store
+    )
+    job = memory_state_store.add(Job(workflow_name="recording"))
+
+    run_once(worker)
+
+    assert memory_state_store.cancel(job.id) == JobStatus.COMPLETED
+    assert calls == ["first", "second"]
+
+
+def test_step_that_runs_out_of_time_fails_the_job(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = Workflow("slow")
+
+    @workflow.step(timeout=0.05)
+    def slow() -> None:
+        time.sleep(1)
+
+    worker = make_worker(workflow, memory_state_store)
+    memory_state_store.add(Job(workflow_name="slow"))
+
+    started = time.monotonic()
+    (job,) = run_once(worker)
+
+    assert job.status == JobStatus.FAILED
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,76 @@
+from typing import Any
+
+import pytest
+
+from ergate import InputPolicy, Job
+from ergate.input_policy import FrozenMapping, apply_input_policy
+from ergate.serialization import JsonSerializer, PickleSerializer
+
+
+@pytest.mark.parametrize(
+    ("policy", "copied", "nested_copied"),
+    [
+        (InputPolicy.DEEPCOPY, True, True),
+        (InputPolicy.COPY, True, False),
+        (InputPolicy.PASSTHROUGH, False, False),
+    ],
+)
+def test_policies_copy_shared_values(
+    policy: InputPolicy, copied: bool, nested_copied: bool
+) -> None:
+    value = {"items": [1, 2]}
+
+    result = apply_input_policy(value, policy)
+
+    assert result == value
+    assert (result is not value) == copied
+    assert (result["items"] is not value["items"]) == nested_copied
+
+
+def test_frozen_policy_hands_out_read_only_views() -> None:
+    value = {"items": [1, 2]}
+
+    result = apply_input_policy(value, InputPolicy.FROZEN)
+
+    assert isinstance(result, FrozenMapping)
+    assert list(result["items"]) == [1, 2]
+    assert result.thaw() == value
+
+
+def test_values_that_are_not_shared_are_not_copied() -> None:
+    value = {"items": [1, 2]}
+
+    assert apply_input_policy(value, InputPolicy.DEEPCOPY, shared=False) is value
+    assert isinstance(
+        apply_input_policy(value, InputPolicy.FROZEN, shared=False), FrozenMapping
+    )
+
+
+def load_job(serializer: Any) -> Job:
+    job = Job(workflow_name="w", initial_input_value={"items": [1, 2]})
+    return Job.from_bytes(job.to_bytes(serializer))
+
+
+def test_input_values_decoded_for_the_step_are_not_copied(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def deepcopy(value: Any) -> Any:
+        raise AssertionError("Input value was copied")
+
+    monkeypatch.setattr("ergate.input_policy.copy.deepcopy", deepcopy)
+    job = load_job(JsonSerializer())
+
+    first = job.get_input_value()
+    first["items"].append(3)
+
+    assert job.get_input_value() == {"items": [1, 2]}
+    assert Job.from_bytes(job.to_bytes()).get_input_value() == {"items": [1, 2]}
+
+
+def test_input_values_that_may_refer_to_job_data_are_copied() -> None:
+    job = load_job(PickleSerializer())
+
+    first = job.get_input_value()
+    first["items"].append(3)
+
+    assert job.get_input_value() == {"items": [1, 2]}
@@ -0,0 +1,97 @@
+from collections.abc import Callable
+
+from ergate import Job, JobStatus, Workflow
+from ergate.backends import InMemoryQueue, InMemoryStateStore
+from ergate.worker import ErgateWorker
+
+RunOnce = Callable[[ErgateWorker[Job]], list[Job]]
+
+
+def run_until_done(worker: ErgateWorker[Job], run_once: RunOnce) -> None:
+    for _ in range(20):
+        if not run_once(worker):
+            return
+    raise AssertionError("Jobs kept running")
+
+
+def make_worker(
+    workflow: Workflow, state_store: InMemoryStateStore[Job]
+) -> ErgateWorker[Job]:
+    worker: ErgateWorker[Job] = ErgateWorker(InMemoryQueue(), state_store)
+    worker.register_workflow(workflow)
+    return worker
+
+
+def test_mapped_step_results_are_joined_in_order(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = Workflow("squares")
+    calls: list[list[int]] = []
+
+    @workflow.map_step(chunk_size=2)
+    def square(value: int) -> int:
+        return value * value
+
+    @workflow.step
+    def collect(values: list[int]) -> list[int]:
+        calls.append(values)
+        return values
+
+    worker = make_worker(workflow, memory_state_store)
+    job = memory_state_store.add(
+        Job(workflow_name="squares", initial_input_value=[1, 2, 3, 4, 5])
+    )
+
+    (parent,) = run_once(worker)
+    assert parent.status == JobStatus.WAITING
+
+    run_until_done(worker, run_once)
+
+    job = memory_state_store[job.id]
+    assert job.status == JobStatus.COMPLETED
+    assert job.get_return_value() == [1, 4, 9, 16, 25]
+    assert calls == [[1, 4, 9, 16, 25]]
+
+
+def test_empty_input_skips_to_the_next_step(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = Workflow("empty")
+
+    @workflow.map_step
+    def square(value: int) -> int:
+        return value * value
+
+    @workflow.step
+    def collect(values: list[int]) -> int:
+        return len(values)
+
+    worker = make_worker(workflow, memory_state_store)
+    job = memory_state_store.add(Job(workflow_name="empty", initial_input_value=[]))
+
+    run_until_done(worker, run_once)
+
+    job = memory_state_store[job.id]
+    assert job.status == JobStatus.COMPLETED
+    assert job.get_return_value() == 0
+
+
+def test_failed_child_fails_the_parent(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = Workflow("failing")
+
+    @workflow.map_step
+    def check(value: int) -> int:
+        if value == 2:
+            raise ValueError("bad item")
+        return value
+
+    worker = make_worker(workflow, memory_state_store)
+    job = memory_state_store.add(
+        Job(workflow_name="failing", initial_input_value=[1, 2, 3])
+    )
+
+    run_until_done(worker, run_once)
+
+    assert memory_state_store[job.id].status == JobStatus.FAILED
@@ -0,0 +1,48 @@
+import os
+from collections.abc import Callable
+
+import pytest
+
+from ergate import Job, JobStatus
+from ergate.backends import SqliteQueue, SqliteStateStore
+
+from .conftest import WorkerStarter, finish_worker
+
+Publish = Callable[[str, list[object]], list[Job]]
+
+
+# Forking while the state buffer's flusher thread was running used to
+# deadlock now and then, so this is run many times.
+@pytest.mark.parametrize("attempt", range(20))
+def test_process_pool_with_batching_runs_every_job(
+    attempt: int,
+    state_store: SqliteStateStore[Job],
+    queue: SqliteQueue[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("sleep", [0.0] * 12)
+    queue.close()
+
+    process = start_worker(concurrency=2, pool="process", fetch_size=3)
+    finish_worker(process, timeout=20)
+
+    for job in jobs:
+        assert state_store[job.id].status == JobStatus.COMPLETED
+
+
+def test_process_pool_tears_down_worker_scope_in_each_process(
+    db: str,
+    state_store: SqliteStateStore[Job],
+    queue: SqliteQueue[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("resource", [None] * 8)
+    queue.close()
+
+    finish_worker(start_worker(concurrency=2, pool="process"))
+
+    pids = {state_store[job.id].get_return_value() for job in jobs}
+    for pid in pids:
+        assert os.path.exists(f"{db}.closed.{pid}")
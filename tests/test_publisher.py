@@ -0,0 +1,74 @@
+import threading
+import time
+from collections.abc import Generator, Sequence
+
+import pytest
+
+from ergate import Job
+from ergate.publisher import ErgatePublisher, PublishBatching
+
+
+class RecordingQueue:
+    def __init__(self) -> None:
+        self.batches: list[list[object]] = []
+
+    def publish_job(self, job: Job) -> None:
+        self.batches.append([job.id])
+
+    def publish_jobs(self, jobs: Sequence[Job]) -> Sequence[Exception | None]:
+        self.batches.append([job.id for job in jobs])
+        return [None] * len(jobs)
+
+
+class Driver:
+    def __init__(self, jobs: Generator[Job, None, None]) -> None:
+        self.jobs = jobs
+        self.failures: list[tuple[Job, Exception]] = []
+
+    def generate_jobs(self) -> Generator[Job, None, None]:
+        return self.jobs
+
+    def report_failures(self, failures: Sequence[tuple[Job, Exception]]) -> None:
+        self.failures.extend(failures)
+
+
+def test_batch_is_published_once_linger_passes_while_driver_waits() -> None:
+    published_first = threading.Event()
+
+    def generate() -> Generator[Job, None, None]:
+        yield Job(id=1, workflow_name="w")
+        # The first batch must be published without waiting for this job
+        assert published_first.wait(5)
+        yield Job(id=2, workflow_name="w")
+
+    class SignallingQueue(RecordingQueue):
+        def publish_jobs(self, jobs: Sequence[Job]) -> Sequence[Exception | None]:
+            published_first.set()
+            return super().publish_jobs(jobs)
+
+    queue = SignallingQueue()
+    publisher = ErgatePublisher(
+        Driver(generate()), queue, batching=PublishBatching(size=10, linger=0.05)
+    )
+    publisher.run()
+
+    assert queue.batches == [[1], [2]]
+
+
+def test_jobs_yielded_before_driver_raises_are_published() -> None:
+    def generate() -> Generator[Job, None, None]:
+        yield Job(id=1, workflow_name="w")
+        yield Job(id=2, workflow_name="w")
+        raise RuntimeError("driver failed")
+
+    queue = RecordingQueue()
+    publisher = ErgatePublisher(
+        Driver(generate()), queue, batching=PublishBatching(size=10, linger=5)
+    )
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="driver failed"):
+        publisher.run()
+
+    assert queue.batches == [[1, 2]]
+    assert time.monotonic() - started < 1
@@ -0,0 +1,111 @@
+from collections.abc import Callable
+
+import pytest
+
+from ergate import Job, JobStatus, RetryPolicy, Workflow
+from ergate.backends import InMemoryQueue, InMemoryStateStore
+from ergate.worker import ErgateWorker
+
+RunOnce = Callable[[ErgateWorker[Job]], list[Job]]
+
+
+def make_worker(
+    workflow: Workflow, state_store: InMemoryStateStore[Job]
+) -> ErgateWorker[Job]:
+    worker: ErgateWorker[Job] = ErgateWorker(InMemoryQueue(), state_store)
+    worker.register_workflow(workflow)
+    return worker
+
+
+def failing_workflow(failures: int, retry: RetryPolicy) -> Workflow:
+    """Workflow whose second step raises `ConnectionError` `failures` times."""
+    workflow = Workflow("flaky")
+    calls: list[int] = []
+
+    @workflow.step
+    def first(value: int) -> int:
+        return value + 1
+
+    @workflow.step(retry=retry)
+    def flaky(value: int) -> int:
+        calls.append(value)
+        if len(calls) <= failures:
+            raise ConnectionError("unavailable")
+        return value * 10
+
+    return workflow
+
+
+def test_failed_step_is_retried_until_it_succeeds(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = failing_workflow(2, RetryPolicy(max_attempts=3, backoff=0))
+    worker = make_worker(workflow, memory_state_store)
+    memory_state_store.add(Job(workflow_name="flaky", initial_input_value=1))
+
+    (job,) = run_once(worker)
+    assert job.status == JobStatus.PENDING
+    assert job.current_step == 1
+
+    for attempt in (2, 3):
+        (job,) = run_once(worker)
+        assert job.status == JobStatus.SCHEDULED
+        assert job.attempt == attempt
+        assert job.requested_start_time is not None
+        assert job.current_step == 1
+    (job,) = run_once(worker)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.attempt == 1
+    assert job.get_return_value() == 20
+
+
+def test_job_fails_once_attempts_run_out(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = failing_workflow(5, RetryPolicy(max_attempts=2, backoff=0))
+    worker = make_worker(workflow, memory_state_store)
+    memory_state_store.add(Job(workflow_name="flaky", initial_input_value=1))
+
+    statuses = [run_once(worker)[0].status for _ in range(3)]
+
+    assert statuses == [JobStatus.PENDING, JobStatus.SCHEDULED, JobStatus.FAILED]
+    assert run_once(worker) == []
+
+
+@pytest.mark.parametrize(
+    "retry",
+    [
+        RetryPolicy(retry_on=TimeoutError, backoff=0),
+        RetryPolicy(ignore=ConnectionError, backoff=0),
+    ],
+)
+def test_exceptions_that_are_not_retried_fail_the_job(
+    retry: RetryPolicy,
+    memory_state_store: InMemoryStateStore[Job],
+    run_once: RunOnce,
+) -> None:
+    worker = make_worker(failing_workflow(1, retry), memory_state_store)
+    memory_state_store.add(Job(workflow_name="flaky", initial_input_value=1))
+
+    run_once(worker)
+    (job,) = run_once(worker)
+
+    assert job.status == JobStatus.FAILED
+    assert job.attempt == 1
+
+
+def test_retry_waits_for_backoff(
+    memory_state_store: InMemoryStateStore[Job], run_once: RunOnce
+) -> None:
+    workflow = failing_workflow(1, RetryPolicy(backoff=60, jitter=0))
+    worker = make_worker(workflow, memory_state_store)
+    memory_state_store.add(Job(workflow_name="flaky", initial_input_value=1))
+
+    run_once(worker)
+    (job,) = run_once(worker)
+
+    assert job.status == JobStatus.SCHEDULED
+    assert job.requested_start_time is not None
+    # Not published again until it's due
+    assert run_once(worker) == []
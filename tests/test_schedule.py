@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from ergate import Job
+from ergate.publisher.schedule import JobSchedule
+
+
+def in_seconds(seconds: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+def test_jobs_are_held_until_due() -> None:
+    schedule: JobSchedule[Job] = JobSchedule()
+
+    assert not schedule.hold(Job(id="now", workflow_name="w"))
+    assert not schedule.hold(
+        Job(id="past", workflow_name="w", requested_start_time=in_seconds(-1))
+    )
+    assert schedule.hold(
+        Job(id="later", workflow_name="w", requested_start_time=in_seconds(60))
+    )
+    assert schedule.hold(
+        Job(id="soon", workflow_name="w", requested_start_time=in_seconds(0.02))
+    )
+
+    assert len(schedule) == 2
+    assert schedule.pop_due() == []
+
+    time.sleep(0.05)
+    assert [job.id for job in schedule.pop_due()] == ["soon"]
+    assert len(schedule) == 1
+
+
+def test_job_yielded_again_replaces_held_job() -> None:
+    schedule: JobSchedule[Job] = JobSchedule()
+    schedule.hold(Job(id="a", workflow_name="w", requested_start_time=in_seconds(60)))
+
+    moved = Job(id="a", workflow_name="w", requested_start_time=in_seconds(120))
+    assert schedule.hold(moved)
+    assert len(schedule) == 1
+    seconds = schedule.seconds_until_next()
+    assert seconds is not None and seconds > 60
+
+    # Once due, the job isn't held anymore, nor published when the
+    # entry it replaced comes due.
+    assert not schedule.hold(Job(id="a", workflow_name="w"))
+    assert len(schedule) == 0
+    assert schedule.seconds_until_next() is None
+    assert schedule.pop_due() == []
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+from ergate import Job, JobStatus
+from ergate.exceptions import SerializationError
+from ergate.serialization import (
+    JsonSerializer,
+    LazyPayload,
+    PickleSerializer,
+    Serializer,
+)
+
+SERIALIZERS = [
+    pytest.param(JsonSerializer(), id="json"),
+    pytest.param(PickleSerializer(), id="pickle"),
+]
+
+
+def make_job() -> Job:
+    return Job(
+        id="a",
+        workflow_name="w",
+        status=JobStatus.RUNNING,
+        current_step=2,
+        initial_input_value={"numbers": [1, 2, 3]},
+        last_return_value="last",
+        user_context={"user": 1},
+        requested_start_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        step_return_values={0: "zero"},
+        priority=5,
+    )
+
+
+@pytest.mark.parametrize("serializer", SERIALIZERS)
+def test_job_round_trip(serializer: Serializer) -> None:
+    job = make_job()
+
+    loaded = Job.from_bytes(job.to_bytes(serializer))
+
+    assert loaded.model_dump() == job.model_dump()
+
+
+@pytest.mark.parametrize("serializer", SERIALIZERS)
+def test_payloads_are_decoded_when_used(serializer: Serializer) -> None:
+    loaded = Job.from_bytes(make_job().to_bytes(serializer))
+
+    assert isinstance(loaded.initial_input_value, LazyPayload)
+    assert loaded.get_user_context() == {"user": 1}
+    assert loaded.step_return_values == {0: "zero"}
+
+
+def test_unused_payloads_are_written_back_as_they_are() -> None:
+    data = make_job().to_bytes()
+
+    assert Job.from_bytes(data).to_bytes() == data
+
+
+def test_pickle_round_trips_buffers() -> None:
+    job = Job(workflow_name="w", initial_input_value=bytearray(b"buffer"))
+    data = job.to_bytes(PickleSerializer())
+
+    value: Any = Job.from_bytes(data).get_input_value()
+
+    assert isinstance(value, bytearray)
+    assert value == b"buffer"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"XX" + bytes(30), make_job().to_bytes()[:-1]],
+    ids=["empty", "magic", "truncated"],
+)
+def test_invalid_data_is_rejected(data: bytes) -> None:
+    with pytest.raises(SerializationError):
+        Job.from_bytes(data)
+
+
+def test_serializer_must_match_the_job_format() -> None:
+    data = make_job().to_bytes(JsonSerializer())
+
+    with pytest.raises(SerializationError, match="format"):
+        Job.from_bytes(data, PickleSerializer())
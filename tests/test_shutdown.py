@@ -0,0 +1,59 @@
+import signal
+from collections.abc import Callable
+
+import pytest
+
+from ergate import Job, JobStatus
+from ergate.backends import SqliteQueue, SqliteStateStore
+
+from .conftest import WorkerStarter, finish_worker, wait_for_file
+
+Publish = Callable[[str, list[object]], list[Job]]
+
+WORKER_SETTINGS = [
+    pytest.param({}, id="sequential"),
+    pytest.param({"concurrency": 2, "pool": "thread"}, id="thread"),
+    pytest.param({"concurrency": 2, "pool": "process"}, id="process"),
+]
+
+
+@pytest.mark.parametrize("settings", WORKER_SETTINGS)
+@pytest.mark.parametrize("signum", [signal.SIGTERM, signal.SIGINT])
+def test_signal_lets_running_jobs_finish(
+    settings: dict[str, object],
+    signum: signal.Signals,
+    db: str,
+    state_store: SqliteStateStore[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("sleep", [0.5] * 6)
+
+    process = start_worker(**settings)
+    wait_for_file(db + ".started")
+    process.send_signal(signum)
+    finish_worker(process)
+
+    statuses = [state_store[job.id].status for job in jobs]
+    assert JobStatus.RUNNING not in statuses
+    assert JobStatus.COMPLETED in statuses
+    # The worker stops taking jobs, so some are left in the queue
+    assert JobStatus.QUEUED in statuses
+
+
+@pytest.mark.parametrize("settings", WORKER_SETTINGS)
+def test_closed_queue_stops_worker_once_empty(
+    settings: dict[str, object],
+    state_store: SqliteStateStore[Job],
+    queue: SqliteQueue[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("sleep", [0.01] * 6)
+    queue.close()
+
+    finish_worker(start_worker(**settings))
+
+    assert len(queue) == 0
+    for job in jobs:
+        assert state_store[job.id].status == JobStatus.COMPLETED
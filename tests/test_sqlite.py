@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ergate import Job, JobStatus
+from ergate.backends import SqliteQueue, SqliteStateStore
+
+
+def test_queue_round_trip(db: str, queue: SqliteQueue[Job]) -> None:
+    job = Job(
+        id="a",
+        workflow_name="w",
+        initial_input_value={"numbers": [1, 2]},
+        user_context="context",
+        priority=3,
+    )
+    queue.publish_job(job)
+
+    # Any instance using the same database sees the job
+    taken = SqliteQueue(db, Job).get_one()
+
+    assert taken.model_dump() == job.model_dump()
+    assert len(queue) == 0
+
+
+def test_queue_orders_by_priority_then_publication(queue: SqliteQueue[Job]) -> None:
+    jobs = [
+        Job(id=str(index), workflow_name="w", priority=priority)
+        for index, priority in enumerate([0, 1, 0, 1])
+    ]
+    assert queue.publish_jobs(jobs) == [None] * 4
+
+    taken = [job.id for job in queue.get_many(10)]
+
+    assert taken == ["1", "3", "0", "2"]
+
+
+def test_closed_queue_hands_out_remaining_jobs_first(queue: SqliteQueue[Job]) -> None:
+    queue.publish_job(Job(id="a", workflow_name="w"))
+    queue.close()
+
+    assert queue.get_one().id == "a"
+    with pytest.raises(KeyboardInterrupt):
+        queue.get_one()
+    with pytest.raises(KeyboardInterrupt):
+        queue.poll()
+
+    queue.reopen()
+    assert queue.poll() is None
+
+
+def test_state_store_round_trip(db: str, state_store: SqliteStateStore[Job]) -> None:
+    job = state_store.add(Job(workflow_name="w", initial_input_value=[1, 2]))
+    assert job.id is not None
+
+    job.status = JobStatus.COMPLETED
+    job.last_return_value = {"total": 3}
+    state_store.update(job)
+
+    stored = SqliteStateStore(db, Job)[job.id]
+    assert stored.status == JobStatus.COMPLETED
+    assert stored.get_input_value() == [1, 2]
+    assert stored.get_return_value() == {"total": 3}
+
+    with pytest.raises(KeyError):
+        state_store["missing"]
+
+
+def test_state_store_update_many(state_store: SqliteStateStore[Job]) -> None:
+    jobs = [state_store.add(Job(workflow_name="w")) for _ in range(3)]
+    for job in jobs:
+        job.status = JobStatus.RUNNING
+
+    state_store.update_many(jobs)
+
+    assert all(state_store[job.id].status == JobStatus.RUNNING for job in jobs)
+
+
+def test_state_store_claims_publishable_jobs_once(
+    state_store: SqliteStateStore[Job],
+) -> None:
+    due = state_store.add(Job(workflow_name="w"))
+    later = state_store.add(
+        Job(
+            workflow_name="w",
+            requested_start_time=datetime.now(timezone.utc) + timedelta(hours=1),
+        )
+    )
+
+    assert [job.id for job in state_store.generate_jobs()] == [due.id]
+    assert state_store[due.id].status == JobStatus.QUEUED
+    assert state_store[later.id].status == JobStatus.PENDING
+    assert list(state_store.generate_jobs()) == []
+
+
+def test_state_store_unclaims_jobs_that_failed_to_publish(
+    state_store: SqliteStateStore[Job],
+) -> None:
+    job = state_store.add(Job(workflow_name="w"))
+    (claimed,) = state_store.generate_jobs()
+
+    state_store.report_failures([(claimed, RuntimeError("queue unavailable"))])
+
+    assert state_store[job.id].status == JobStatus.PENDING
+    assert [job.id for job in state_store.generate_jobs()] == [job.id]
@@ -0,0 +1,60 @@
+import signal
+from collections.abc import Callable
+
+from ergate import Job, JobStatus
+from ergate.backends import SqliteQueue, SqliteStateStore
+
+from .conftest import WorkerStarter, finish_worker, wait_for_file
+
+Publish = Callable[[str, list[object]], list[Job]]
+
+
+def test_worker_processes_stop_once_queue_is_closed(
+    state_store: SqliteStateStore[Job],
+    queue: SqliteQueue[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("resource", [None] * 8)
+    queue.close()
+
+    finish_worker(start_worker("--processes", "2"))
+
+    for job in jobs:
+        assert state_store[job.id].status == JobStatus.COMPLETED
+
+
+def test_worker_processes_are_replaced_after_max_jobs(
+    state_store: SqliteStateStore[Job],
+    queue: SqliteQueue[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("resource", [None] * 8)
+    queue.close()
+
+    finish_worker(start_worker("--processes", "1", "--max-jobs", "2"))
+
+    stored = [state_store[job.id] for job in jobs]
+    assert all(job.status == JobStatus.COMPLETED for job in stored)
+    # Each job returns the ID of the process that ran it
+    pids = {job.get_return_value() for job in stored}
+    assert len(pids) == 4
+
+
+def test_signal_stops_every_worker_process(
+    db: str,
+    state_store: SqliteStateStore[Job],
+    publish: Publish,
+    start_worker: WorkerStarter,
+) -> None:
+    jobs = publish("sleep", [0.5] * 8)
+
+    process = start_worker("--processes", "2")
+    wait_for_file(db + ".started")
+    process.send_signal(signal.SIGTERM)
+    finish_worker(process)
+
+    statuses = [state_store[job.id].status for job in jobs]
+    assert JobStatus.RUNNING not in statuses
+    assert JobStatus.COMPLETED in statuses
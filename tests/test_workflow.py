@@ -0,0 +1,104 @@
+from collections.abc import Sequence
+from typing import Annotated, Any
+
+import pytest
+
+from ergate import Depends, InvalidDefinitionError, Workflow
+
+
+def make_workflow(after_stage: Any) -> Workflow:
+    workflow = Workflow("stages")
+
+    @workflow.step
+    def first(value: int) -> int:
+        return value
+
+    @workflow.step(depends_on=[first])
+    def left(value: int) -> int:
+        return value
+
+    @workflow.step(depends_on=[first])
+    def right(value: int) -> int:
+        return value
+
+    workflow.step(after_stage)
+    return workflow
+
+
+def test_steps_that_do_not_depend_on_one_another_share_a_stage() -> None:
+    def total(values: list[int]) -> int:
+        return sum(values)
+
+    workflow = make_workflow(total)
+    workflow.finalize()
+
+    assert [step.name for step in workflow.get_stage(1)] == ["left", "right"]
+    assert [step.name for step in workflow.get_stage(3)] == ["total"]
+
+
+def sequence_input(values: Sequence[int]) -> None: ...
+
+
+def optional_input(values: list[int] | None) -> None: ...
+
+
+def unannotated_input(values) -> None:  # type: ignore[no-untyped-def]
+    ...
+
+
+def no_input() -> None: ...
+
+
+def dependency() -> int:
+    return 1
+
+
+def dependency_only(value: Annotated[int, Depends(dependency)]) -> None: ...
+
+
+@pytest.mark.parametrize(
+    "after_stage",
+    [
+        sequence_input,
+        optional_input,
+        unannotated_input,
+        no_input,
+        dependency_only,
+    ],
+)
+def test_step_after_stage_may_receive_list(after_stage: Any) -> None:
+    make_workflow(after_stage).finalize()
+
+
+def int_input(value: int) -> None: ...
+
+
+def dict_input(value: dict[str, int]) -> None: ...
+
+
+@pytest.mark.parametrize("after_stage", [int_input, dict_input])
+def test_step_after_stage_must_accept_list(after_stage: Any) -> None:
+    with pytest.raises(InvalidDefinitionError, match="list of the return values"):
+        make_workflow(after_stage).finalize()
+
+
+def test_step_after_stage_with_depends_on_is_not_checked() -> None:
+    workflow = Workflow("stages")
+
+    @workflow.step
+    def first(value: int) -> int:
+        return value
+
+    @workflow.step(depends_on=[first])
+    def left(value: int) -> int:
+        return value
+
+    @workflow.step(depends_on=[first])
+    def right(value: int) -> int:
+        return value
+
+    @workflow.step(depends_on=[left])
+    def after(value: int) -> int:
+        return value
+
+    workflow.finalize()